@@ -0,0 +1,10 @@
+import os
+import uvicorn
+
+# 查询接口监听的地址和端口
+API_HOST = os.environ.get('COATING_API_HOST', '127.0.0.1')
+API_PORT = int(os.environ.get('COATING_API_PORT', '8600'))
+
+if __name__ == "__main__":
+    # 保持连接复用，调用方可在同一连接上连续发送查询
+    uvicorn.run("app.api.server:app", host=API_HOST, port=API_PORT, timeout_keep_alive=30, access_log=False)
@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import os
 
 # 设置页面配置 - 必须是第一个st命令
@@ -19,10 +18,8 @@ def ensure_data_dir():
 # 确保数据目录存在
 ensure_data_dir()
 
-# 导入自定义模块
-from app.auth.authentication import setup_authenticator
-from app.pages.search_page import render_search_page
-from app.pages.admin_page import render_admin_page
+# 导入自定义模块（查询页面和管理面板在登录后才导入，未登录的访客只需加载登录所需的模块）
+from app.auth.authentication import setup_authenticator, LOGIN_REJECTION_MESSAGES
 
 # 自定义CSS
 def load_css():
@@ -126,7 +123,11 @@ def main():
                     st.session_state["name"] = name
                 
                 if st.session_state["authentication_status"] is False:
-                    st.error("用户名或密码错误")
+                    rejected_reason = st.session_state.get("login_rejected_reason")
+                    if rejected_reason in LOGIN_REJECTION_MESSAGES:
+                        st.error(LOGIN_REJECTION_MESSAGES[rejected_reason])
+                    else:
+                        st.error("用户名或密码错误")
                 elif st.session_state["authentication_status"] is None:
                     st.warning("请输入用户名和密码")
             
@@ -155,8 +156,11 @@ def main():
     # 主内容区域
     if st.session_state["authentication_status"] is True:
         if page == "化学物质查询":
+            from app.pages.search_page import render_search_page
             render_search_page(st.session_state["username"])
         elif page == "管理面板" and st.session_state["username"] == "admin":
+            # 管理面板（含上传处理和统计图表）只为管理员加载
+            from app.pages.admin_page import render_admin_page
             render_admin_page()
     else:
         # 未登录显示
@@ -0,0 +1 @@
+# api模块初始化文件
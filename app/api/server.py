@@ -0,0 +1,255 @@
+import os
+import json
+import hmac
+import time
+import asyncio
+from urllib.parse import parse_qs
+from app.utils.data_utils import (
+    load_chemicals_data,
+    get_current_dataset,
+    get_dataset_cache_stats,
+    get_toxicity_level_description,
+    get_toxicity_level_color,
+    format_query_result,
+    MAX_BATCH_SIZE
+)
+from app.utils.structure_images import get_structure_cache, structure_mime_type
+from app.utils.cas_utils import check_cas_number, CAS_INVALID_FORMAT, CAS_INVALID_CHECKSUM, CAS_STATUS_MESSAGES
+from app.utils.log_sink import get_query_log_sink, submit_query_records
+from app.utils.logger import get_logger
+from app.utils.metrics import get_stage_timings, timed_stage
+from app.auth.login_guard import get_login_verifier
+
+logger = get_logger(__name__)
+
+# 接口访问令牌（设置后请求需携带 Authorization: Bearer <令牌>）
+API_TOKEN = os.environ.get('COATING_API_TOKEN', '')
+# 请求体大小上限（字节）
+MAX_BODY_SIZE = 1024 * 1024
+# 未指定调用方时查询记录中使用的用户名
+DEFAULT_API_USER = 'api'
+
+# 需要拒绝的CAS号校验结果
+INVALID_CAS_STATUSES = (CAS_INVALID_FORMAT, CAS_INVALID_CHECKSUM)
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# 二进制响应（结构图）：etag为图像内容哈希，内容不变时客户端可用If-None-Match得到304
+class BinaryResponse:
+    def __init__(self, body, content_type, etag=None):
+        self.body = body
+        self.content_type = content_type
+        self.etag = etag
+
+# 把记录转换为可序列化为JSON的字典（空值转为null）
+def _json_record(record):
+    return {key: (None if isinstance(value, float) and value != value else value) for key, value in record.items()}
+
+# 查询单个CAS号，返回(结果字典, 是否需要记录)；有结构图时给出结构图地址
+def lookup_cas(cas_input, index, structures=None):
+    cas_number, cas_status = check_cas_number(cas_input)
+    record = index.get(cas_number)
+    payload = {
+        'input': cas_input,
+        'cas': cas_number,
+        'cas_status': cas_status,
+        'found': record is not None,
+    }
+    if record is None:
+        if cas_status in INVALID_CAS_STATUSES:
+            payload['error'] = CAS_STATUS_MESSAGES[cas_status]
+            return payload, False
+        return payload, True
+    grade = record.get('绿色分级')
+    payload.update({
+        'grade': grade,
+        'grade_description': get_toxicity_level_description(grade),
+        'grade_color': get_toxicity_level_color(grade),
+        'chemical': _json_record(record),
+    })
+    if structures and cas_number in structures:
+        payload['structure_url'] = f"/v1/chemicals/{cas_number}/structure"
+    return payload, True
+
+# 当前版本的数据，整个请求使用同一版本（请求期间切换版本不影响本次结果）
+def _current_dataset():
+    dataset = get_current_dataset()
+    if dataset is None:
+        raise ApiError(503, "数据未加载")
+    return dataset
+
+def _check_token(headers):
+    if not API_TOKEN:
+        return
+    expected = f"Bearer {API_TOKEN}"
+    if not hmac.compare_digest(headers.get('authorization', ''), expected):
+        raise ApiError(401, "缺少或无效的访问令牌")
+
+# GET /v1/chemicals/{CAS号}?usage=使用用途
+def handle_single(cas_input, query, username):
+    usage = query.get('usage', [''])[0]
+    dataset = _current_dataset()
+    payload, loggable = lookup_cas(cas_input, dataset.cas_index, dataset.structures)
+    payload['dataset_version'] = dataset.version
+    if loggable:
+        submit_query_records(username, [(payload['cas'], format_query_result(payload.get('chemical')), usage)], dataset.version)
+    return (200 if loggable else 400), payload
+
+# POST /v1/chemicals/batch，请求体 {"cas_numbers": [...], "usage": "..."}
+def handle_batch(body, username):
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        raise ApiError(400, "请求体不是有效的JSON")
+    cas_numbers = data.get('cas_numbers') if isinstance(data, dict) else None
+    if not isinstance(cas_numbers, list) or not cas_numbers:
+        raise ApiError(400, "请提供cas_numbers列表")
+    if len(cas_numbers) > MAX_BATCH_SIZE:
+        raise ApiError(413, f"单次最多查询{MAX_BATCH_SIZE}条")
+    usage = str(data.get('usage') or '')
+
+    dataset = _current_dataset()
+    results = []
+    records = []
+    for cas_input in cas_numbers:
+        payload, loggable = lookup_cas(str(cas_input), dataset.cas_index, dataset.structures)
+        results.append(payload)
+        if loggable:
+            records.append((payload['cas'], format_query_result(payload.get('chemical')), usage))
+    # 整批记录一次提交到查询日志
+    submit_query_records(username, records, dataset.version)
+    return 200, {
+        'dataset_version': dataset.version,
+        'count': len(results),
+        'found': sum(1 for item in results if item['found']),
+        'results': results,
+    }
+
+# GET /v1/chemicals/{CAS号}/structure：加载数据时生成的结构图缩略图，直接返回缓存中的字节（不计入查询记录）
+def handle_structure(cas_input, headers):
+    cas_number, cas_status = check_cas_number(cas_input)
+    if cas_status in INVALID_CAS_STATUSES:
+        raise ApiError(400, CAS_STATUS_MESSAGES[cas_status])
+    entry = _current_dataset().structures.get(cas_number)
+    if entry is None:
+        raise ApiError(404, "该物质没有结构图")
+    etag = f'"{entry["digest"]}"'
+    if headers.get('if-none-match') == etag:
+        return 304, BinaryResponse(b'', structure_mime_type(entry), etag)
+    image_bytes = get_structure_cache().read(entry)
+    if image_bytes is None:
+        raise ApiError(404, "结构图缓存文件不存在")
+    return 200, BinaryResponse(image_bytes, structure_mime_type(entry), etag)
+
+# GET /health
+def handle_health():
+    stats = get_dataset_cache_stats()
+    return 200, {
+        'status': 'ok' if stats['rows'] else 'loading',
+        'dataset_version': stats['version'],
+        'rows': stats['rows'],
+        # 是否正在后台加载新版本的数据
+        'reloading': stats['loading'],
+    }
+
+def _route(method, path, query, headers, body):
+    if path == '/health':
+        return handle_health()
+    _check_token(headers)
+    if path == '/metrics':
+        # Prometheus文本格式的各阶段耗时直方图和登录校验统计
+        return 200, get_stage_timings().export_prometheus() + get_login_verifier().export_prometheus()
+    username = headers.get('x-api-user') or DEFAULT_API_USER
+    if path == '/v1/chemicals/batch':
+        if method != 'POST':
+            raise ApiError(405, "请使用POST方法")
+        return handle_batch(body, username)
+    if path.startswith('/v1/chemicals/'):
+        if method != 'GET':
+            raise ApiError(405, "请使用GET方法")
+        cas_input = path[len('/v1/chemicals/'):]
+        if cas_input.endswith('/structure'):
+            return handle_structure(cas_input[:-len('/structure')], headers)
+        if not cas_input:
+            raise ApiError(404, "请在路径中提供CAS号")
+        return handle_single(cas_input, query, username)
+    raise ApiError(404, "接口不存在")
+
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_SIZE:
+            raise ApiError(413, "请求体过大")
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+# 发送响应：二进制响应直接发送，字符串按Prometheus文本格式发送，其余按JSON发送
+async def _send_response(send, status, payload, elapsed=None):
+    extra_headers = []
+    if isinstance(payload, BinaryResponse):
+        body = payload.body
+        content_type = payload.content_type.encode()
+        if payload.etag:
+            extra_headers = [(b'etag', payload.etag.encode()), (b'cache-control', b'public, max-age=3600')]
+    elif isinstance(payload, str):
+        body = payload.encode('utf-8')
+        content_type = b'text/plain; version=0.0.4; charset=utf-8'
+    else:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        content_type = b'application/json; charset=utf-8'
+    headers = [
+        (b'content-type', content_type),
+        (b'content-length', str(len(body)).encode()),
+    ] + extra_headers
+    if elapsed is not None:
+        # 服务端处理耗时（毫秒），便于调用方区分网络和服务端时间
+        headers.append((b'server-timing', f'app;dur={elapsed * 1000:.3f}'.encode()))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # 启动时在线程中加载数据，第一个请求无需等待解析工作簿
+            await asyncio.to_thread(load_chemicals_data)
+            get_query_log_sink()
+            if not API_TOKEN:
+                logger.warning("未设置COATING_API_TOKEN，查询接口不校验访问令牌")
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await asyncio.to_thread(get_query_log_sink().flush)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+# ASGI应用：只做JSON查询，不经过Streamlit脚本和页面渲染
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    started = time.perf_counter()
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers', [])}
+    query = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+    try:
+        body = await _read_body(receive) if scope['method'] == 'POST' else b''
+        # 查询只涉及内存中的索引，直接在事件循环中完成
+        with timed_stage('api_request'):
+            status, payload = _route(scope['method'], scope['path'], query, headers, body)
+    except ApiError as e:
+        status, payload = e.status, {'error': e.message}
+    except Exception as e:
+        logger.exception("处理接口请求时出错: %s", e)
+        status, payload = 500, {'error': "服务器内部错误"}
+    await _send_response(send, status, payload, time.perf_counter() - started)
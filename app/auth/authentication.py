@@ -1,51 +1,72 @@
-import yaml
 import streamlit as st
 import streamlit_authenticator as stauth
-import os
-from datetime import datetime
-import pandas as pd
+from app.auth.credential_store import get_credential_store
+from app.auth.password_hashing import hash_password_offloaded, hash_passwords
+from app.auth.login_guard import get_login_verifier, VERIFY_THROTTLED_USER, VERIFY_THROTTLED_IP, VERIFY_BUSY
+import time
+from app.utils.logger import get_logger
+from app.utils.metrics import timed
 
-# 读取配置文件
+logger = get_logger(__name__)
+
+# 读取配置文件（进程内缓存，文件变化时自动重新读取）
 def load_config():
-    config_path = os.path.join(os.path.dirname(__file__), 'config.yaml')
-    with open(config_path, 'r', encoding='utf-8') as file:
-        config = yaml.safe_load(file)
-    return config
-
-# 保存查询记录
-def save_query_record(username, cas_number, result, usage_purpose=""):
-    log_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'query_logs.csv')
-    
-    # 获取当前时间
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # 创建新记录
-    new_record = pd.DataFrame({
-        '用户名': [username],
-        'CAS号': [cas_number],
-        '使用用途': [usage_purpose],
-        '查询时间': [timestamp],
-        '查询结果': [result]
-    })
-    
-    # 检查日志文件是否存在
-    if os.path.exists(log_path):
-        # 如果存在，追加记录
-        logs = pd.read_csv(log_path)
-        # 确保新增列存在（向后兼容）
-        if '使用用途' not in logs.columns:
-            logs['使用用途'] = ""
-        logs = pd.concat([logs, new_record], ignore_index=True)
-    else:
-        logs = new_record
-    
-    # 保存日志
-    logs.to_csv(log_path, index=False)
+    return get_credential_store().get_config()
+
+# 保存查询记录，dataset_version为回答查询的数据版本
+def save_query_record(username, cas_number, result, usage_purpose="", dataset_version=""):
+    save_query_records(username, [(cas_number, result, usage_purpose)], dataset_version)
+
+# 批量保存查询记录（交给后台线程批量追加写入），records为(CAS号, 查询结果, 使用用途)列表
+# 日志队列、日志存储和pandas在用到时才导入，未登录访客打开登录页时不加载
+@timed('query_log_submit')
+def save_query_records(username, records, dataset_version=""):
+    from app.utils.log_sink import submit_query_records
+
+    # 放入异步日志队列，查询响应不等待磁盘写入
+    submit_query_records(username, records, dataset_version)
+
+# 登录被拒绝（非密码错误）时显示的提示
+LOGIN_REJECTION_MESSAGES = {
+    VERIFY_THROTTLED_USER: "该账户登录尝试过于频繁，请稍后再试",
+    VERIFY_THROTTLED_IP: "登录尝试过于频繁，请稍后再试",
+    VERIFY_BUSY: "系统繁忙，请稍后再试",
+}
+
+# 获取当前会话的客户端IP（通过本机nginx反向代理访问时使用代理传入的X-Real-IP）
+def get_client_ip():
+    try:
+        from streamlit.runtime import get_instance
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        client = get_instance().get_client(ctx.session_id) if ctx is not None else None
+        if client is None:
+            return None
+        request = client.request
+        if request.remote_ip in ('127.0.0.1', '::1'):
+            forwarded = request.headers.get('X-Real-IP') or request.headers.get('X-Forwarded-For', '').split(',')[0].strip()
+            return forwarded or request.remote_ip
+        return request.remote_ip
+    except Exception:
+        return None
+
+# 带限流和校验缓存的验证器：密码校验交给进程内共享的登录校验器
+class GuardedAuthenticate(stauth.Authenticate):
+    def _check_pw(self):
+        ok, reason = get_login_verifier().verify(
+            self.username,
+            self.password,
+            self.credentials['usernames'][self.username]['password'],
+            get_client_ip()
+        )
+        st.session_state['login_rejected_reason'] = reason if reason in LOGIN_REJECTION_MESSAGES else None
+        return ok
 
 # 初始化验证器
+# 验证器在构造时会渲染Cookie组件，必须每次运行重新创建；配置来自缓存，不再重复解析文件
 def setup_authenticator():
     config = load_config()
-    authenticator = stauth.Authenticate(
+    authenticator = GuardedAuthenticate(
         config['credentials'],
         config['cookie']['name'],
         config['cookie']['key'],
@@ -55,51 +76,104 @@ def setup_authenticator():
 
 # 创建新用户
 def create_user(username, name, email, password):
-    config_path = os.path.join(os.path.dirname(__file__), 'config.yaml')
+    # 检查用户名是否已存在（写入前会在锁内再次检查）
+    if username in get_credential_store().get_users():
+        return False, "用户名已存在"
     
-    # 读取现有配置
-    with open(config_path, 'r', encoding='utf-8') as file:
-        config = yaml.safe_load(file)
+    # 在进程池中生成密码哈希（耗时操作，在加锁之前完成）
+    hashed_password = hash_password_offloaded(password)
     
-    # 生成密码哈希
-    hashed_password = stauth.Hasher([password]).generate()[0]
+    def add_user(config):
+        if username in config['credentials']['usernames']:
+            return False, (False, "用户名已存在")
+        
+        # 添加新用户（同时保存明文密码和加密密码）
+        config['credentials']['usernames'][username] = {
+            'email': email,
+            'name': name,
+            'password': hashed_password,  # 用于验证的加密密码
+            'plain_password': password    # 用于管理员查看的明文密码
+        }
+        return True, (True, "用户创建成功")
     
-    # 检查用户名是否已存在
-    if username in config['credentials']['usernames']:
-        return False, "用户名已存在"
+    return get_credential_store().update(add_user)
+
+# 批量导入用户需要的列
+BULK_USER_COLUMNS = ['用户名', '姓名', '邮箱', '密码']
+
+# 批量创建用户：并行计算密码哈希，再一次性写入配置文件
+# 返回导入结果：成功创建的用户、跳过的用户及原因、耗时和每秒处理的用户数
+def bulk_create_users(users_df):
+    missing = [col for col in BULK_USER_COLUMNS if col not in users_df.columns]
+    if missing:
+        return False, f"缺少列: {', '.join(missing)}", None
     
-    # 添加新用户（同时保存明文密码和加密密码）
-    config['credentials']['usernames'][username] = {
-        'email': email,
-        'name': name,
-        'password': hashed_password,  # 用于验证的加密密码
-        'plain_password': password    # 用于管理员查看的明文密码
-    }
+    existing = get_credential_store().get_users()
+    candidates, skipped, seen = [], [], set()
+    for row in users_df[BULK_USER_COLUMNS].fillna('').astype(str).itertuples(index=False):
+        username, name, email, password = (value.strip() for value in row)
+        if not (username and name and email and password):
+            skipped.append((username, "字段不完整"))
+        elif username in existing:
+            skipped.append((username, "用户名已存在"))
+        elif username in seen:
+            skipped.append((username, "文件中用户名重复"))
+        else:
+            seen.add(username)
+            candidates.append((username, name, email, password))
+    
+    # 并行计算所有密码哈希
+    start_time = time.perf_counter()
+    hashed = hash_passwords([password for _, _, _, password in candidates])
     
-    # 保存配置
-    with open(config_path, 'w', encoding='utf-8') as file:
-        yaml.dump(config, file, default_flow_style=False)
+    def add_users(config):
+        usernames = config['credentials']['usernames']
+        created = []
+        for (username, name, email, password), hashed_password in zip(candidates, hashed):
+            # 加锁后再次检查，避免覆盖并发创建的同名用户
+            if username in usernames:
+                skipped.append((username, "用户名已存在"))
+                continue
+            usernames[username] = {
+                'email': email,
+                'name': name,
+                'password': hashed_password,
+                'plain_password': password
+            }
+            created.append(username)
+        return bool(created), created
     
-    return True, "用户创建成功"
+    created = get_credential_store().update(add_users)
+    elapsed = time.perf_counter() - start_time
+    summary = {
+        'created': created,
+        'skipped': skipped,
+        'elapsed': elapsed,
+        'users_per_second': len(candidates) / elapsed if elapsed > 0 else 0.0,
+    }
+    return True, f"成功创建{len(created)}个用户，跳过{len(skipped)}个", summary
+
+# 等待异步队列中的查询记录写入存储，保证读取时能看到最新查询
+def flush_query_logs():
+    from app.utils.log_sink import get_query_log_sink
+
+    get_query_log_sink().flush()
 
 # 获取所有查询记录
 def get_all_query_logs():
-    log_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'query_logs.csv')
-    if os.path.exists(log_path):
-        logs = pd.read_csv(log_path)
-        # 确保新增列存在（向后兼容）
-        if '使用用途' not in logs.columns:
-            logs['使用用途'] = ""
-        return logs
-    return pd.DataFrame(columns=['用户名', 'CAS号', '使用用途', '查询时间', '查询结果'])
+    from app.utils.log_store import get_query_log_store
+
+    flush_query_logs()
+    return get_query_log_store().query_logs()
 
 # 获取所有用户信息
 def get_all_users():
+    import pandas as pd
+
     try:
-        config = load_config()
         users_data = []
         
-        for username, user_info in config['credentials']['usernames'].items():
+        for username, user_info in get_credential_store().get_users().items():
             # 确定用户角色
             role = "管理员" if username == "admin" else "普通用户"
             
@@ -116,7 +190,7 @@ def get_all_users():
         
         return pd.DataFrame(users_data)
     except Exception as e:
-        print(f"获取用户列表时出错: {e}")
+        logger.error("获取用户列表时出错: %s", e)
         return pd.DataFrame(columns=['用户名', '姓名', '邮箱', '密码', '角色'])
 
 # 删除用户
@@ -124,52 +198,39 @@ def delete_user(username):
     if username == "admin":
         return False, "不能删除管理员账户"
     
-    config_path = os.path.join(os.path.dirname(__file__), 'config.yaml')
-    
-    try:
-        # 读取现有配置
-        with open(config_path, 'r', encoding='utf-8') as file:
-            config = yaml.safe_load(file)
-        
+    def remove_user(config):
         # 检查用户是否存在
         if username not in config['credentials']['usernames']:
-            return False, "用户不存在"
+            return False, (False, "用户不存在")
         
         # 删除用户
         del config['credentials']['usernames'][username]
-        
-        # 保存配置
-        with open(config_path, 'w', encoding='utf-8') as file:
-            yaml.dump(config, file, default_flow_style=False, allow_unicode=True)
-        
-        return True, f"用户 {username} 删除成功"
+        return True, (True, f"用户 {username} 删除成功")
+    
+    try:
+        return get_credential_store().update(remove_user)
     except Exception as e:
         return False, f"删除用户时出错: {e}"
 
 # 重置用户密码
 def reset_user_password(username, new_password):
-    config_path = os.path.join(os.path.dirname(__file__), 'config.yaml')
-    
     try:
-        # 读取现有配置
-        with open(config_path, 'r', encoding='utf-8') as file:
-            config = yaml.safe_load(file)
-        
         # 检查用户是否存在
-        if username not in config['credentials']['usernames']:
+        if username not in get_credential_store().get_users():
             return False, "用户不存在"
         
-        # 生成新的密码哈希
-        hashed_password = stauth.Hasher([new_password]).generate()[0]
+        # 在进程池中生成新的密码哈希（耗时操作，在加锁之前完成）
+        hashed_password = hash_password_offloaded(new_password)
         
-        # 更新用户密码
-        config['credentials']['usernames'][username]['password'] = hashed_password
-        config['credentials']['usernames'][username]['plain_password'] = new_password
-        
-        # 保存配置
-        with open(config_path, 'w', encoding='utf-8') as file:
-            yaml.dump(config, file, default_flow_style=False, allow_unicode=True)
+        def update_password(config):
+            if username not in config['credentials']['usernames']:
+                return False, (False, "用户不存在")
+            
+            # 更新用户密码
+            config['credentials']['usernames'][username]['password'] = hashed_password
+            config['credentials']['usernames'][username]['plain_password'] = new_password
+            return True, (True, f"用户 {username} 的密码重置成功")
         
-        return True, f"用户 {username} 的密码重置成功"
+        return get_credential_store().update(update_password)
     except Exception as e:
-        return False, f"重置密码时出错: {e}" 
\ No newline at end of file
+        return False, f"重置密码时出错: {e}"
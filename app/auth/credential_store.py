@@ -0,0 +1,76 @@
+import os
+import copy
+import threading
+import yaml
+from app.utils.file_utils import file_lock, atomic_write_text
+
+# 认证配置文件路径
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.yaml')
+
+# 进程内缓存的认证配置：只在文件变化或本进程写入后重新解析
+class CredentialStore:
+    def __init__(self, path=CONFIG_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._config = None
+        self._signature = None
+        self._stats = {'hits': 0, 'loads': 0, 'writes': 0}
+
+    # 文件签名：修改时间和大小
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as file:
+            config = yaml.safe_load(file)
+        self._config = config
+        self._signature = self._file_signature()
+        self._stats['loads'] += 1
+
+    # 获取缓存的配置（只读，调用方不要修改）
+    def _current(self):
+        with self._lock:
+            if self._config is None or self._file_signature() != self._signature:
+                self._load()
+            else:
+                self._stats['hits'] += 1
+            return self._config
+
+    # 获取配置的副本
+    def get_config(self):
+        return copy.deepcopy(self._current())
+
+    # 获取所有用户（只读）
+    def get_users(self):
+        return self._current()['credentials']['usernames']
+
+    # 修改配置：加锁后从磁盘读取最新内容，交给mutator修改，mutator返回(是否写入, 返回值)
+    # 写入使用临时文件+替换，多个会话或进程同时修改时不会丢失用户
+    def update(self, mutator):
+        with self._lock, file_lock(self.path):
+            self._load()
+            config = copy.deepcopy(self._config)
+            changed, result = mutator(config)
+            if changed:
+                atomic_write_text(self.path, yaml.dump(config, default_flow_style=False, allow_unicode=True))
+                self._config = config
+                self._signature = self._file_signature()
+                self._stats['writes'] += 1
+            return result
+
+    # 获取缓存统计
+    def get_stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+_credential_store = None
+_credential_store_lock = threading.Lock()
+
+# 获取进程内共享的认证配置
+def get_credential_store():
+    global _credential_store
+    with _credential_store_lock:
+        if _credential_store is None:
+            _credential_store = CredentialStore()
+        return _credential_store
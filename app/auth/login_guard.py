@@ -0,0 +1,169 @@
+import os
+import hmac
+import time
+import hashlib
+import threading
+from collections import OrderedDict, deque
+import bcrypt
+
+# 每个用户名的令牌桶：最多连续尝试5次，之后每30秒恢复1次
+USER_BUCKET_CAPACITY = 5
+USER_REFILL_SECONDS = 30.0
+# 每个IP的令牌桶：最多连续尝试20次，之后每3秒恢复1次
+IP_BUCKET_CAPACITY = 20
+IP_REFILL_SECONDS = 3.0
+# 同时进行的bcrypt校验数上限，以及等待空位的最长时间（秒）
+MAX_CONCURRENT_CHECKS = max(1, os.cpu_count() or 1)
+CHECK_WAIT_TIMEOUT = 5.0
+# 校验成功结果的缓存时间（秒）和条数
+VERIFY_CACHE_TTL = 600.0
+VERIFY_CACHE_SIZE = 1024
+# 令牌桶最多保留的键数（超出时淘汰最久未使用的）
+MAX_BUCKETS = 10000
+# 保留用于计算延迟分位数的样本数
+LATENCY_SAMPLES = 1000
+
+# Prometheus指标名：各类校验结果的次数和校验延迟分位数
+LOGIN_COUNTER_NAME = 'coating_login_verifications_total'
+LOGIN_LATENCY_NAME = 'coating_login_verify_latency_seconds'
+
+# 校验结果
+VERIFY_OK = 'ok'
+VERIFY_INVALID = 'invalid'
+VERIFY_THROTTLED_USER = 'throttled_user'
+VERIFY_THROTTLED_IP = 'throttled_ip'
+VERIFY_BUSY = 'busy'
+
+# 按键限流的令牌桶集合
+class TokenBucketLimiter:
+    def __init__(self, capacity, refill_seconds, max_keys=MAX_BUCKETS):
+        self.capacity = capacity
+        self.refill_rate = 1.0 / refill_seconds
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # 键 -> [剩余令牌, 上次更新时间]
+        self._lock = threading.Lock()
+
+    # 尝试取一个令牌，成功返回True
+    def acquire(self, key):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
+
+# 登录校验：限流、限制并发bcrypt校验数，并缓存近期校验成功的结果
+class LoginVerifier:
+    def __init__(self):
+        self.user_limiter = TokenBucketLimiter(USER_BUCKET_CAPACITY, USER_REFILL_SECONDS)
+        self.ip_limiter = TokenBucketLimiter(IP_BUCKET_CAPACITY, IP_REFILL_SECONDS)
+        self._slots = threading.BoundedSemaphore(MAX_CONCURRENT_CHECKS)
+        # 缓存键使用进程内随机密钥的HMAC，内存中不保留明文密码
+        self._secret = os.urandom(32)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._stats = {
+            'attempts': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'cache_hits': 0,
+            'rejected_user': 0,
+            'rejected_ip': 0,
+            'rejected_busy': 0,
+        }
+
+    def _cache_key(self, username, password, stored_hash):
+        digest = hmac.new(self._secret, password.encode(), hashlib.sha256).hexdigest()
+        # 存储的哈希变化（如重置密码）后旧缓存自动失效
+        return username, stored_hash, digest
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    # 校验密码，返回(是否通过, 结果)
+    def verify(self, username, password, stored_hash, client_ip=None):
+        started = time.perf_counter()
+        self._count('attempts')
+        key = self._cache_key(username, password, stored_hash)
+
+        # 近期校验成功过的同一密码直接放行，不再计算bcrypt
+        with self._lock:
+            cached_at = self._cache.get(key)
+            if cached_at is not None and time.monotonic() - cached_at < VERIFY_CACHE_TTL:
+                self._cache.move_to_end(key)
+                self._stats['cache_hits'] += 1
+                self._stats['succeeded'] += 1
+                self._latencies.append(time.perf_counter() - started)
+                return True, VERIFY_OK
+
+        if not self.user_limiter.acquire(username):
+            self._count('rejected_user')
+            return False, VERIFY_THROTTLED_USER
+        if client_ip and not self.ip_limiter.acquire(client_ip):
+            self._count('rejected_ip')
+            return False, VERIFY_THROTTLED_IP
+
+        # 限制同时进行的bcrypt校验数，超出时短暂等待，仍无空位则拒绝
+        if not self._slots.acquire(timeout=CHECK_WAIT_TIMEOUT):
+            self._count('rejected_busy')
+            return False, VERIFY_BUSY
+        try:
+            ok = bcrypt.checkpw(password.encode(), stored_hash.encode())
+        finally:
+            self._slots.release()
+
+        with self._lock:
+            self._latencies.append(time.perf_counter() - started)
+            if ok:
+                self._stats['succeeded'] += 1
+                self._cache[key] = time.monotonic()
+                self._cache.move_to_end(key)
+                if len(self._cache) > VERIFY_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            else:
+                self._stats['failed'] += 1
+        return ok, VERIFY_OK if ok else VERIFY_INVALID
+
+    # 获取统计信息，包括校验延迟的p50/p95/p99（毫秒）
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            samples = sorted(self._latencies)
+        for name, q in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+            stats[name] = samples[min(len(samples) - 1, int(q * len(samples)))] * 1000 if samples else 0.0
+        return stats
+
+    # Prometheus文本格式的校验计数（按结果分类）和延迟分位数
+    def export_prometheus(self):
+        stats = self.get_stats()
+        lines = [
+            f'# HELP {LOGIN_COUNTER_NAME} Login verifications by outcome.',
+            f'# TYPE {LOGIN_COUNTER_NAME} counter',
+        ]
+        for name in ('attempts', 'succeeded', 'failed', 'cache_hits', 'rejected_user', 'rejected_ip', 'rejected_busy'):
+            lines.append(f'{LOGIN_COUNTER_NAME}{{outcome="{name}"}} {stats[name]}')
+        lines += [
+            f'# HELP {LOGIN_LATENCY_NAME} Recent login verification latency quantiles in seconds.',
+            f'# TYPE {LOGIN_LATENCY_NAME} gauge',
+        ]
+        for name, q in (('p50_ms', '0.5'), ('p95_ms', '0.95'), ('p99_ms', '0.99')):
+            lines.append(f'{LOGIN_LATENCY_NAME}{{quantile="{q}"}} {stats[name] / 1000:.6f}')
+        return '\n'.join(lines) + '\n'
+
+_login_verifier = None
+_login_verifier_lock = threading.Lock()
+
+# 获取进程内共享的登录校验器
+def get_login_verifier():
+    global _login_verifier
+    with _login_verifier_lock:
+        if _login_verifier is None:
+            _login_verifier = LoginVerifier()
+        return _login_verifier
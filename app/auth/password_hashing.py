@@ -0,0 +1,62 @@
+import os
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 哈希进程池的进程数
+HASH_WORKERS = max(1, os.cpu_count() or 1)
+
+# 生成bcrypt密码哈希（与streamlit_authenticator.Hasher相同：默认成本12）
+# 放在模块顶层，便于进程池中的子进程调用；子进程只需导入bcrypt
+def hash_password(password):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+_hash_pool = None
+_hash_pool_lock = threading.Lock()
+
+# 获取共享的哈希进程池（首次使用时创建，进程退出时关闭）
+# 服务进程中有多个线程（Streamlit/tornado、查询日志写入、数据加载），fork出的子进程可能继承被其他线程持有的锁而卡死，
+# 因此用spawn方式启动子进程，子进程只导入本模块和bcrypt
+def get_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(_hash_pool.shutdown, wait=False)
+        return _hash_pool
+
+# 进程池不可用时丢弃，下次使用时重新创建
+def _reset_hash_pool():
+    global _hash_pool
+    with _hash_pool_lock:
+        if _hash_pool is not None:
+            _hash_pool.shutdown(wait=False)
+        _hash_pool = None
+
+# 在进程池中生成单个密码哈希：页面脚本线程仍会等待哈希完成，只是bcrypt的CPU计算不在服务进程中进行
+def hash_password_offloaded(password):
+    try:
+        return get_hash_pool().submit(hash_password, password).result()
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning("密码哈希进程池不可用，改为直接计算: %s", e)
+        _reset_hash_pool()
+        return hash_password(password)
+
+# 批量生成密码哈希，分摊到所有CPU核心，返回顺序与输入一致
+def hash_passwords(passwords):
+    passwords = list(passwords)
+    if not passwords:
+        return []
+    try:
+        chunksize = max(1, len(passwords) // (HASH_WORKERS * 4))
+        return list(get_hash_pool().map(hash_password, passwords, chunksize=chunksize))
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning("密码哈希进程池不可用，改为直接计算: %s", e)
+        _reset_hash_pool()
+        return [hash_password(password) for password in passwords]
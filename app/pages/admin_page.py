@@ -1,34 +1,43 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import os
 from datetime import datetime, timedelta
-from app.auth.authentication import get_all_query_logs, create_user, get_all_users, delete_user
+from app.auth.authentication import flush_query_logs, create_user, get_all_users, delete_user, bulk_create_users
+from app.utils.log_store import get_query_log_store
+from app.utils.log_export import export_query_logs, available_export_formats, EXPORT_FORMATS, EXPORT_MAX_BYTES
+from app.utils.data_utils import load_chemicals_data, get_invalid_cas_rows, get_dataset_registry
+from app.utils.dataset_upload import get_upload_manager, UPLOAD_STATUS_LABELS, UPLOAD_RUNNING, UPLOAD_FAILED, UPLOAD_ACTIVATED
+from app.utils.result_cache import get_result_cache
+from app.utils.log_sink import get_query_log_sink
+from app.utils.metrics import get_stage_timings
+from app.auth.login_guard import get_login_verifier
+
+# 查询记录列表最多显示的条数
+MAX_DISPLAY_ROWS = 1000
 
 def admin_page():
     st.title("管理员面板")
     
     # 创建标签页
-    tab1, tab2 = st.tabs(["查询记录", "用户管理"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["查询记录", "用户管理", "数据质量", "数据更新", "性能监控"])
     
     with tab1:
         st.header("查询记录")
         
-        # 获取所有查询记录
-        logs_df = get_all_query_logs()
+        # 等待异步队列中的记录写入后再读取
+        flush_query_logs()
+        store = get_query_log_store()
+        
+        # 获取最早和最新日期
+        min_date, max_date = store.date_bounds()
         
-        if logs_df.empty:
+        if min_date is None:
             st.info("暂无查询记录")
         else:
             # 添加日期过滤器
             st.subheader("按日期筛选")
             
-            # 转换日期列为datetime类型
-            logs_df['查询时间'] = pd.to_datetime(logs_df['查询时间'])
-            
-            # 获取最早和最新日期
-            min_date = logs_df['查询时间'].min().date()
-            max_date = logs_df['查询时间'].max().date()
-            
             # 创建日期选择器
             col1, col2 = st.columns(2)
             with col1:
@@ -36,47 +45,68 @@ def admin_page():
             with col2:
                 end_date = st.date_input("结束日期", max_date)
             
-            # 筛选数据
-            filtered_df = logs_df[
-                (logs_df['查询时间'].dt.date >= start_date) & 
-                (logs_df['查询时间'].dt.date <= end_date)
-            ]
-            
-            # 显示筛选后的数据
+            # 显示筛选后的数据（只显示最近的记录，完整记录通过导出获取）
             st.subheader("查询记录列表")
+            total_count = store.count_logs(start_date, end_date)
+            filtered_df = store.query_logs(start_date, end_date, limit=MAX_DISPLAY_ROWS)
+            if total_count > MAX_DISPLAY_ROWS:
+                st.caption(f"共{total_count}条记录，仅显示最近{MAX_DISPLAY_ROWS}条，完整记录请导出。")
             st.dataframe(filtered_df, use_container_width=True)
             
-            # 创建一些统计信息
+            # 创建一些统计信息（来自按日预聚合的统计，不再逐条分组）
             st.subheader("统计信息")
             
             # 按日期统计查询次数
-            daily_counts = filtered_df.groupby(filtered_df['查询时间'].dt.date).size().reset_index(name='查询次数')
-            daily_counts.columns = ['日期', '查询次数']
+            daily_counts = store.daily_counts(start_date, end_date)
             
-            fig1 = px.bar(daily_counts, x='日期', y='查询次数', title='每日查询次数')
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("查询次数", int(daily_counts['查询次数'].sum()))
+            with col2:
+                st.metric("未找到次数", int(daily_counts['未找到次数'].sum()))
+            with col3:
+                st.metric("查询天数", len(daily_counts))
+            
+            fig1 = px.bar(daily_counts, x='日期', y=['查询次数', '未找到次数'], barmode='group', title='每日查询次数')
             st.plotly_chart(fig1, use_container_width=True)
             
             # 按用户统计查询次数
-            user_counts = filtered_df.groupby('用户名').size().reset_index(name='查询次数')
-            user_counts.columns = ['用户', '查询次数']
+            user_counts = store.user_counts(start_date, end_date)
             
             fig2 = px.pie(user_counts, values='查询次数', names='用户', title='用户查询分布')
             st.plotly_chart(fig2, use_container_width=True)
             
-            # 导出功能
-            csv = filtered_df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="导出为CSV",
-                data=csv,
-                file_name=f'查询记录_{datetime.now().strftime("%Y%m%d")}.csv',
-                mime='text/csv',
-            )
+            # 查询最多的CAS号
+            st.subheader("热门查询CAS号")
+            st.dataframe(store.cas_counts(start_date, end_date, limit=20), use_container_width=True, hide_index=True)
+            
+            # 导出功能：点击后才分块生成导出文件，避免每次刷新都在内存中拼出完整CSV
+            # 文件内容不保存在会话状态中，只在本次运行的下载按钮中使用，页面再次运行后即释放
+            st.subheader("导出查询记录")
+            st.caption(f"导出文件最大{EXPORT_MAX_BYTES / 1024 / 1024:.0f} MB，超过时请缩小日期范围。生成后请直接下载，页面刷新后需要重新生成。")
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                export_format = st.selectbox("导出格式", available_export_formats(), key="export_format")
+            if st.button("生成导出文件", key="export_button"):
+                try:
+                    with st.spinner("正在导出..."):
+                        export_data = export_query_logs(store, start_date, end_date, export_format)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    suffix, mime = EXPORT_FORMATS[export_format]
+                    st.download_button(
+                        label=f"下载导出文件（{len(export_data) / 1024:.1f} KB）",
+                        data=export_data,
+                        file_name=f'查询记录_{datetime.now().strftime("%Y%m%d")}{suffix}',
+                        mime=mime,
+                    )
     
     with tab2:
         st.header("用户管理")
         
         # 创建子标签页
-        subtab1, subtab2, subtab3 = st.tabs(["查看用户", "创建新用户", "重置密码"])
+        subtab1, subtab2, subtab3, subtab4 = st.tabs(["查看用户", "创建新用户", "重置密码", "批量导入"])
         
         with subtab1:
             st.subheader("现有用户列表")
@@ -202,5 +232,272 @@ def admin_page():
             else:
                 st.info("暂无用户可重置密码")
 
+        with subtab4:
+            st.subheader("批量导入用户")
+            st.caption("上传包含“用户名、姓名、邮箱、密码”四列的CSV文件。密码哈希在后台进程池中并行计算，所有用户一次性写入。")
+            
+            with st.form("bulk_import_form"):
+                users_file = st.file_uploader("用户列表CSV", type=["csv"], key="bulk_users_file")
+                import_button = st.form_submit_button("导入用户")
+                
+                if import_button:
+                    if users_file is None:
+                        st.warning("请先上传CSV文件")
+                    else:
+                        try:
+                            users_df = pd.read_csv(users_file, dtype=str, encoding='utf-8-sig')
+                        except Exception as e:
+                            st.error(f"无法读取上传的文件: {e}")
+                            users_df = None
+                        
+                        if users_df is not None:
+                            with st.spinner("正在导入用户..."):
+                                success, message, summary = bulk_create_users(users_df)
+                            
+                            if success:
+                                st.success(message)
+                                st.info(f"耗时 {summary['elapsed']:.2f} 秒，处理速度 {summary['users_per_second']:.1f} 用户/秒")
+                                if summary['skipped']:
+                                    st.warning("以下用户未导入：")
+                                    st.dataframe(pd.DataFrame(summary['skipped'], columns=['用户名', '原因']), use_container_width=True, hide_index=True)
+                            else:
+                                st.error(message)
+
+    with tab3:
+        st.header("数据质量")
+        st.caption("加载数据时会校验每一行的CAS号（格式、校验位和是否重复），以下为有问题的行，序号对应数据文件中的数据行。")
+        
+        df = load_chemicals_data()
+        if df is None:
+            st.error("无法加载数据")
+        else:
+            invalid_rows = get_invalid_cas_rows()
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("物质总数", len(df))
+            with col2:
+                st.metric("CAS号有问题的行", len(invalid_rows))
+            
+            if invalid_rows.empty:
+                st.success("所有CAS号均通过校验")
+            else:
+                st.dataframe(invalid_rows, use_container_width=True, hide_index=True)
+
+        dataset_versions_section()
+
+    with tab4:
+        dataset_upload_section()
+
+    with tab5:
+        performance_section()
+
+# 数据版本：当前使用的版本、后台加载状态和保留的旧版本
+def dataset_versions_section():
+    st.subheader("数据版本")
+    st.caption("替换数据文件后，新版本在后台加载并建立索引，完成后自动切换；切换前开始的查询仍使用旧版本完成。查询记录中的“数据版本”列为回答该查询的版本。")
+    registry = get_dataset_registry()
+    stats = registry.get_stats()
+    if stats['loading']:
+        st.info("正在后台加载新版本的数据...")
+    if stats['last_error']:
+        st.error(f"加载新版本失败，继续使用当前版本：{stats['last_error']}")
+
+    versions = registry.get_versions()
+    if versions:
+        table = pd.DataFrame(versions).rename(columns={
+            'version': '版本', 'path': '文件', 'rows': '物质数', 'invalid_cas_rows': 'CAS号有问题的行',
+            'loaded_at': '加载时间', 'activated_at': '启用时间', 'active': '当前版本'
+        })
+        table['文件'] = table['文件'].map(os.path.basename)
+        st.dataframe(table, use_container_width=True, hide_index=True)
+
+# 数据更新：上传新版本的工作簿，后台解析、校验并与当前版本比较，确认后启用
+def dataset_upload_section():
+    st.header("数据更新")
+    st.caption("上传新版本的数据库工作簿后，系统在单独的进程中解析，再在后台校验CAS号和绿色分级、建立索引，并与当前版本逐行比较。确认后才会替换数据文件并切换版本。校验和建立索引在服务进程中进行，工作簿较大时处理期间查询可能稍慢。")
+    manager = get_upload_manager()
+
+    uploaded_file = st.file_uploader("上传数据库工作簿", type=["xlsx"], key="dataset_upload_file")
+    if uploaded_file is not None and st.button("上传并校验", key="dataset_upload_button"):
+        success, message = manager.submit(uploaded_file.name, uploaded_file.getvalue(), st.session_state.get('username', ''))
+        (st.success if success else st.warning)(message)
+
+    job = manager.job
+    if job is None:
+        return
+
+    st.subheader(f"{job.file_name}（{UPLOAD_STATUS_LABELS[job.status]}）")
+    st.caption(f"上传者：{job.uploaded_by or '未知'}，上传时间：{job.created_at:%Y-%m-%d %H:%M:%S}")
+    if job.status == UPLOAD_RUNNING:
+        st.progress(job.progress, text=job.message)
+        # 进度由后台线程更新，点击刷新查看（页面脚本不等待处理完成）
+        st.button("刷新进度", key="dataset_upload_refresh")
+        return
+    if job.status == UPLOAD_FAILED:
+        st.error(f"处理失败：{job.error}")
+        if st.button("清除", key="dataset_upload_clear"):
+            manager.discard()
+            st.rerun()
+        return
+    if job.status == UPLOAD_ACTIVATED:
+        st.success(f"已启用数据版本 {job.dataset.version}")
+        return
+
+    summary = job.summary()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("物质数", summary['rows'])
+    with col2:
+        st.metric("新增物质", summary['added'])
+    with col3:
+        st.metric("删除物质", summary['removed'])
+    with col4:
+        st.metric("分级变化", summary['regraded'])
+    st.caption(f"新版本：{summary['version']}，当前版本：{job.base_version or '无'}")
+
+    if summary['invalid_cas_rows'] or summary['invalid_grade_rows']:
+        st.warning(f"CAS号有问题的行：{summary['invalid_cas_rows']}，绿色分级无效的行：{summary['invalid_grade_rows']}")
+    with st.expander(f"新增物质（{summary['added']}）"):
+        st.dataframe(job.diff['added'], use_container_width=True, hide_index=True)
+    with st.expander(f"删除物质（{summary['removed']}）"):
+        st.dataframe(job.diff['removed'], use_container_width=True, hide_index=True)
+    with st.expander(f"分级变化（{summary['regraded']}）"):
+        st.dataframe(job.diff['regraded'], use_container_width=True, hide_index=True)
+    if summary['invalid_cas_rows']:
+        with st.expander(f"CAS号有问题的行（{summary['invalid_cas_rows']}）"):
+            st.dataframe(job.dataset.invalid_cas_rows, use_container_width=True, hide_index=True)
+    if summary['invalid_grade_rows']:
+        with st.expander(f"绿色分级无效的行（{summary['invalid_grade_rows']}）"):
+            st.dataframe(job.invalid_grade_rows, use_container_width=True, hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("启用该版本", key="dataset_upload_approve", type="primary"):
+            success, message = manager.approve()
+            (st.success if success else st.error)(message)
+    with col2:
+        if st.button("放弃", key="dataset_upload_discard"):
+            manager.discard()
+            st.rerun()
+
+# 各计时阶段的说明
+STAGE_LABELS = {
+    'search_page': "查询页面脚本（整页）",
+    'dataset_load': "获取数据（含缓存命中）",
+    'dataset_parse': "解析工作簿/读取快照",
+    'dataset_index': "建立索引",
+    'search_index_build': "建立候选搜索索引（后台）",
+    'structure_ingest': "提取结构图",
+    'dataset_upload': "处理上传的工作簿",
+    'cas_normalize': "CAS号规范化与校验",
+    'result_lookup': "获取查询结果（含缓存）",
+    'result_prepare': "生成查询结果",
+    'cas_lookup': "CAS号索引查找",
+    'query_log_submit': "提交查询记录",
+    'query_log_write': "写入查询日志（后台）",
+    'batch_query': "批量查询",
+    'api_request': "接口请求",
+}
+
+# 性能监控：各阶段耗时分布、查询结果缓存和查询日志队列
+def performance_section():
+    st.header("性能监控")
+    st.caption("统计本进程启动以来各阶段的耗时，分位数基于每个阶段最近的样本。")
+    
+    timings = get_stage_timings()
+    snapshot = timings.snapshot()
+    if not snapshot:
+        st.info("暂无计时数据")
+    else:
+        rows = [{
+            '阶段': stage,
+            '说明': STAGE_LABELS.get(stage, ''),
+            '次数': stats['count'],
+            '平均(ms)': stats['sum'] / stats['count'] * 1000 if stats['count'] else 0.0,
+            'p50(ms)': stats['p50'] * 1000,
+            'p95(ms)': stats['p95'] * 1000,
+            'p99(ms)': stats['p99'] * 1000,
+            '最大(ms)': stats['max'] * 1000,
+        } for stage, stats in snapshot.items()]
+        st.dataframe(pd.DataFrame(rows).round(3), use_container_width=True, hide_index=True)
+        
+        # 单个阶段的耗时分布
+        stage = st.selectbox("查看耗时分布", list(snapshot), key="timing_stage")
+        buckets = snapshot[stage]['buckets']
+        previous = 0
+        distribution = []
+        for bucket, cumulative in buckets:
+            distribution.append({'耗时上限': f"≤{bucket * 1000:g}ms", '次数': cumulative - previous})
+            previous = cumulative
+        distribution.append({'耗时上限': f">{buckets[-1][0] * 1000:g}ms", '次数': snapshot[stage]['count'] - previous})
+        fig = px.bar(pd.DataFrame(distribution), x='耗时上限', y='次数', title=f"{stage} 耗时分布")
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # 导出Prometheus文本格式
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.download_button(
+                label="下载Prometheus指标",
+                data=timings.export_prometheus() + get_login_verifier().export_prometheus(),
+                file_name="metrics.prom",
+                mime="text/plain",
+                key="metrics_download"
+            )
+        with col2:
+            if st.button("写入指标文件", key="metrics_write_button"):
+                st.success(f"已写入 {timings.write_prometheus_file(extra=get_login_verifier().export_prometheus())}")
+        with col3:
+            if st.button("清空计时数据", key="metrics_reset_button"):
+                timings.reset()
+                st.rerun()
+    
+    # 查询结果缓存（按CAS号和数据版本缓存，数据重新加载后清空）
+    st.subheader("查询结果缓存")
+    cache_stats = get_result_cache().get_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("命中率", f"{cache_stats['hit_rate']:.1%}")
+    with col2:
+        st.metric("命中次数", cache_stats['hits'])
+    with col3:
+        st.metric("未命中次数", cache_stats['misses'])
+    with col4:
+        st.metric("缓存条数", cache_stats['size'])
+    
+    # 查询日志队列
+    st.subheader("查询日志队列")
+    sink_stats = get_query_log_sink().get_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("已写入", sink_stats['written'])
+    with col2:
+        st.metric("待写入", sink_stats['pending'])
+    with col3:
+        st.metric("丢弃", sink_stats['dropped'])
+    with col4:
+        st.metric("最大队列长度", sink_stats['max_queue_depth'])
+    
+    # 登录校验（限流、并发bcrypt校验上限和校验延迟）
+    st.subheader("登录校验")
+    login_stats = get_login_verifier().get_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("校验次数", login_stats['attempts'])
+    with col2:
+        st.metric("成功/失败", f"{login_stats['succeeded']} / {login_stats['failed']}")
+    with col3:
+        st.metric("缓存命中", login_stats['cache_hits'])
+    with col4:
+        st.metric("校验延迟p95(ms)", f"{login_stats['p95_ms']:.1f}")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("按用户限流", login_stats['rejected_user'])
+    with col2:
+        st.metric("按IP限流", login_stats['rejected_ip'])
+    with col3:
+        st.metric("繁忙拒绝", login_stats['rejected_busy'])
+    with col4:
+        st.metric("校验延迟p99(ms)", f"{login_stats['p99_ms']:.1f}")
+
 def render_admin_page():
     admin_page() 
\ No newline at end of file
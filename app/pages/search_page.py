@@ -1,14 +1,30 @@
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 from app.utils.data_utils import (
     load_chemicals_data, 
-    search_chemical_by_cas, 
-    get_toxicity_level_description,
     get_toxicity_level_color,
-    process_structure_image
+    parse_cas_list,
+    read_batch_query_file,
+    search_chemicals_by_cas_list,
+    suggest_chemicals,
+    get_cas_index,
+    get_dataset_version,
+    normalize_cas,
+    MAX_BATCH_SIZE
 )
-from app.auth.authentication import save_query_record
+from app.utils.search_results import get_search_result
+from app.utils.charts import GAUGE_RENDERER
+from app.utils.cas_utils import check_cas_number, CAS_CORRECTED, CAS_INVALID_FORMAT, CAS_INVALID_CHECKSUM, CAS_STATUS_MESSAGES
+from app.auth.authentication import save_query_record, save_query_records
+from app.utils.logger import get_logger
+from app.utils.metrics import timed_stage
+from datetime import datetime
+
+logger = get_logger(__name__)
+
+# 选择候选化学物质：把候选的CAS号填入查询框
+def use_suggested_cas(cas_number):
+    st.session_state.cas_search = cas_number
 
 def search_page(username):
     st.title("涂料行业化学物质绿色分级查询系统")
@@ -22,6 +38,8 @@ def search_page(username):
         st.session_state.last_search_usage = ""
     if "search_performed" not in st.session_state:
         st.session_state.search_performed = False
+    if "last_search_input" not in st.session_state:
+        st.session_state.last_search_input = ""
     
     # 载入数据
     df = load_chemicals_data()
@@ -30,186 +48,170 @@ def search_page(username):
         st.error("无法加载数据，请联系管理员。")
         return
     
-    # 显示列名以便后续处理
-    column_names = df.columns.tolist()
-    print(f"Excel文件的列名: {column_names}")
-    
-    # 定义列名映射（根据实际Excel文件调整）
-    cas_col = 'CAS号'          # CAS号列
-    name_col = '中文名称'       # 名称列
-    toxicity_col = '绿色分级'   # 毒性分级列
-    limit_col = '涂料现行标准限量要求'    # 功能用途列
-    control_col = '我国新污染物相关管理要求' # 管控要求列
-    
-    print(f"使用的列名映射: CAS号:{cas_col}, 名称:{name_col}, 毒性:{toxicity_col},  限量:{limit_col}, 管控要求:{control_col}")
-    
-    # 搜索框
-    st.subheader("请输入查询信息")
-    cas_number = st.text_input("CAS号", key="cas_search", placeholder="请输入化学物质的CAS号")
-    usage_purpose = st.text_input("使用用途", key="usage_search", placeholder="请输入该化学物质的使用用途")
+    # 单个查询和批量查询两种模式
+    single_tab, batch_tab = st.tabs(["单个查询", "批量查询"])
+
+    with single_tab:
+        # 搜索框
+        st.subheader("请输入查询信息")
+        cas_number = st.text_input("CAS号", key="cas_search", placeholder="请输入化学物质的CAS号，也可输入部分CAS号或中文名称查找")
+        
+        # 输入的CAS号不在数据库中时，根据CAS号前缀、相似CAS号或中文名称给出候选
+        if cas_number and get_cas_index(df).get(normalize_cas(cas_number)) is None:
+            suggestions = suggest_chemicals(cas_number, df, limit=5)
+            if suggestions:
+                st.caption("您是否要查询：")
+                suggestion_cols = st.columns(len(suggestions))
+                for col, suggestion in zip(suggestion_cols, suggestions):
+                    with col:
+                        st.button(
+                            f"{suggestion['CAS号']} {suggestion['中文名称']}",
+                            key=f"suggest_{suggestion['CAS号']}",
+                            help=suggestion['匹配方式'],
+                            on_click=use_suggested_cas,
+                            args=(suggestion['CAS号'],)
+                        )
+        
+        usage_purpose = st.text_input("使用用途", key="usage_search", placeholder="请输入该化学物质的使用用途")
     
-    # 提交按钮
-    if st.button("查询", key="search_button", type="primary"):
-        if cas_number and usage_purpose:
-            with st.spinner("正在查询..."):
-                print(f"用户'{username}'正在查询CAS号: {cas_number}")
-                # 查询化学物质
-                result = search_chemical_by_cas(cas_number, df)
+        # 提交按钮
+        if st.button("查询", key="search_button", type="primary"):
+            # 查询前先规范化并校验CAS号；数据库中没有且格式或校验位错误的输入直接提示，不再查询和记录
+            with timed_stage('cas_normalize'):
+                normalized_cas, cas_status = check_cas_number(cas_number)
+            cas_rejected = cas_status in (CAS_INVALID_FORMAT, CAS_INVALID_CHECKSUM) and get_cas_index(df).get(normalized_cas) is None
+            if cas_number and usage_purpose and cas_rejected:
+                st.error(f"❌ {CAS_STATUS_MESSAGES[cas_status]}：`{cas_number}`，请检查后重新输入，或从上方候选中选择。")
+                st.session_state.search_performed = False
+            elif cas_number and usage_purpose:
+                input_cas = cas_number
+                cas_number = normalized_cas
+                with st.spinner("正在查询..."):
+                    logger.debug("用户'%s'正在查询CAS号: %s", username, cas_number)
+                    # 查询化学物质（相同CAS号的结果直接从缓存读取，包括已生成的仪表盘）
+                    result = get_search_result(cas_number, df)
                 
-                # 保存查询结果到session state
-                st.session_state.search_result = result
-                st.session_state.last_search_cas = cas_number
-                st.session_state.last_search_usage = usage_purpose
-                st.session_state.search_performed = True
+                    # 保存查询结果到session state
+                    st.session_state.search_result = result
+                    st.session_state.last_search_cas = cas_number
+                    st.session_state.last_search_usage = usage_purpose
+                    st.session_state.last_search_input = input_cas if cas_status == CAS_CORRECTED else ""
+                    st.session_state.search_performed = True
                 
-                if result:
-                    print(f"查询结果: {result}")
-                    # 获取数据
-                    chemical_name = result.get(name_col, "未知")
-                    toxicity_level = result.get(toxicity_col, "未知")
+                    # 保存查询记录（记录回答本次查询的数据版本）
+                    save_query_record(username, cas_number, result['result_text'], usage_purpose, get_dataset_version(df))
                     
-                    # 构建结果字符串用于记录
-                    result_text = f"{chemical_name} - 毒性分级: {toxicity_level}"
-                    
-                    # 保存查询记录
-                    save_query_record(username, cas_number, result_text, usage_purpose)
-                    
-                else:
-                    # 保存未找到的查询记录
-                    save_query_record(username, cas_number, "未找到结果", usage_purpose)
-                    
-                # 强制重新运行以显示结果
-                st.rerun()
-        else:
-            if not cas_number and not usage_purpose:
-                st.warning("请输入CAS号和使用用途进行查询。")
-            elif not cas_number:
-                st.warning("请输入CAS号。")
-            elif not usage_purpose:
-                st.warning("请输入使用用途。")
+                    # 强制重新运行以显示结果
+                    st.rerun()
+            else:
+                if not cas_number and not usage_purpose:
+                    st.warning("请输入CAS号和使用用途进行查询。")
+                elif not cas_number:
+                    st.warning("请输入CAS号。")
+                elif not usage_purpose:
+                    st.warning("请输入使用用途。")
     
-    # 显示查询结果（从session state读取）
-    if st.session_state.search_performed:
-        result = st.session_state.search_result
-        cas_number = st.session_state.last_search_cas
-        usage_purpose = st.session_state.last_search_usage
+        # 显示查询结果（从session state读取）
+        if st.session_state.search_performed:
+            result = st.session_state.search_result
+            cas_number = st.session_state.last_search_cas
+            usage_purpose = st.session_state.last_search_usage
         
-        # 添加分隔线
-        st.markdown("---")
+            # 添加分隔线
+            st.markdown("---")
+
+            if st.session_state.last_search_input:
+                st.info(f"已将输入的 `{st.session_state.last_search_input}` 自动修正为 `{cas_number}`")
         
-        if result:
-            # 获取数据
-            chemical_name = result.get(name_col, "未知")
-            toxicity_level = result.get(toxicity_col, "未知")
-            limit_req = result.get(limit_col, "暂无信息")
-            control_req = result.get(control_col, "暂无信息")
-            
-            # 获取毒性级别描述和颜色
-            level_desc = get_toxicity_level_description(toxicity_level)
-            level_color = get_toxicity_level_color(toxicity_level)
+            if result['found']:
+                # 获取数据
+                chemical_name = result['chemical_name']
+                toxicity_level = result['toxicity_level']
+                limit_req = result['limit_req']
+                control_req = result['control_req']
+                level_desc = result['level_desc']
             
-            # 显示结果
-            st.success("✅ 查询成功！")
+                # 显示结果
+                st.success("✅ 查询成功！")
             
-            # 创建两列布局
-            col1, col2 = st.columns([1, 1])
+                # 创建两列布局
+                col1, col2 = st.columns([1, 1])
             
-            with col1:
-                # 基本信息卡片
-                st.subheader("📋 基本信息")
-                st.markdown(f"**CAS号**: `{cas_number}`")
-                st.markdown(f"**化学物质名称**: {chemical_name}")                
-                st.markdown(f"**涂料现行标准限量要求**: {limit_req}")
-                st.markdown(f"**我国新污染物相关管理要求**: {control_req}")
+                with col1:
+                    # 基本信息卡片
+                    st.subheader("📋 基本信息")
+                    st.markdown(f"**CAS号**: `{cas_number}`")
+                    st.markdown(f"**化学物质名称**: {chemical_name}")                
+                    st.markdown(f"**涂料现行标准限量要求**: {limit_req}")
+                    st.markdown(f"**我国新污染物相关管理要求**: {control_req}")
+                    # 结构图为加载数据时生成的缩略图，按原尺寸显示，不再缩放或转换格式
+                    if result.get('structure_image'):
+                        st.image(result['structure_image'], caption="化学结构", width=result['structure_width'])
             
-            with col2:
-                # 毒性分级可视化
-                st.subheader("⚠️ 毒性分级")
+                with col2:
+                    # 毒性分级可视化
+                    st.subheader("⚠️ 毒性分级")
                 
-                # 创建仪表盘
-                if toxicity_level and toxicity_level != "未知":
-                    # 将中文数字转为数值
-                    level_map = {"1级": 1, "2级": 2, "3级": 3, "4级": 4}
-                    level_value = level_map.get(toxicity_level, 0)
-                    
-                    if level_value > 0:
-                        gauge_value = level_value
-                        
-                        fig = go.Figure(go.Indicator(
-                            mode = "gauge+number+delta",
-                            value = gauge_value,
-                            domain = {'x': [0, 1], 'y': [0, 1]},
-                            title = {'text': f"毒性级别: {toxicity_level}", 'font': {'size': 24}},
-                            gauge = {
-                                'axis': {'range': [0, 4], 'tickvals': [0, 1, 2, 3, 4], 
-                                        'ticktext': ['', '1级', '2级', '3级', '4级']},
-                                'bar': {'color': level_color},
-                                'steps': [
-                                    {'range': [0, 1], 'color': '#00FF00'},  # 1级 - 绿色
-                                    {'range': [1, 2], 'color': '#FFFF00'},  # 2级 - 黄色
-                                    {'range': [2, 3], 'color': '#FFA500'},  # 3级 - 橙色
-                                    {'range': [3, 4], 'color': '#FF0000'}   # 4级 - 红色
-                                ],
-                                'threshold': {
-                                    'line': {'color': "black", 'width': 4},
-                                    'thickness': 0.75,
-                                    'value': gauge_value
-                                }
-                            }
-                        ))
-                        
-                        fig.update_layout(height=250)
-                        st.plotly_chart(fig, use_container_width=True)
+                    # 显示仪表盘
+                    if toxicity_level and toxicity_level != "未知":
+                        if result['gauge_svg'] is not None and GAUGE_RENDERER == 'svg':
+                            # 静态SVG仪表盘，无需加载图表脚本
+                            st.markdown(result['gauge_svg'], unsafe_allow_html=True)
+                        elif result['gauge_figure'] is not None:
+                            st.plotly_chart(result['gauge_figure'], use_container_width=True)
+                        else:
+                            st.warning(f"毒性级别: {toxicity_level}")
                     else:
-                        st.warning(f"毒性级别: {toxicity_level}")
-                else:
-                    st.warning("未找到毒性级别信息")
+                        st.warning("未找到毒性级别信息")
                 
-                st.info(f"💡 **说明**: {level_desc}")
+                    st.info(f"💡 **说明**: {level_desc}")
             
-        else:
-            # 显示未找到结果的信息
-            st.error(f"❌ 查询结果：未找到CAS号为 `{cas_number}` 的化学物质")
+            else:
+                # 显示未找到结果的信息
+                st.error(f"❌ 查询结果：未找到CAS号为 `{cas_number}` 的化学物质")
             
-            # 创建两列布局显示查询信息和建议
-            col1, col2 = st.columns([1, 1])
+                # 创建两列布局显示查询信息和建议
+                col1, col2 = st.columns([1, 1])
             
-            with col1:
-                st.subheader("🔍 查询信息")
-                st.markdown(f"**查询的CAS号**: `{cas_number}`")
-                st.markdown(f"**使用用途**: {usage_purpose}")
-                st.markdown(f"**查询时间**: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                with col1:
+                    st.subheader("🔍 查询信息")
+                    st.markdown(f"**查询的CAS号**: `{cas_number}`")
+                    st.markdown(f"**使用用途**: {usage_purpose}")
+                    st.markdown(f"**查询时间**: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 
-                st.warning("""
-                **可能的原因：**
-                - CAS号输入错误或格式不正确
-                - 该化学物质不在当前数据库中
-                - 该物质尚未进行绿色分级评估
-                """)
+                    st.warning("""
+                    **可能的原因：**
+                    - CAS号输入错误或格式不正确
+                    - 该化学物质不在当前数据库中
+                    - 该物质尚未进行绿色分级评估
+                    """)
             
-            with col2:
-                st.subheader("📧 获取评估结果")
-                st.info("""
-                **数据库暂无该物质结果**
+                with col2:
+                    st.subheader("📧 获取评估结果")
+                    st.info("""
+                    **数据库暂无该物质结果**
                 
-                如需获取该物质评估结果，请发送邮件至：
+                    如需获取该物质评估结果，请发送邮件至：
                 
-                **📬 liwei@scies.org**
+                    **📬 liwei@scies.org**
                 
-                **邮件中请注明：**
-                - 化学物质名称
-                - CAS号：`{}`
-                - 使用用途：{}
-                - 企业名称
-                """.format(cas_number, usage_purpose))
+                    **邮件中请注明：**
+                    - 化学物质名称
+                    - CAS号：`{}`
+                    - 使用用途：{}
+                    - 企业名称
+                    """.format(cas_number, usage_purpose))
                 
-                st.success("""
-                **✅ 我们将为您：**
-                - 进行专业的绿色分级评估
-                - 提供详细的风险分析报告
-                - 推荐合适的替代方案
-                """)
+                    st.success("""
+                    **✅ 我们将为您：**
+                    - 进行专业的绿色分级评估
+                    - 提供详细的风险分析报告
+                    - 推荐合适的替代方案
+                    """)
     
+    with batch_tab:
+        batch_search_section(username, df)
+
     # 显示一些使用说明
     with st.expander("📖 使用帮助"):
         st.markdown("""
@@ -230,5 +232,92 @@ def search_page(username):
         - **4级**: 高度危害物质，应优先考虑替代 🔴
         """)
 
+# 批量查询中表示CAS号有误的查询结果
+INVALID_CAS_RESULTS = [CAS_STATUS_MESSAGES[CAS_INVALID_FORMAT], CAS_STATUS_MESSAGES[CAS_INVALID_CHECKSUM]]
+
+# 批量查询：上传配方清单或粘贴CAS号列表，一次得到全部分级结果
+def batch_search_section(username, df):
+    st.subheader("批量查询")
+    st.caption(f"上传包含CAS号列的CSV/XLSX文件（可选“使用用途”列），或直接粘贴CAS号列表。单次最多{MAX_BATCH_SIZE}条。")
+
+    if "batch_result" not in st.session_state:
+        st.session_state.batch_result = None
+
+    uploaded_file = st.file_uploader("上传配方清单", type=["csv", "xlsx"], key="batch_file")
+    pasted_text = st.text_area("或粘贴CAS号列表", key="batch_text", placeholder="每行一个CAS号，也可用逗号或空格分隔")
+    batch_usage = st.text_input("使用用途", key="batch_usage", placeholder="清单中未填写使用用途时使用此处的内容")
+
+    if st.button("批量查询", key="batch_search_button", type="primary"):
+        # 汇总上传文件和粘贴内容中的CAS号
+        batch = pd.DataFrame(columns=['CAS号', '使用用途'])
+        if uploaded_file is not None:
+            try:
+                batch = read_batch_query_file(uploaded_file, uploaded_file.name)
+            except Exception as e:
+                st.error(f"无法读取上传的文件: {e}")
+                return
+        pasted = parse_cas_list(pasted_text)
+        if pasted:
+            batch = pd.concat([batch, pd.DataFrame({'CAS号': pasted, '使用用途': ''})], ignore_index=True)
+
+        if batch.empty:
+            st.warning("请上传文件或粘贴CAS号。")
+        elif not batch_usage and (batch['使用用途'].fillna('') == '').any():
+            st.warning("请输入使用用途。")
+        else:
+            if len(batch) > MAX_BATCH_SIZE:
+                st.warning(f"共{len(batch)}条，超出单次上限，仅查询前{MAX_BATCH_SIZE}条。")
+                batch = batch.head(MAX_BATCH_SIZE)
+            usages = batch['使用用途'].fillna('').replace('', batch_usage)
+
+            with st.spinner("正在批量查询..."), timed_stage('batch_query'):
+                result = search_chemicals_by_cas_list(batch['CAS号'], df, usages)
+                # 整批记录一次写入查询日志（CAS号格式或校验位错误的行不记录）
+                logged = result[~result['查询结果'].isin(INVALID_CAS_RESULTS)]
+                save_query_records(username, list(zip(logged['CAS号'], logged['查询结果'], logged['使用用途'])), get_dataset_version(df))
+            st.session_state.batch_result = result
+
+    result = st.session_state.batch_result
+    if result is None:
+        return
+
+    st.markdown("---")
+    invalid = result['查询结果'].isin(INVALID_CAS_RESULTS)
+    found = (result['查询结果'] != '未找到结果') & ~invalid
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("查询条数", len(result))
+    with col2:
+        st.metric("找到", int(found.sum()))
+    with col3:
+        st.metric("未找到", int((~found & ~invalid).sum()))
+    with col4:
+        st.metric("CAS号有误", int(invalid.sum()))
+
+    # 按分级统计
+    grade_counts = result.loc[found, '绿色分级'].value_counts()
+    grade_cols = st.columns(4)
+    for col, level in zip(grade_cols, ["1级", "2级", "3级", "4级"]):
+        with col:
+            st.metric(f"{level}物质", int(grade_counts.get(level, 0)))
+
+    # 按分级着色显示结果表
+    styled = result.style.map(
+        lambda level: f"background-color: {get_toxicity_level_color(level)}" if level in ("1级", "2级", "3级", "4级") else "",
+        subset=['绿色分级']
+    )
+    st.dataframe(styled, use_container_width=True, hide_index=True)
+
+    # 导出结果（带BOM便于Excel直接打开中文）
+    st.download_button(
+        label="导出批量查询结果",
+        data=result.to_csv(index=False).encode('utf-8-sig'),
+        file_name=f'批量查询结果_{datetime.now().strftime("%Y%m%d%H%M%S")}.csv',
+        mime='text/csv',
+        key="batch_download"
+    )
+
+# 整个查询页面脚本的耗时（包括各阶段和Streamlit组件渲染）
 def render_search_page(username):
-    search_page(username) 
\ No newline at end of file
+    with timed_stage('search_page'):
+        search_page(username) 
\ No newline at end of file
@@ -0,0 +1,75 @@
+import re
+import unicodedata
+
+# 标准CAS号格式：2-7位数字-2位数字-1位校验位
+CAS_PATTERN = re.compile(r'^(\d{2,7})-(\d{2})-(\d)$')
+# 只由数字和连字符组成的输入（连字符位置可能不对）
+CAS_LIKE_PATTERN = re.compile(r'^[\d-]+$')
+# 各种连字符、破折号和减号
+DASHES = re.compile(r'[‐‑‒–—―−﹘﹣－]')
+# 空白字符
+WHITESPACE = re.compile(r'\s+')
+
+# 校验结果：normalized只统一了写法（全角、连字符样式、空白、前导零），corrected重新加了缺失或位置不对的连字符
+CAS_VALID = 'valid'
+CAS_NORMALIZED = 'normalized'
+CAS_CORRECTED = 'corrected'
+CAS_INVALID_FORMAT = 'invalid_format'
+CAS_INVALID_CHECKSUM = 'invalid_checksum'
+
+# 校验结果的说明
+CAS_STATUS_MESSAGES = {
+    CAS_VALID: "CAS号格式正确",
+    CAS_NORMALIZED: "已统一CAS号写法",
+    CAS_CORRECTED: "已自动修正CAS号格式",
+    CAS_INVALID_FORMAT: "CAS号格式错误",
+    CAS_INVALID_CHECKSUM: "CAS号校验位错误",
+}
+
+# 只统一写法：全角转半角、统一连字符、去除空白，标准格式的CAS号再去掉第一段的前导零
+def _uniform_cas(text):
+    compact = WHITESPACE.sub('', DASHES.sub('-', text))
+    match = CAS_PATTERN.match(compact)
+    if match and match.group(1).startswith('0') and len(match.group(1).lstrip('0')) >= 2:
+        return f"{match.group(1).lstrip('0')}-{match.group(2)}-{match.group(3)}"
+    return compact
+
+# 规范化CAS号：全角转半角、统一连字符、去除空白和前导零，并按标准格式重新加连字符
+# 不像CAS号的输入（如中文名称）只做全角转半角和去除首尾空白
+def normalize_cas(cas_number):
+    if cas_number is None:
+        return ""
+    text = unicodedata.normalize('NFKC', str(cas_number)).strip()
+    compact = _uniform_cas(text)
+    if not CAS_LIKE_PATTERN.match(compact):
+        return text
+    if CAS_PATTERN.match(compact):
+        return compact
+    # 连字符缺失或位置不对时，根据数字位数重新格式化
+    digits = compact.replace('-', '').lstrip('0')
+    if not 5 <= len(digits) <= 10:
+        return compact
+    return f"{digits[:-3]}-{digits[-3:-1]}-{digits[-1]}"
+
+# 计算CAS号的校验位：除校验位外的数字从右往左依次乘以1、2、3……求和后取个位
+def cas_check_digit(digits):
+    return sum(i * int(d) for i, d in enumerate(reversed(digits), 1)) % 10
+
+# 判断CAS号（已规范化）是否合法
+def validate_cas(cas_number):
+    match = CAS_PATTERN.match(cas_number or '')
+    if not match:
+        return CAS_INVALID_FORMAT
+    if cas_check_digit(match.group(1) + match.group(2)) != int(match.group(3)):
+        return CAS_INVALID_CHECKSUM
+    return CAS_VALID
+
+# 规范化并校验输入的CAS号，返回(规范化后的CAS号, 校验结果)
+# 只统一了写法的输入记为normalized，重新加了连字符的输入才记为corrected
+def check_cas_number(cas_number):
+    normalized = normalize_cas(cas_number)
+    status = validate_cas(normalized)
+    text = str(cas_number or '').strip()
+    if status == CAS_VALID and normalized != text:
+        status = CAS_NORMALIZED if _uniform_cas(unicodedata.normalize('NFKC', text)) == normalized else CAS_CORRECTED
+    return normalized, status
@@ -0,0 +1,94 @@
+import os
+import math
+import threading
+
+# 分级对应的数值
+LEVEL_VALUES = {"1级": 1, "2级": 2, "3级": 3, "4级": 4}
+# 分级对应的颜色（与get_toxicity_level_color一致）
+LEVEL_COLORS = {"1级": "#00FF00", "2级": "#FFFF00", "3级": "#FFA500", "4级": "#FF0000"}
+
+# 仪表盘的显示方式：plotly（交互图表）或svg（静态图片，无需加载图表脚本，页面更轻）
+GAUGE_RENDERER = os.environ.get('GAUGE_RENDERER', 'plotly').lower()
+
+# 毒性分级仪表盘（Plotly在第一次生成图表时才导入）
+def build_toxicity_gauge(toxicity_level, level_color):
+    import plotly.graph_objects as go
+
+    gauge_value = LEVEL_VALUES.get(toxicity_level, 0)
+    fig = go.Figure(go.Indicator(
+        mode = "gauge+number+delta",
+        value = gauge_value,
+        domain = {'x': [0, 1], 'y': [0, 1]},
+        title = {'text': f"毒性级别: {toxicity_level}", 'font': {'size': 24}},
+        gauge = {
+            'axis': {'range': [0, 4], 'tickvals': [0, 1, 2, 3, 4],
+                    'ticktext': ['', '1级', '2级', '3级', '4级']},
+            'bar': {'color': level_color},
+            'steps': [
+                {'range': [0, 1], 'color': '#00FF00'},  # 1级 - 绿色
+                {'range': [1, 2], 'color': '#FFFF00'},  # 2级 - 黄色
+                {'range': [2, 3], 'color': '#FFA500'},  # 3级 - 橙色
+                {'range': [3, 4], 'color': '#FF0000'}   # 4级 - 红色
+            ],
+            'threshold': {
+                'line': {'color': "black", 'width': 4},
+                'thickness': 0.75,
+                'value': gauge_value
+            }
+        }
+    ))
+    fig.update_layout(height=250)
+    return fig
+
+# 仪表盘上数值对应的坐标（0在左端，4在右端）
+def _gauge_point(value, radius, cx=150, cy=185):
+    angle = math.pi * (1 - value / 4)
+    return cx + radius * math.cos(angle), cy - radius * math.sin(angle)
+
+# 仪表盘上从start到end的一段色带
+def _gauge_band(start, end, outer, inner, color):
+    x0, y0 = _gauge_point(start, outer)
+    x1, y1 = _gauge_point(end, outer)
+    x2, y2 = _gauge_point(end, inner)
+    x3, y3 = _gauge_point(start, inner)
+    return (f'<path d="M{x0:.1f},{y0:.1f} A{outer},{outer} 0 0 1 {x1:.1f},{y1:.1f} '
+            f'L{x2:.1f},{y2:.1f} A{inner},{inner} 0 0 0 {x3:.1f},{y3:.1f} Z" fill="{color}"/>')
+
+# 静态SVG仪表盘：与Plotly仪表盘的色带、指示条和刻度一致
+def build_toxicity_gauge_svg(toxicity_level, level_color):
+    gauge_value = LEVEL_VALUES.get(toxicity_level, 0)
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 300 250" width="100%" height="250" font-family="sans-serif">']
+    parts.append(f'<text x="150" y="24" text-anchor="middle" font-size="20">毒性级别: {toxicity_level}</text>')
+    for level, value in LEVEL_VALUES.items():
+        parts.append(_gauge_band(value - 1, value, 120, 70, LEVEL_COLORS[level]))
+    # 当前分级的指示条
+    if gauge_value > 0:
+        parts.append(_gauge_band(0, gauge_value, 105, 85, level_color).replace('/>', ' stroke="#444" stroke-width="0.5"/>'))
+        x0, y0 = _gauge_point(gauge_value, 62)
+        x1, y1 = _gauge_point(gauge_value, 124)
+        parts.append(f'<line x1="{x0:.1f}" y1="{y0:.1f}" x2="{x1:.1f}" y2="{y1:.1f}" stroke="black" stroke-width="4"/>')
+    for level, value in LEVEL_VALUES.items():
+        x, y = _gauge_point(value, 136)
+        parts.append(f'<text x="{x:.1f}" y="{y:.1f}" text-anchor="middle" font-size="12">{level}</text>')
+    parts.append(f'<text x="150" y="180" text-anchor="middle" font-size="44">{gauge_value}</text>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+# 只有四种分级，一次性生成全部仪表盘，之后每次显示直接复用
+# SVG仪表盘在启动时生成；Plotly图表在第一次使用时生成，使用SVG仪表盘时不会导入Plotly
+GAUGE_SVGS = {level: build_toxicity_gauge_svg(level, LEVEL_COLORS[level]) for level in LEVEL_VALUES}
+
+_gauge_figures = None
+_gauge_figures_lock = threading.Lock()
+
+# 获取分级对应的预生成仪表盘（Plotly图表），未知分级返回None
+def get_toxicity_gauge(toxicity_level):
+    global _gauge_figures
+    with _gauge_figures_lock:
+        if _gauge_figures is None:
+            _gauge_figures = {level: build_toxicity_gauge(level, LEVEL_COLORS[level]) for level in LEVEL_VALUES}
+    return _gauge_figures.get(toxicity_level)
+
+# 获取分级对应的预生成仪表盘（SVG），未知分级返回None
+def get_toxicity_gauge_svg(toxicity_level):
+    return GAUGE_SVGS.get(toxicity_level)
@@ -0,0 +1,137 @@
+import gc
+import sys
+from collections.abc import Mapping
+from types import MappingProxyType
+import pandas as pd
+
+# 应用使用的列（查询页面、批量查询、查询接口和数据校验只用到这些列），加载时只保留这些列
+DATASET_COLUMNS = ['序号', 'CAS号', '中文名称', '绿色分级', '涂料现行标准限量要求', '我国新污染物相关管理要求']
+# 取值重复较多、按字典编码（pandas分类类型）存储的列：绿色分级和法规要求文字
+CATEGORY_COLUMNS = ['绿色分级', '涂料现行标准限量要求', '我国新污染物相关管理要求']
+
+# 记录中缺少的列
+_ABSENT = object()
+
+# 只读的化学物质记录：按列名固定的槽位存储，没有每条记录的字典；用法与只读字典相同（get、items、dict(record)）
+class ChemicalRecord(Mapping):
+    __slots__ = tuple(DATASET_COLUMNS)
+
+    def __init__(self, values):
+        for field in self.__slots__:
+            object.__setattr__(self, field, values.get(field, _ABSENT))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ChemicalRecord是只读的")
+
+    def __getitem__(self, key):
+        value = getattr(self, key, _ABSENT) if key in self.__slots__ else _ABSENT
+        if value is _ABSENT:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return (field for field in self.__slots__ if getattr(self, field) is not _ABSENT)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"ChemicalRecord({dict(self)!r})"
+
+# 紧凑的数据表：只保留使用的列，分级和法规要求文字转为分类类型（每种取值只存一份，行中只存编码）
+def compact_chemicals_frame(df):
+    df = df[[col for col in DATASET_COLUMNS if col in df.columns]].copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+# 按行生成记录；分类列的取值直接引用分类中的同一个字符串对象
+def iter_records(df):
+    columns = df.columns.tolist()
+    for values in zip(*(df[col].tolist() for col in columns)):
+        yield ChemicalRecord(dict(zip(columns, values)))
+
+# 对象图占用的字节数：同一对象只计一次，因此数据表和记录共享的字符串不会重复计算
+def deep_sizeof(*roots):
+    seen = set()
+    total = 0
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, pd.DataFrame):
+            # 数据表按列计算：数值列的数组、对象列的指针数组及其元素、分类列的编码及分类取值
+            for _, series in obj.items():
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    total += series.cat.codes.to_numpy().nbytes + series.cat.categories.to_numpy().nbytes
+                    stack.extend(series.cat.categories)
+                else:
+                    values = series.to_numpy()
+                    total += values.nbytes
+                    if values.dtype == object:
+                        stack.extend(values)
+            continue
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total
+
+# 旧的内存表示：读取的全部列（对象类型字符串）和每条记录一个只读字典的CAS号索引
+def legacy_representation(raw_df, cas_col='CAS号'):
+    index = {}
+    for record in raw_df.to_dict('records'):
+        index.setdefault(record.get(cas_col), MappingProxyType(record))
+    return raw_df, MappingProxyType(index)
+
+# 紧凑的内存表示：紧凑数据表和槽位记录的CAS号索引
+def compact_representation(raw_df, cas_col='CAS号'):
+    df = compact_chemicals_frame(raw_df)
+    index = {}
+    for record in iter_records(df):
+        index.setdefault(record.get(cas_col), record)
+    return df, MappingProxyType(index)
+
+# 比较两种表示每种物质占用的字节数（不含两者相同的搜索索引）
+def memory_report(raw_df, cas_col='CAS号'):
+    rows = max(len(raw_df), 1)
+    report = {'rows': len(raw_df)}
+    for name, build in (('before', legacy_representation), ('after', compact_representation)):
+        df, index = build(raw_df, cas_col)
+        total = deep_sizeof(df, index)
+        report[name] = {
+            'columns': df.columns.tolist(),
+            'frame_bytes': deep_sizeof(df),
+            'index_bytes': deep_sizeof(index),
+            'total_bytes': total,
+            'bytes_per_substance': total / rows,
+        }
+    report['ratio'] = report['after']['total_bytes'] / report['before']['total_bytes'] if report['before']['total_bytes'] else 0.0
+    return report
+
+# 命令行输出内存占用报告：python -m app.utils.compact_store [工作簿路径]
+def main(argv=None):
+    from app.utils.data_utils import DATA_PATH, CAS_COL, compute_file_hash
+    from app.utils.cas_utils import normalize_cas
+    from app.utils.snapshot import load_snapshot
+
+    argv = sys.argv[1:] if argv is None else argv
+    workbook_path = argv[0] if argv else DATA_PATH
+    # 与应用加载数据的方式相同：优先读取快照，否则解析Excel
+    raw_df = load_snapshot(workbook_path, compute_file_hash(workbook_path))
+    if raw_df is None:
+        raw_df = pd.read_excel(workbook_path)
+    raw_df[CAS_COL] = raw_df[CAS_COL].map(normalize_cas)
+    report = memory_report(raw_df, CAS_COL)
+
+    print(f"物质数: {report['rows']}")
+    for name, label in (('before', "改进前"), ('after', "改进后")):
+        item = report[name]
+        print(f"{label}: 数据表 {item['frame_bytes'] / 1024:.1f} KiB，记录索引 {item['index_bytes'] / 1024:.1f} KiB，"
+              f"合计 {item['total_bytes'] / 1024:.1f} KiB，每种物质 {item['bytes_per_substance']:.0f} 字节（{len(item['columns'])}列）")
+    print(f"改进后/改进前: {report['ratio']:.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,53 +1,427 @@
 import pandas as pd
 import os
-from PIL import Image
-import io
-import base64
-
-# 读取Excel数据文件
-def load_chemicals_data():
-    data_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '涂料系统数据库-V1.1.xlsx')
-    try:
-        df = pd.read_excel(data_path)
-        print(f"成功加载数据，共{len(df)}行, 列名为: {df.columns.tolist()}")
-        # 打印前几行数据以供调试
-        print("数据前3行:")
-        print(df.head(3))
-        return df
-    except Exception as e:
-        print(f"加载数据时出错: {e}")
+import threading
+import hashlib
+from datetime import datetime
+import re
+from types import MappingProxyType
+from app.utils.snapshot import load_snapshot, write_snapshot
+from app.utils.search_index import ChemicalSearchIndex
+from app.utils.compact_store import compact_chemicals_frame, iter_records
+from app.utils.structure_images import get_structure_cache
+from app.utils.result_cache import get_result_cache
+from app.utils.logger import get_logger
+from app.utils.metrics import timed, timed_stage
+from app.utils.cas_utils import normalize_cas, check_cas_number, validate_cas, CAS_VALID, CAS_NORMALIZED, CAS_CORRECTED, CAS_STATUS_MESSAGES
+
+logger = get_logger(__name__)
+
+# 化学物质数据库文件路径
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '涂料系统数据库-V1.1.xlsx')
+
+# CAS号所在列
+CAS_COL = 'CAS号'
+
+# 切换版本后保留的最近版本数（包括当前版本）：切换前开始的查询可以继续使用旧版本的索引直至结束
+RETAINED_VERSIONS = 3
+
+# 计算文件内容哈希
+def compute_file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+# 检查数据中的CAS号：格式错误、校验位错误或重复的行（序号从1开始，对应Excel中的数据行）
+def find_invalid_cas_rows(df):
+    rows = []
+    seen = set()
+    for position, cas_number in enumerate(df[CAS_COL]):
+        status = validate_cas(cas_number)
+        if status != CAS_VALID:
+            reason = CAS_STATUS_MESSAGES[status]
+        elif cas_number in seen:
+            reason = "CAS号重复"
+        else:
+            seen.add(cas_number)
+            continue
+        name = df['中文名称'].iat[position] if '中文名称' in df.columns else ''
+        rows.append({'序号': position + 1, 'CAS号': cas_number, '中文名称': '' if pd.isna(name) else name, '问题': reason})
+    return pd.DataFrame(rows, columns=['序号', 'CAS号', '中文名称', '问题'])
+
+# 构建CAS号索引：CAS号 -> 只读的槽位记录（只包含使用的列），重复CAS号保留第一条
+def build_cas_index(df):
+    index = {}
+    for record in iter_records(df):
+        index.setdefault(normalize_cas(record.get(CAS_COL)), record)
+    return MappingProxyType(index)
+
+# 一个版本的化学物质数据：解析后的数据和加载时建立的索引，切换为当前版本后不再修改
+# 文件的修改时间和大小由DatasetRegistry记录，文件只是修改时间变化时不需要修改已共享的版本
+# version为工作簿内容哈希的前12位，记录在查询日志中
+# 候选搜索索引不在加载时建立：切换为当前版本后在后台线程中建立，或在第一次需要候选时建立
+class Dataset:
+    def __init__(self, df, path, file_hash, stat, cas_index, invalid_cas_rows, structures):
+        self.df = df
+        self.path = path
+        self.hash = file_hash
+        self.version = file_hash[:12]
+        self.stat = stat
+        self.cas_index = cas_index
+        self._search_index = None
+        self._search_index_lock = threading.Lock()
+        self.invalid_cas_rows = invalid_cas_rows
+        # CAS号 -> 结构图缩略图在缓存中的位置
+        self.structures = structures
+        self.loaded_at = datetime.now()
+        self.activated_at = None
+
+    @property
+    def search_index(self):
+        with self._search_index_lock:
+            if self._search_index is None:
+                with timed_stage('search_index_build'):
+                    self._search_index = ChemicalSearchIndex(self.cas_index.values(), cas_col=CAS_COL)
+            return self._search_index
+
+    # 在后台线程中建立候选搜索索引，第一个需要候选的查询不必等待
+    def build_search_index_async(self):
+        threading.Thread(target=lambda: self.search_index, name='search-index', daemon=True).start()
+
+    def info(self):
+        return {
+            'version': self.version,
+            'path': self.path,
+            'rows': len(self.df),
+            'invalid_cas_rows': len(self.invalid_cas_rows),
+            'structures': len(self.structures),
+            'loaded_at': self.loaded_at,
+            'activated_at': self.activated_at,
+        }
+
+# 解析数据文件并建立索引，得到新版本的数据（不影响正在使用的版本）；已解析的数据（如上传时在子进程中解析）可通过df传入
+def build_dataset(data_path, stat=None, file_hash=None, df=None):
+    stat = stat or os.stat(data_path)
+    file_hash = file_hash or compute_file_hash(data_path)
+    # 优先使用与工作簿哈希一致的二进制快照，否则解析Excel并生成快照
+    if df is None:
+        with timed_stage('dataset_parse'):
+            df = load_snapshot(data_path, file_hash)
+            if df is None:
+                df = pd.read_excel(data_path)
+                write_snapshot(df, data_path, file_hash)
+    # 结构图在加载时一次性提取为缩略图（按工作簿版本缓存），之后直接读取缓存中的图像
+    with timed_stage('structure_ingest'):
+        df[CAS_COL] = df[CAS_COL].map(normalize_cas)
+        structures = get_structure_cache().ingest(data_path, file_hash, df, cas_col=CAS_COL)
+    # 加载时一次性规范化CAS号、转为紧凑表示（只保留使用的列，分级和法规要求文字按字典编码）并建立索引
+    with timed_stage('dataset_index'):
+        df = compact_chemicals_frame(df)
+        cas_index = build_cas_index(df)
+        invalid_cas_rows = find_invalid_cas_rows(df)
+
+    logger.info("成功加载数据 %s，共%d行", os.path.basename(data_path), len(df))
+    logger.debug("列名: %s\n数据前3行:\n%s", df.columns.tolist(), df.head(3))
+    if not invalid_cas_rows.empty:
+        logger.warning("数据中有%d行CAS号不合法或重复", len(invalid_cas_rows))
+    return Dataset(df, data_path, file_hash, stat, cas_index, invalid_cas_rows, structures)
+
+# 进程级数据版本管理：所有会话共享当前版本
+# 首次加载在请求中同步完成；之后文件变化时由后台线程解析新版本并建立索引，完成后一次引用替换切换为当前版本，
+# 切换前开始的查询继续使用旧版本，不会中断会话
+class DatasetRegistry:
+    def __init__(self, retained_versions=RETAINED_VERSIONS):
+        self.retained_versions = retained_versions
+        self._lock = threading.Lock()
+        self._active = None
+        self._retained = []
+        self._checked = None     # 当前版本对应的数据文件(路径, 修改时间, 大小)，在锁内整体替换，读取不加锁
+        self._loading = None     # 后台正在加载的(路径, 修改时间, 大小)
+        self._failed = None      # 上次加载失败的(路径, 修改时间, 大小)，文件再次变化前不重试
+        self._last_error = None
+        # hits使用已加载的版本，misses同步加载，reloads后台加载并切换，hash_checks修改时间变化时的内容校验
+        self._stats = {'hits': 0, 'misses': 0, 'reloads': 0, 'hash_checks': 0}
+
+    # 当前版本（读取不加锁，切换是一次引用赋值）
+    @property
+    def active(self):
+        return self._active
+
+    # 获取数据文件对应的版本；文件变化时在后台加载新版本，本次仍返回当前版本
+    def get(self, data_path):
+        try:
+            stat = os.stat(data_path)
+        except OSError as e:
+            logger.error("加载数据时出错: %s", e)
+            # 文件暂时不可用（例如正在替换）时继续使用已加载的数据
+            return self._active
+
+        dataset = self._active
+        if dataset is not None and dataset.path == data_path:
+            if self._checked != (data_path, stat.st_mtime_ns, stat.st_size):
+                self.load_async(data_path, stat)
+            with self._lock:
+                self._stats['hits'] += 1
+            return dataset
+
+        # 尚无可用数据（首次加载或指定了其他文件）时只能同步加载
+        with self._lock:
+            dataset = self._active
+            if dataset is not None and dataset.path == data_path:
+                self._stats['hits'] += 1
+                return dataset
+            try:
+                dataset = build_dataset(data_path, stat)
+            except Exception as e:
+                logger.exception("加载数据时出错: %s", e)
+                self._last_error = str(e)
+                return None
+            self._stats['misses'] += 1
+            self._activate_locked(dataset, stat)
+            return dataset
+
+    # 在后台线程中加载新版本，加载完成后自动切换；已有加载任务或该文件状态上次加载失败时不重复加载
+    def load_async(self, data_path, stat=None):
+        try:
+            stat = stat or os.stat(data_path)
+        except OSError as e:
+            logger.error("加载数据时出错: %s", e)
+            return False
+        key = (data_path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._loading is not None or key == self._failed:
+                return False
+            self._loading = key
+        threading.Thread(target=self._load_in_background, args=(data_path, stat, key), name='dataset-loader', daemon=True).start()
+        return True
+
+    def _load_in_background(self, data_path, stat, key):
+        try:
+            current = self._active
+            file_hash = compute_file_hash(data_path)
+            if current is not None and current.path == data_path:
+                with self._lock:
+                    self._stats['hash_checks'] += 1
+                # 只有修改时间变化、内容未变时无需重新解析，只记录新的修改时间和大小
+                if file_hash == current.hash:
+                    with self._lock:
+                        if self._active is current:
+                            self._checked = key
+                    return
+            dataset = build_dataset(data_path, stat, file_hash)
+            with self._lock:
+                self._stats['reloads'] += 1
+                self._activate_locked(dataset, stat)
+        except Exception as e:
+            logger.exception("后台加载数据时出错: %s", e)
+            with self._lock:
+                self._failed = key
+                self._last_error = str(e)
+        finally:
+            with self._lock:
+                self._loading = None
+
+    # 切换为指定版本（例如管理员确认后的新工作簿），stat为数据文件当前的状态，默认使用加载时的状态
+    def activate(self, dataset, stat=None):
+        with self._lock:
+            self._activate_locked(dataset, stat)
+
+    def _activate_locked(self, dataset, stat=None):
+        stat = stat or dataset.stat
+        previous = self._active
+        self._checked = (dataset.path, stat.st_mtime_ns, stat.st_size)
+        dataset.activated_at = datetime.now()
+        self._retained = [dataset] + [item for item in self._retained if item is not dataset][:self.retained_versions - 1]
+        self._active = dataset
+        self._failed = None
+        self._last_error = None
+        dataset.build_search_index_async()
+        if previous is not None and previous is not dataset:
+            logger.info("数据版本已从 %s 切换为 %s", previous.version, dataset.version)
+            # 结果缓存按版本区分，旧版本的结果不会再被新请求使用，直接清空释放内存
+            get_result_cache().clear()
+
+    # 查找数据框所属的版本（当前版本或保留的旧版本），不是共享数据时返回None
+    def find(self, df):
+        if df is None:
+            return None
+        for dataset in self._retained:
+            if dataset.df is df:
+                return dataset
+        return None
+
+    # 清空所有版本，下次获取时重新同步加载（基准测试测量冷启动时使用）
+    def clear(self):
+        with self._lock:
+            self._active = None
+            self._retained = []
+            self._checked = None
+            self._failed = None
+        get_result_cache().clear()
+
+    def get_versions(self):
+        active = self._active
+        return [dict(dataset.info(), active=dataset is active) for dataset in list(self._retained)]
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            active = self._active
+            stats['loading'] = self._loading is not None
+            stats['last_error'] = self._last_error
+        stats['version'] = active.version if active else None
+        stats['loaded_at'] = active.loaded_at if active else None
+        stats['rows'] = len(active.df) if active else 0
+        return stats
+
+_dataset_registry = None
+_dataset_registry_lock = threading.Lock()
+
+# 获取进程内共享的数据版本管理
+def get_dataset_registry():
+    global _dataset_registry
+    with _dataset_registry_lock:
+        if _dataset_registry is None:
+            _dataset_registry = DatasetRegistry()
+        return _dataset_registry
+
+# 获取当前版本的数据（含索引），data_path默认为DATA_PATH，基准测试等场景可指定其他文件
+def get_current_dataset(data_path=None):
+    return get_dataset_registry().get(data_path or DATA_PATH)
+
+# 读取Excel数据文件（进程内缓存，文件变化时在后台加载新版本并切换）
+@timed('dataset_load')
+def load_chemicals_data(data_path=None):
+    dataset = get_current_dataset(data_path)
+    return None if dataset is None else dataset.df
+
+# 清空数据缓存，下次加载时重新读取文件（基准测试测量冷启动时使用）
+def clear_dataset_cache():
+    get_dataset_registry().clear()
+
+# 获取数据缓存的统计信息
+def get_dataset_cache_stats():
+    return get_dataset_registry().get_stats()
+
+# 获取数据的版本（工作簿内容哈希前12位），不是共享数据时返回None
+def get_dataset_version(df):
+    dataset = get_dataset_registry().find(df)
+    return None if dataset is None else dataset.version
+
+# 获取当前版本中CAS号不合法或重复的行
+def get_invalid_cas_rows():
+    dataset = get_dataset_registry().active
+    return pd.DataFrame(columns=['序号', 'CAS号', '中文名称', '问题']) if dataset is None else dataset.invalid_cas_rows.copy()
+
+# 获取数据对应的CAS号索引（共享数据直接使用加载时建立的索引）
+def get_cas_index(df):
+    if df is None:
         return None
+    dataset = get_dataset_registry().find(df)
+    return build_cas_index(df) if dataset is None else dataset.cas_index
+
+# 获取数据对应的搜索索引（共享数据直接使用加载时建立的索引）
+def get_search_index(df):
+    if df is None:
+        return None
+    dataset = get_dataset_registry().find(df)
+    return ChemicalSearchIndex(get_cas_index(df).values(), cas_col=CAS_COL) if dataset is None else dataset.search_index
+
+# 根据CAS号前缀、相似CAS号或中文名称给出候选化学物质，按匹配程度排序
+def suggest_chemicals(query, df, limit=10):
+    index = get_search_index(df)
+    if index is None:
+        return []
+    return index.suggest(normalize_cas(query), limit)
 
 # 根据CAS号查询化学物质
+@timed('cas_lookup')
 def search_chemical_by_cas(cas_number, df):
     if df is None:
-        print("数据框为空，无法查询")
+        logger.warning("数据框为空，无法查询")
         return None
     
-    # 去除输入中的空格
-    cas_number = cas_number.strip()
-    print(f"正在查询CAS号: '{cas_number}'")
-    
-    # 确定CAS号所在列
-    cas_col = 'CAS号'  # 正确的CAS号列
-    print(f"CAS号所在列: {cas_col}")
-    
-    # 将数据框的CAS号列转换为字符串并去除空格
-    df[cas_col] = df[cas_col].astype(str).str.strip()
+    # 规范化输入的CAS号
+    cas_number = normalize_cas(cas_number)
+    logger.debug("正在查询CAS号: '%s'", cas_number)
     
-    # 打印前5个CAS号，进行检查
-    # print(f"数据框中前5个CAS号: {df[cas_col].head(5).tolist()}")
+    # 通过索引精确匹配
+    record = get_cas_index(df).get(cas_number)
     
-    # 只进行精确匹配
-    exact_match = df[df[cas_col] == cas_number]
-    
-    if len(exact_match) > 0:
-        print(f"找到精确匹配结果: {len(exact_match)}行")
-        return exact_match.iloc[0].to_dict()
+    if record is not None:
+        logger.debug("找到精确匹配结果: %s", cas_number)
+        # 记录是只读的，可直接返回共享的记录
+        return record
     else:
-        print(f"未找到匹配CAS号: {cas_number}")
+        logger.debug("未找到匹配CAS号: %s", cas_number)
         return None
 
+# 查询记录中的结果文字（与查询页面一致）
+def format_query_result(record):
+    if record is None:
+        return '未找到结果'
+    return f"{record.get('中文名称', '未知')} - 毒性分级: {record.get('绿色分级', '未知')}"
+
+# 可以正常查询的CAS号校验结果
+CAS_VALID_STATUSES = (CAS_VALID, CAS_NORMALIZED, CAS_CORRECTED)
+
+# 批量查询的最大条数
+MAX_BATCH_SIZE = 2000
+
+# 批量结果中展示的列
+BATCH_RESULT_COLUMNS = ['CAS号', '中文名称', '绿色分级', '分级说明', '涂料现行标准限量要求', '我国新污染物相关管理要求', '使用用途', '查询结果', 'CAS校验']
+
+# 解析粘贴的CAS号列表（支持换行、逗号、分号、空格和制表符分隔）
+# 保留原始写法，批量查询时再规范化，以便在结果中区分统一写法和修正格式
+def parse_cas_list(text):
+    if not text:
+        return []
+    return [part for part in re.split(r'[\s,，;；]+', text) if part]
+
+# 读取上传的批量查询文件（CSV或XLSX），返回包含CAS号和使用用途两列的数据
+def read_batch_query_file(uploaded_file, file_name):
+    if file_name.lower().endswith(('.xlsx', '.xls')):
+        raw = pd.read_excel(uploaded_file, dtype=str)
+    else:
+        raw = pd.read_csv(uploaded_file, dtype=str, encoding='utf-8-sig')
+
+    if raw.empty:
+        return pd.DataFrame(columns=['CAS号', '使用用途'])
+
+    # 优先使用名为CAS号/CAS的列，否则使用第一列
+    cas_source = next((col for col in raw.columns if str(col).strip().upper() in ('CAS号', 'CAS', 'CAS NO', 'CAS NO.')), raw.columns[0])
+    batch = pd.DataFrame({'CAS号': raw[cas_source].fillna('').astype(str).str.strip()})
+    batch['使用用途'] = raw['使用用途'].fillna('') if '使用用途' in raw.columns else ''
+    return batch[batch['CAS号'] != ''].reset_index(drop=True)
+
+# 批量查询：一次左连接得到所有CAS号的结果，保持输入顺序
+# 格式或校验位错误且不在数据中的CAS号在查询结果中标明原因
+def search_chemicals_by_cas_list(cas_numbers, df, usage_purposes=None):
+    checked = [check_cas_number(cas) for cas in cas_numbers]
+    query = pd.DataFrame({CAS_COL: [cas for cas, _ in checked]})
+    query['使用用途'] = list(usage_purposes) if usage_purposes is not None else ''
+    statuses = pd.Series([status for _, status in checked], index=query.index, dtype=object)
+
+    if df is None:
+        result = query.reindex(columns=BATCH_RESULT_COLUMNS)
+        result['查询结果'] = '未找到结果'
+        result['CAS校验'] = statuses.map(CAS_STATUS_MESSAGES)
+        return result.fillna('')
+
+    chemicals = df.drop_duplicates(subset=CAS_COL).drop(columns=['使用用途', '查询结果'], errors='ignore')
+    result = query.merge(chemicals, how='left', on=CAS_COL, indicator=True)
+    # 分类类型的列转回普通列，才能填充未找到行的空值
+    result = result.astype({col: object for col in result.select_dtypes('category').columns})
+    found = result['_merge'] == 'both'
+    result['分级说明'] = result['绿色分级'].map(get_toxicity_level_description).where(found, '')
+    result['查询结果'] = '未找到结果'
+    result.loc[found, '查询结果'] = result.loc[found, '中文名称'].astype(str) + ' - 毒性分级: ' + result.loc[found, '绿色分级'].astype(str)
+    invalid = ~found & ~statuses.isin(CAS_VALID_STATUSES)
+    result.loc[invalid, '查询结果'] = statuses[invalid].map(CAS_STATUS_MESSAGES)
+    result['CAS校验'] = statuses.map(CAS_STATUS_MESSAGES)
+    return result.reindex(columns=BATCH_RESULT_COLUMNS).fillna('')
+
 # 获取毒性级别的说明
 def get_toxicity_level_description(level):
     descriptions = {
@@ -68,21 +442,16 @@ def get_toxicity_level_color(level):
     }
     return colors.get(level, "#CCCCCC")  # 默认灰色
 
-# 处理结构图像数据（如果有）
-def process_structure_image(structure_data):
-    if pd.isna(structure_data) or structure_data == "":
+# 获取CAS号对应的结构图缩略图：返回(图像字节, 缓存条目)，没有结构图时返回None
+# 缩略图在加载数据时已生成，这里只读取缓存文件，不再解码图像
+def get_structure_image(cas_number, df):
+    if df is None:
         return None
-    
-    try:
-        # 检查是否为图像数据
-        if isinstance(structure_data, bytes):
-            return Image.open(io.BytesIO(structure_data))
-        # 检查是否为base64编码的图像
-        elif isinstance(structure_data, str) and structure_data.startswith('data:image'):
-            img_data = structure_data.split(',')[1]
-            return Image.open(io.BytesIO(base64.b64decode(img_data)))
-        else:
-            return None
-    except Exception as e:
-        print(f"处理结构图像时出错: {e}")
-        return None 
\ No newline at end of file
+    dataset = get_dataset_registry().find(df)
+    if dataset is None:
+        return None
+    entry = dataset.structures.get(normalize_cas(cas_number))
+    if entry is None:
+        return None
+    image_bytes = get_structure_cache().read(entry)
+    return None if image_bytes is None else (image_bytes, entry)
\ No newline at end of file
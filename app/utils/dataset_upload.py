@@ -0,0 +1,247 @@
+import os
+import shutil
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from app.utils.data_utils import DATA_PATH, CAS_COL, build_dataset, compute_file_hash, get_dataset_registry
+from app.utils.snapshot import write_snapshot, snapshot_path
+from app.utils.compact_store import DATASET_COLUMNS
+from app.utils.structure_images import STRUCTURE_COLUMNS
+from app.utils.logger import get_logger
+from app.utils.metrics import timed_stage
+
+logger = get_logger(__name__)
+
+# 上传的工作簿和被替换的旧工作簿的保存目录
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'uploads')
+
+# 缺少时无法启用的列
+REQUIRED_COLUMNS = ['CAS号', '中文名称', '绿色分级']
+# 有效的绿色分级
+VALID_GRADES = ("1级", "2级", "3级", "4级")
+
+# 上传任务的状态
+UPLOAD_RUNNING = 'running'
+UPLOAD_READY = 'ready'
+UPLOAD_FAILED = 'failed'
+UPLOAD_ACTIVATED = 'activated'
+UPLOAD_DISCARDED = 'discarded'
+
+UPLOAD_STATUS_LABELS = {
+    UPLOAD_RUNNING: "处理中",
+    UPLOAD_READY: "待确认",
+    UPLOAD_FAILED: "失败",
+    UPLOAD_ACTIVATED: "已启用",
+    UPLOAD_DISCARDED: "已放弃",
+}
+
+# 在子进程中解析工作簿，不占用服务进程的CPU；放在模块顶层，便于进程池中的子进程调用
+# 完整的数据写入上传文件旁的快照（与启动时解析Excel得到的数据一致），启用时移到数据文件旁，之后的冷启动直接读取
+# 返回给服务进程的只有应用使用的列和结构图列（列投影），校验和比较不需要其他列，也不必在进程间传递
+# 快照需要全部的列，因此工作簿只完整读取一次，在子进程中投影，而不是用usecols再读取一次
+def parse_workbook(path, file_hash):
+    df = pd.read_excel(path)
+    write_snapshot(df, path, file_hash)
+    df.columns = [str(col).strip() for col in df.columns]
+    return df[[col for col in df.columns if col in DATASET_COLUMNS or col in STRUCTURE_COLUMNS]]
+
+# 解析工作簿：优先在单独的子进程中解析，子进程不可用时在当前线程解析
+# 服务进程中有多个线程，用spawn方式启动子进程，避免fork继承被其他线程持有的锁
+def parse_workbook_offloaded(path, file_hash):
+    try:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            return pool.submit(parse_workbook, path, file_hash).result()
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning("解析进程不可用，改为直接解析: %s", e)
+        return parse_workbook(path, file_hash)
+
+# 绿色分级不是1~4级的行（序号从1开始，对应Excel中的数据行）
+def find_invalid_grade_rows(df):
+    grades = df['绿色分级'].astype(object).fillna('').astype(str).str.strip()
+    invalid = ~grades.isin(VALID_GRADES)
+    rows = pd.DataFrame({
+        '序号': invalid[invalid].index + 1,
+        'CAS号': df.loc[invalid, CAS_COL].values,
+        '中文名称': df.loc[invalid, '中文名称'].fillna('').values,
+        '绿色分级': grades[invalid].values,
+    })
+    return rows.reset_index(drop=True)
+
+# 逐行比较新旧数据（按CAS号，重复的CAS号取第一行）：新增、删除和分级变化的物质
+def compute_dataset_diff(old_df, new_df):
+    columns = [CAS_COL, '中文名称', '绿色分级']
+    # 分类类型的列转为普通列后比较
+    old = old_df[columns].astype(object).drop_duplicates(subset=CAS_COL) if old_df is not None else pd.DataFrame(columns=columns)
+    new = new_df[columns].astype(object).drop_duplicates(subset=CAS_COL)
+    merged = old.merge(new, how='outer', on=CAS_COL, suffixes=('_旧', '_新'), indicator=True)
+
+    added = merged[merged['_merge'] == 'right_only']
+    removed = merged[merged['_merge'] == 'left_only']
+    both = merged[merged['_merge'] == 'both']
+    regraded = both[both['绿色分级_旧'].fillna('') != both['绿色分级_新'].fillna('')]
+    return {
+        'added': added[[CAS_COL, '中文名称_新', '绿色分级_新']].set_axis(columns, axis=1).reset_index(drop=True),
+        'removed': removed[[CAS_COL, '中文名称_旧', '绿色分级_旧']].set_axis(columns, axis=1).reset_index(drop=True),
+        'regraded': regraded[[CAS_COL, '中文名称_新', '绿色分级_旧', '绿色分级_新']]
+            .set_axis([CAS_COL, '中文名称', '原分级', '新分级'], axis=1).reset_index(drop=True),
+    }
+
+# 一次上传：后台解析、校验并与当前版本比较，管理员确认后才启用
+# 解析在子进程中进行；校验CAS号、建立索引和比较在服务进程的后台线程中进行，大型工作簿处理期间查询会稍慢
+class UploadJob:
+    def __init__(self, file_name, path, uploaded_by):
+        self.file_name = file_name
+        self.path = path
+        self.uploaded_by = uploaded_by
+        self.created_at = datetime.now()
+        self.status = UPLOAD_RUNNING
+        self.progress = 0.0
+        self.message = "等待处理"
+        self.error = None
+        self.dataset = None
+        self.base_version = None
+        self.invalid_grade_rows = None
+        self.diff = None
+
+    def _step(self, progress, message):
+        self.progress = progress
+        self.message = message
+
+    def run(self):
+        try:
+            with timed_stage('dataset_upload'):
+                self._step(0.05, "正在计算文件哈希")
+                file_hash = compute_file_hash(self.path)
+
+                self._step(0.1, "正在解析工作簿")
+                df = parse_workbook_offloaded(self.path, file_hash)
+                missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+                if missing:
+                    raise ValueError(f"工作簿缺少必需的列：{'、'.join(missing)}")
+                if df.empty:
+                    raise ValueError("工作簿中没有数据")
+
+                self._step(0.6, "正在校验CAS号并建立索引")
+                self.dataset = build_dataset(self.path, file_hash=file_hash, df=df)
+
+                self._step(0.8, "正在校验绿色分级")
+                self.invalid_grade_rows = find_invalid_grade_rows(self.dataset.df)
+
+                self._step(0.9, "正在与当前版本比较")
+                active = get_dataset_registry().active
+                self.base_version = active.version if active else None
+                self.diff = compute_dataset_diff(active.df if active else None, self.dataset.df)
+            self._step(1.0, "处理完成，等待确认")
+            self.status = UPLOAD_READY
+        except Exception as e:
+            logger.exception("处理上传的工作簿时出错: %s", e)
+            self.error = str(e)
+            self.message = "处理失败"
+            self.status = UPLOAD_FAILED
+            self.dataset = None
+
+    def summary(self):
+        return {
+            'rows': len(self.dataset.df),
+            'version': self.dataset.version,
+            'invalid_cas_rows': len(self.dataset.invalid_cas_rows),
+            'invalid_grade_rows': len(self.invalid_grade_rows),
+            'added': len(self.diff['added']),
+            'removed': len(self.diff['removed']),
+            'regraded': len(self.diff['regraded']),
+        }
+
+# 管理上传任务：同一时间只处理一个上传，确认后替换数据文件并切换版本
+class DatasetUploadManager:
+    def __init__(self, data_path=DATA_PATH, upload_dir=UPLOAD_DIR):
+        self.data_path = data_path
+        self.upload_dir = upload_dir
+        self._lock = threading.Lock()
+        self._job = None
+
+    # 当前（最近一次）的上传任务
+    @property
+    def job(self):
+        return self._job
+
+    # 保存上传的工作簿并交给后台线程处理，返回(是否成功, 提示信息)
+    def submit(self, file_name, data, uploaded_by=''):
+        with self._lock:
+            if self._job is not None and self._job.status == UPLOAD_RUNNING:
+                return False, "上一个工作簿仍在处理中，请稍后再试"
+            self._discard_locked()
+            os.makedirs(self.upload_dir, exist_ok=True)
+            path = os.path.join(self.upload_dir, f"upload_{datetime.now():%Y%m%d%H%M%S}.xlsx")
+            with open(path, 'wb') as file:
+                file.write(data)
+            job = UploadJob(file_name, path, uploaded_by)
+            self._job = job
+        threading.Thread(target=job.run, name='dataset-upload', daemon=True).start()
+        logger.info("用户'%s'上传了数据工作簿 %s", uploaded_by, file_name)
+        return True, "已上传，正在后台解析和校验"
+
+    # 启用待确认的版本：备份并原子替换数据文件，再切换为已建好索引的新版本，返回(是否成功, 提示信息)
+    def approve(self):
+        registry = get_dataset_registry()
+        with self._lock:
+            job = self._job
+            if job is None or job.status != UPLOAD_READY:
+                return False, "没有待确认的工作簿"
+            active = registry.active
+            if (active.version if active else None) != job.base_version:
+                return False, "当前数据在比较后已发生变化，请重新上传"
+
+            dataset = job.dataset
+            if os.path.exists(self.data_path):
+                backup_name = f"backup_{active.version if active else 'unknown'}{os.path.splitext(self.data_path)[1]}"
+                shutil.copy2(self.data_path, os.path.join(self.upload_dir, backup_name))
+            tmp_path = f"{self.data_path}.{os.getpid()}.tmp"
+            shutil.copyfile(job.path, tmp_path)
+            os.replace(tmp_path, self.data_path)
+            # 解析时生成的快照与新数据文件内容一致，移到数据文件旁；没有快照时下次冷启动会重新生成
+            staged_snapshot = snapshot_path(job.path)
+            if os.path.exists(staged_snapshot):
+                os.replace(staged_snapshot, snapshot_path(self.data_path))
+
+            # 新版本对应替换后的数据文件（在切换为当前版本之前设置），之后的文件检查不会再次加载
+            dataset.path = self.data_path
+            registry.activate(dataset, os.stat(self.data_path))
+            job.status = UPLOAD_ACTIVATED
+            job.message = "已启用"
+            os.remove(job.path)
+        logger.info("已启用上传的数据工作簿 %s（版本 %s）", job.file_name, dataset.version)
+        return True, f"已启用数据版本 {dataset.version}"
+
+    # 放弃待确认的版本
+    def discard(self):
+        with self._lock:
+            if self._job is None or self._job.status == UPLOAD_RUNNING:
+                return False
+            self._discard_locked()
+            return True
+
+    def _discard_locked(self):
+        job = self._job
+        if job is None:
+            return
+        if job.status in (UPLOAD_READY, UPLOAD_FAILED):
+            job.status = UPLOAD_DISCARDED
+            job.dataset = None
+            for path in (job.path, snapshot_path(job.path)):
+                if os.path.exists(path):
+                    os.remove(path)
+        self._job = None
+
+_upload_manager = None
+_upload_manager_lock = threading.Lock()
+
+# 获取进程内共享的上传管理
+def get_upload_manager():
+    global _upload_manager
+    with _upload_manager_lock:
+        if _upload_manager is None:
+            _upload_manager = DatasetUploadManager()
+        return _upload_manager
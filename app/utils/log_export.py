@@ -0,0 +1,77 @@
+import os
+import gzip
+import tempfile
+from app.utils.log_writer import QUERY_LOG_COLUMNS
+
+# pyarrow随streamlit一起安装；缺失时不提供Parquet导出
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# 支持的导出格式：格式名 -> (扩展名, MIME类型)
+EXPORT_FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'CSV (gzip压缩)': ('.csv.gz', 'application/gzip'),
+    'Parquet': ('.parquet', 'application/octet-stream'),
+}
+
+# 导出文件的大小上限（MB，环境变量EXPORT_MAX_MB）：下载按钮需要把完整文件放在内存中，超过上限时请缩小日期范围
+EXPORT_MAX_BYTES = int(os.environ.get('EXPORT_MAX_MB', '50')) * 1024 * 1024
+
+# 当前环境可用的导出格式
+def available_export_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'Parquet' or pq is not None]
+
+# 导出文件超过大小上限时抛出ValueError
+def _check_export_size(path, max_bytes):
+    if os.path.getsize(path) > max_bytes:
+        raise ValueError(f"导出文件超过{max_bytes / 1024 / 1024:.0f} MB，请缩小日期范围后再导出")
+
+# 把查询记录逐块写入临时文件，返回导出文件的内容；写入时内存中只有一个数据块
+# 下载按钮需要完整的文件内容，因此写完后读出一次，文件大小不超过max_bytes（每写一块检查一次）
+# 临时文件无论成功或出错都在返回前删除，不会遗留在临时目录中
+def export_query_logs(store, start_date, end_date, fmt='CSV', max_bytes=EXPORT_MAX_BYTES):
+    suffix, _ = EXPORT_FORMATS[fmt]
+    fd, path = tempfile.mkstemp(prefix='query_logs_', suffix=suffix)
+    os.close(fd)
+
+    try:
+        chunks = store.iter_logs(start_date, end_date)
+        if fmt == 'Parquet':
+            _write_parquet(chunks, path, max_bytes)
+        else:
+            opener = gzip.open if fmt == 'CSV (gzip压缩)' else open
+            with opener(path, 'wt', encoding='utf-8', newline='') as file:
+                header = True
+                for chunk in chunks:
+                    chunk.to_csv(file, index=False, header=header)
+                    header = False
+                    _check_export_size(path, max_bytes)
+                if header:
+                    # 范围内没有记录时只写表头
+                    file.write(','.join(QUERY_LOG_COLUMNS) + '\n')
+        _check_export_size(path, max_bytes)
+        with open(path, 'rb') as file:
+            return file.read()
+    finally:
+        os.remove(path)
+
+def _write_parquet(chunks, path, max_bytes):
+    writer = None
+    try:
+        for chunk in chunks:
+            # 统一为字符串列，保证各块的schema一致
+            table = pa.Table.from_pandas(chunk.fillna('').astype(str), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression='snappy')
+            writer.write_table(table)
+            _check_export_size(path, max_bytes)
+        if writer is None:
+            schema = pa.schema([(col, pa.string()) for col in QUERY_LOG_COLUMNS])
+            writer = pq.ParquetWriter(path, schema, compression='snappy')
+    finally:
+        if writer is not None:
+            writer.close()
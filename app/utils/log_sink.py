@@ -0,0 +1,184 @@
+import time
+from datetime import datetime
+import queue
+import atexit
+import threading
+from app.utils.log_store import get_query_log_store
+from app.utils.logger import get_logger
+from app.utils.metrics import timed_stage
+
+logger = get_logger(__name__)
+
+# 队列最多容纳的记录数
+MAX_QUEUE_SIZE = 10000
+# 单批写入的最大记录数
+BATCH_SIZE = 200
+# 批次最长等待时间（秒），到时间即使未满也写入
+FLUSH_INTERVAL = 0.5
+# 队列已满时入队最多等待的时间（秒），超时则丢弃记录
+PUT_TIMEOUT = 0.05
+
+# 停止后台线程的标记
+_STOP = object()
+
+# 异步查询日志：请求线程只负责入队，由后台线程按批写入
+class QueryLogSink:
+    def __init__(self, writer, max_queue_size=MAX_QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, put_timeout=PUT_TIMEOUT):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._thread = None
+        self._stopped = False
+        self._stats = {
+            'submitted': 0,       # 入队的记录数
+            'written': 0,         # 已写入的记录数
+            'dropped': 0,         # 队列满且等待超时后丢弃的记录数
+            'blocked': 0,         # 入队时因队列满而等待的次数
+            'batches': 0,         # 写入的批次数
+            'errors': 0,          # 写入失败的批次数
+            'max_queue_depth': 0, # 观察到的最大队列长度
+        }
+
+    # 启动后台写入线程
+    def start(self):
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="query-log-sink", daemon=True)
+                self._thread.start()
+        return self
+
+    # 提交记录（字典列表），队列满时短暂等待，仍无空位则丢弃并计数
+    def submit(self, records):
+        if not records:
+            return
+        # 后台线程未运行时直接同步写入，保证记录不丢失
+        if self._stopped or self._thread is None or not self._thread.is_alive():
+            self.writer.append(records)
+            with self._cond:
+                self._stats['submitted'] += len(records)
+                self._stats['written'] += len(records)
+            return
+
+        for record in records:
+            # 先计入待写入数，避免后台线程先写完导致计数为负
+            with self._cond:
+                self._pending += 1
+            try:
+                self._queue.put_nowait(record)
+            except queue.Full:
+                with self._cond:
+                    self._stats['blocked'] += 1
+                try:
+                    self._queue.put(record, timeout=self.put_timeout)
+                except queue.Full:
+                    with self._cond:
+                        self._pending -= 1
+                        self._stats['dropped'] += 1
+                        self._cond.notify_all()
+                    continue
+            with self._cond:
+                self._stats['submitted'] += 1
+                self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._queue.qsize())
+
+    # 后台线程：按数量或时间触发批量写入
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = None
+            while len(batch) < self.batch_size:
+                timeout = None if deadline is None else max(0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if stopping:
+                # 停止前把队列中剩余的记录一并写入
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        try:
+            # 后台线程的写入耗时（含文件锁等待），不计入查询响应时间
+            with timed_stage('query_log_write'):
+                self.writer.append(batch)
+            written = len(batch)
+            failed = False
+        except Exception as e:
+            logger.exception("写入查询日志时出错: %s", e)
+            written = 0
+            failed = True
+        with self._cond:
+            self._pending -= len(batch)
+            self._stats['written'] += written
+            self._stats['batches'] += 1
+            if failed:
+                self._stats['errors'] += 1
+            self._cond.notify_all()
+
+    # 等待已提交的记录全部写入，返回是否在超时前完成
+    def flush(self, timeout=5.0):
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending <= 0, timeout=timeout)
+
+    # 停止后台线程，写完队列中剩余的记录
+    def stop(self, timeout=10.0):
+        with self._cond:
+            thread = self._thread
+            self._stopped = True
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    # 获取统计信息
+    def get_stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['pending'] = self._pending
+        stats['queue_depth'] = self._queue.qsize()
+        return stats
+
+_query_log_sink = None
+_query_log_sink_lock = threading.Lock()
+
+# 获取进程内共享的异步查询日志，首次调用时启动后台线程，进程退出时写完剩余记录
+def get_query_log_sink():
+    global _query_log_sink
+    with _query_log_sink_lock:
+        if _query_log_sink is None:
+            _query_log_sink = QueryLogSink(get_query_log_store()).start()
+            atexit.register(_query_log_sink.stop)
+        return _query_log_sink
+
+# 提交查询记录：records为(CAS号, 查询结果, 使用用途)列表，查询时间取当前时间，dataset_version为回答查询的数据版本
+def submit_query_records(username, records, dataset_version=''):
+    if not records:
+        return
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    get_query_log_sink().submit([{
+        '用户名': username,
+        'CAS号': cas_number,
+        '使用用途': usage_purpose,
+        '查询时间': timestamp,
+        '查询结果': result,
+        '数据版本': dataset_version or ''
+    } for cas_number, result, usage_purpose in records])
@@ -0,0 +1,370 @@
+import os
+import io
+import csv
+import sqlite3
+import threading
+from datetime import timedelta
+import pandas as pd
+from app.utils.log_writer import AppendOnlyLogWriter, QUERY_LOG_PATH, QUERY_LOG_COLUMNS
+from app.utils.query_stats import QueryStatsRollup, NOT_FOUND_RESULT
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 查询日志存储方式：csv（默认）或sqlite，通过环境变量QUERY_LOG_BACKEND选择
+LOG_BACKEND = os.environ.get('QUERY_LOG_BACKEND', 'csv').lower()
+
+# SQLite日志数据库路径
+SQLITE_LOG_PATH = os.path.join(os.path.dirname(QUERY_LOG_PATH), 'query_logs.db')
+
+# 日志列与SQLite字段的对应关系
+SQLITE_COLUMNS = {
+    '用户名': 'username',
+    'CAS号': 'cas',
+    '使用用途': 'usage',
+    '查询时间': 'queried_at',
+    '查询结果': 'result',
+    '数据版本': 'dataset_version',
+}
+
+# 分块读取日志时每块的记录数
+EXPORT_CHUNK_SIZE = 50000
+
+# 增量读取CSV日志时每次读取的字节数
+TAIL_BLOCK_SIZE = 8 * 1024 * 1024
+
+# 日期范围转为查询时间的字符串边界（查询时间格式为YYYY-MM-DD HH:MM:SS，可直接按字符串比较）
+def _time_bounds(start_date, end_date):
+    start = f"{start_date:%Y-%m-%d} 00:00:00" if start_date else None
+    end = f"{end_date + timedelta(days=1):%Y-%m-%d} 00:00:00" if end_date else None
+    return start, end
+
+# CSV日志存储：追加写入；统计使用按日预聚合的结果，只增量读取新追加的行
+class CsvLogStore:
+    def __init__(self, path=QUERY_LOG_PATH):
+        self.path = path
+        self.writer = AppendOnlyLogWriter(path, QUERY_LOG_COLUMNS)
+        self.stats = QueryStatsRollup()
+        self._stats_lock = threading.Lock()
+        self._stats_offset = 0
+        self._stats_inode = None
+        self._stats_header = None
+
+    def append(self, records):
+        self.writer.append(records)
+
+    # 从上次读到的位置继续读取日志文件，把新追加的记录累加到预聚合统计中
+    # 其他进程追加的记录同样会被统计；文件被替换（如补充新列）时重新统计
+    def refresh_stats(self):
+        with self._stats_lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                self.stats.reset()
+                self._stats_offset, self._stats_inode, self._stats_header = 0, None, None
+                return self.stats
+
+            if stat.st_ino != self._stats_inode or stat.st_size < self._stats_offset:
+                self.stats.reset()
+                self._stats_offset, self._stats_inode, self._stats_header = 0, stat.st_ino, None
+
+            with open(self.path, 'rb') as file:
+                file.seek(self._stats_offset)
+                while self._stats_offset < stat.st_size:
+                    block = file.read(min(TAIL_BLOCK_SIZE, stat.st_size - self._stats_offset))
+                    # 只处理到最后一个完整行，剩余部分下次再读
+                    end = block.rfind(b'\n')
+                    if end < 0:
+                        break
+                    self._consume(block[:end + 1].decode('utf-8-sig' if self._stats_offset == 0 else 'utf-8'))
+                    self._stats_offset += end + 1
+                    file.seek(self._stats_offset)
+        return self.stats
+
+    def _consume(self, text):
+        reader = csv.reader(io.StringIO(text))
+        if self._stats_header is None:
+            self._stats_header = {col: i for i, col in enumerate(next(reader, []))}
+        positions = [self._stats_header.get(col) for col in ('用户名', 'CAS号', '查询时间', '查询结果')]
+        for row in reader:
+            if row:
+                self.stats.add(*(row[i] if i is not None and i < len(row) else '' for i in positions))
+
+    # 按块读取日期范围内的记录，内存占用与块大小相关而与日志总量无关
+    def iter_logs(self, start_date=None, end_date=None, chunksize=EXPORT_CHUNK_SIZE):
+        if not os.path.exists(self.path):
+            return
+        start, end = _time_bounds(start_date, end_date)
+        for chunk in pd.read_csv(self.path, chunksize=chunksize, dtype=str, keep_default_na=False):
+            # 确保新增列存在（向后兼容）
+            for col in ('使用用途', '数据版本'):
+                if col not in chunk.columns:
+                    chunk[col] = ""
+            times = chunk['查询时间']
+            mask = pd.Series(True, index=chunk.index)
+            if start:
+                mask &= times >= start
+            if end:
+                mask &= times < end
+            if mask.any():
+                yield chunk[mask]
+
+    # 查询日期范围内的记录；指定limit时只保留最近的limit条
+    def query_logs(self, start_date=None, end_date=None, limit=None):
+        if limit is None:
+            chunks = list(self.iter_logs(start_date, end_date))
+        else:
+            # 日志按时间顺序追加，逐块保留末尾的记录即可
+            chunks = []
+            tail = None
+            for chunk in self.iter_logs(start_date, end_date):
+                tail = chunk.tail(limit) if tail is None else pd.concat([tail, chunk]).tail(limit)
+            if tail is not None:
+                chunks = [tail.iloc[::-1]]
+        if not chunks:
+            return pd.DataFrame(columns=QUERY_LOG_COLUMNS)
+        return pd.concat(chunks).reset_index(drop=True)
+
+    # 日期范围内的记录数
+    def count_logs(self, start_date=None, end_date=None):
+        return self.refresh_stats().count(start_date, end_date)
+
+    # 最早和最晚的查询日期
+    def date_bounds(self):
+        return self.refresh_stats().date_bounds()
+
+    # 按日期统计查询次数和未找到次数
+    def daily_counts(self, start_date=None, end_date=None):
+        return self.refresh_stats().daily_counts(start_date, end_date)
+
+    # 按用户统计查询次数和未找到次数
+    def user_counts(self, start_date=None, end_date=None):
+        return self.refresh_stats().user_counts(start_date, end_date)
+
+    # 按CAS号统计查询次数和未找到次数
+    def cas_counts(self, start_date=None, end_date=None, limit=None):
+        return self.refresh_stats().cas_counts(start_date, end_date, limit)
+
+# SQLite日志存储：WAL模式，按时间、用户、CAS号建立索引
+# 每日、每用户、每个CAS号的统计保存在汇总表中，与明细在同一事务中增量更新
+class SqliteLogStore:
+    def __init__(self, path=SQLITE_LOG_PATH, csv_path=QUERY_LOG_PATH):
+        self.path = path
+        self.csv_path = csv_path
+        self._local = threading.local()
+        self._init_schema()
+        self._migrate_csv()
+        self._build_rollups()
+
+    # 每个线程使用自己的连接
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS query_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT,
+                cas TEXT,
+                usage TEXT,
+                queried_at TEXT,
+                result TEXT,
+                dataset_version TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS idx_query_logs_time ON query_logs (queried_at);
+            CREATE INDEX IF NOT EXISTS idx_query_logs_user ON query_logs (username, queried_at);
+            CREATE INDEX IF NOT EXISTS idx_query_logs_cas ON query_logs (cas, queried_at);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS daily_rollup (
+                day TEXT PRIMARY KEY,
+                total INTEGER NOT NULL DEFAULT 0,
+                not_found INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS user_rollup (
+                day TEXT,
+                username TEXT,
+                total INTEGER NOT NULL DEFAULT 0,
+                not_found INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, username)
+            );
+            CREATE TABLE IF NOT EXISTS cas_rollup (
+                day TEXT,
+                cas TEXT,
+                total INTEGER NOT NULL DEFAULT 0,
+                not_found INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, cas)
+            );
+        """)
+        # 旧数据库补充数据版本列
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(query_logs)")}
+        if 'dataset_version' not in columns:
+            conn.execute("ALTER TABLE query_logs ADD COLUMN dataset_version TEXT NOT NULL DEFAULT ''")
+
+    # 一次性导入已有的query_logs.csv
+    def _migrate_csv(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migrated = conn.execute("SELECT value FROM meta WHERE key = 'csv_migrated'").fetchone()
+            if migrated is None and os.path.exists(self.csv_path):
+                with open(self.csv_path, 'r', encoding='utf-8', newline='') as file:
+                    rows = csv.DictReader(file)
+                    conn.executemany(
+                        "INSERT INTO query_logs (username, cas, usage, queried_at, result, dataset_version) VALUES (?, ?, ?, ?, ?, ?)",
+                        ((row.get('用户名'), row.get('CAS号'), row.get('使用用途') or '', row.get('查询时间'), row.get('查询结果'),
+                          row.get('数据版本') or '') for row in rows)
+                    )
+                logger.info("已将查询记录从 %s 导入 %s", self.csv_path, self.path)
+            if migrated is None:
+                conn.execute("INSERT INTO meta (key, value) VALUES ('csv_migrated', datetime('now'))")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # 由明细一次性生成汇总表（升级到带汇总表的版本时执行）
+    def _build_rollups(self):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT value FROM meta WHERE key = 'rollups_built'").fetchone() is None:
+                not_found = f"SUM(result = '{NOT_FOUND_RESULT}')"
+                conn.execute("DELETE FROM daily_rollup")
+                conn.execute("DELETE FROM user_rollup")
+                conn.execute("DELETE FROM cas_rollup")
+                conn.execute(f"INSERT INTO daily_rollup SELECT substr(queried_at, 1, 10), COUNT(*), {not_found} FROM query_logs GROUP BY 1")
+                conn.execute(f"INSERT INTO user_rollup SELECT substr(queried_at, 1, 10), username, COUNT(*), {not_found} FROM query_logs GROUP BY 1, 2")
+                conn.execute(f"INSERT INTO cas_rollup SELECT substr(queried_at, 1, 10), cas, COUNT(*), {not_found} FROM query_logs GROUP BY 1, 2")
+                conn.execute("INSERT INTO meta (key, value) VALUES ('rollups_built', datetime('now'))")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def append(self, records):
+        if not records:
+            return
+        rows = [(r.get('用户名'), r.get('CAS号'), r.get('使用用途', ''), r.get('查询时间'), r.get('查询结果'), r.get('数据版本', ''))
+                for r in records]
+        # 汇总表的增量：(日期, 分组键, 查询次数, 未找到次数)
+        rollup_rows = [(str(queried_at)[:10], username, cas, 1, 1 if result == NOT_FOUND_RESULT else 0)
+                       for username, cas, _, queried_at, result, _ in rows]
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO query_logs (username, cas, usage, queried_at, result, dataset_version) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.executemany(
+                "INSERT INTO daily_rollup (day, total, not_found) VALUES (?, ?, ?) "
+                "ON CONFLICT (day) DO UPDATE SET total = total + excluded.total, not_found = not_found + excluded.not_found",
+                ((day, total, not_found) for day, _, _, total, not_found in rollup_rows)
+            )
+            conn.executemany(
+                "INSERT INTO user_rollup (day, username, total, not_found) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, username) DO UPDATE SET total = total + excluded.total, not_found = not_found + excluded.not_found",
+                ((day, username, total, not_found) for day, username, _, total, not_found in rollup_rows)
+            )
+            conn.executemany(
+                "INSERT INTO cas_rollup (day, cas, total, not_found) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, cas) DO UPDATE SET total = total + excluded.total, not_found = not_found + excluded.not_found",
+                ((day, cas, total, not_found) for day, _, cas, total, not_found in rollup_rows)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # 生成时间范围的WHERE条件
+    def _where(self, start_date, end_date):
+        start, end = _time_bounds(start_date, end_date)
+        clauses, params = [], []
+        if start:
+            clauses.append("queried_at >= ?")
+            params.append(start)
+        if end:
+            clauses.append("queried_at < ?")
+            params.append(end)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query_logs(self, start_date=None, end_date=None, limit=None):
+        where, params = self._where(start_date, end_date)
+        select = ", ".join(f'{field} AS "{col}"' for col, field in SQLITE_COLUMNS.items())
+        sql = f"SELECT {select} FROM query_logs{where} ORDER BY queried_at"
+        if limit is not None:
+            sql = f"SELECT {select} FROM query_logs{where} ORDER BY queried_at DESC LIMIT ?"
+            params = params + [int(limit)]
+        return pd.read_sql_query(sql, self._connect(), params=params)
+
+    def iter_logs(self, start_date=None, end_date=None, chunksize=EXPORT_CHUNK_SIZE):
+        where, params = self._where(start_date, end_date)
+        select = ", ".join(f'{field} AS "{col}"' for col, field in SQLITE_COLUMNS.items())
+        yield from pd.read_sql_query(f"SELECT {select} FROM query_logs{where} ORDER BY queried_at",
+                                     self._connect(), params=params, chunksize=chunksize)
+
+    # 汇总表按日期范围的WHERE条件
+    def _day_where(self, start_date, end_date):
+        clauses, params = [], []
+        if start_date:
+            clauses.append("day >= ?")
+            params.append(f"{start_date:%Y-%m-%d}")
+        if end_date:
+            clauses.append("day <= ?")
+            params.append(f"{end_date:%Y-%m-%d}")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count_logs(self, start_date=None, end_date=None):
+        where, params = self._day_where(start_date, end_date)
+        return self._connect().execute(f"SELECT COALESCE(SUM(total), 0) FROM daily_rollup{where}", params).fetchone()[0]
+
+    def date_bounds(self):
+        row = self._connect().execute("SELECT MIN(day), MAX(day) FROM daily_rollup").fetchone()
+        if row[0] is None:
+            return None, None
+        return pd.to_datetime(row[0]).date(), pd.to_datetime(row[1]).date()
+
+    def daily_counts(self, start_date=None, end_date=None):
+        where, params = self._day_where(start_date, end_date)
+        return pd.read_sql_query(
+            f'SELECT day AS "日期", total AS "查询次数", not_found AS "未找到次数" FROM daily_rollup{where} ORDER BY day',
+            self._connect(), params=params
+        )
+
+    def user_counts(self, start_date=None, end_date=None):
+        where, params = self._day_where(start_date, end_date)
+        return pd.read_sql_query(
+            f'SELECT username AS "用户", SUM(total) AS "查询次数", SUM(not_found) AS "未找到次数" '
+            f'FROM user_rollup{where} GROUP BY username ORDER BY 2 DESC',
+            self._connect(), params=params
+        )
+
+    def cas_counts(self, start_date=None, end_date=None, limit=None):
+        where, params = self._day_where(start_date, end_date)
+        sql = (f'SELECT cas AS "CAS号", SUM(total) AS "查询次数", SUM(not_found) AS "未找到次数" '
+               f'FROM cas_rollup{where} GROUP BY cas ORDER BY 2 DESC')
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = params + [int(limit)]
+        return pd.read_sql_query(sql, self._connect(), params=params)
+
+_query_log_store = None
+_query_log_store_lock = threading.Lock()
+
+# 获取进程内共享的查询日志存储
+def get_query_log_store():
+    global _query_log_store
+    with _query_log_store_lock:
+        if _query_log_store is None:
+            if LOG_BACKEND == 'sqlite':
+                _query_log_store = SqliteLogStore()
+            else:
+                _query_log_store = CsvLogStore()
+        return _query_log_store
@@ -0,0 +1,79 @@
+import os
+import csv
+import time
+import threading
+from app.utils.file_utils import file_lock
+
+# 查询日志文件路径（可通过环境变量QUERY_LOG_PATH指定其他位置，如压力测试时写入临时目录）
+QUERY_LOG_PATH = os.environ.get('QUERY_LOG_PATH') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'query_logs.csv')
+
+# 查询日志的列
+# 数据版本为回答该查询的化学物质数据版本（工作簿内容哈希前12位），旧记录为空
+QUERY_LOG_COLUMNS = ['用户名', 'CAS号', '使用用途', '查询时间', '查询结果', '数据版本']
+
+# 距上次fsync超过该秒数或累计写入超过该条数时执行fsync
+FSYNC_INTERVAL = 1.0
+FSYNC_EVERY = 50
+
+# 只追加的CSV日志写入器：每次写入的开销与已有日志大小无关
+class AppendOnlyLogWriter:
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    # 读取已有文件的表头；旧文件缺少的列通过一次性重写补齐
+    def _prepare_file(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, 'w', encoding='utf-8', newline='') as file:
+                csv.writer(file, lineterminator='\n').writerow(self.columns)
+            return list(self.columns)
+
+        with open(self.path, 'r', encoding='utf-8', newline='') as file:
+            header = next(csv.reader(file), [])
+        missing = [col for col in self.columns if col not in header]
+        if missing:
+            self._migrate_header(header, header + missing)
+            header = header + missing
+
+        # 文件末尾缺少换行时补上，避免新记录接在上一行后面
+        with open(self.path, 'rb+') as file:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b'\n':
+                file.write(b'\n')
+        return header
+
+    # 为旧格式的日志补充新列（只在列发生变化时执行一次）
+    def _migrate_header(self, old_header, new_header):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(self.path, 'r', encoding='utf-8', newline='') as src, \
+                open(tmp_path, 'w', encoding='utf-8', newline='') as dst:
+            reader = csv.reader(src)
+            writer = csv.writer(dst, lineterminator='\n')
+            next(reader, None)
+            writer.writerow(new_header)
+            padding = [''] * (len(new_header) - len(old_header))
+            for row in reader:
+                writer.writerow(row + padding)
+        os.replace(tmp_path, self.path)
+
+    # 追加记录，records为字典列表
+    def append(self, records):
+        if not records:
+            return
+        with self._lock, file_lock(self.path):
+            header = self._prepare_file()
+            with open(self.path, 'a', encoding='utf-8', newline='') as file:
+                writer = csv.writer(file, lineterminator='\n')
+                writer.writerows([[record.get(col, '') for col in header] for record in records])
+                file.flush()
+
+                # 定期fsync，在持久性和写入开销之间折中
+                self._unsynced += len(records)
+                now = time.monotonic()
+                if self._unsynced >= FSYNC_EVERY or now - self._last_sync >= FSYNC_INTERVAL:
+                    os.fsync(file.fileno())
+                    self._unsynced = 0
+                    self._last_sync = now
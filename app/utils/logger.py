@@ -0,0 +1,23 @@
+import os
+import sys
+import logging
+
+# 日志级别（DEBUG、INFO、WARNING、ERROR），默认INFO；调试数据加载等细节时设为DEBUG
+LOG_LEVEL = os.environ.get('COATING_LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+
+# 应用日志的根名称
+ROOT_LOGGER = 'coating'
+
+# 获取模块日志记录器，首次调用时配置输出格式和级别
+# 以是否已有处理器判断是否配置过，Streamlit重新加载模块时不会重复添加
+def get_logger(name):
+    root = logging.getLogger(ROOT_LOGGER)
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+        # 不再交给Streamlit等设置的根日志处理，避免重复输出
+        root.propagate = False
+    return root.getChild(name)
@@ -0,0 +1,130 @@
+import os
+import time
+import bisect
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from app.utils.file_utils import atomic_write_text
+
+# 耗时直方图的桶上限（秒），与Prometheus直方图的le标签对应
+TIMING_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 每个阶段保留用于计算分位数的最近样本数
+TIMING_SAMPLES = 2000
+# Prometheus指标名称
+METRIC_NAME = 'coating_stage_duration_seconds'
+# 指标文件的默认路径
+METRICS_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'metrics.prom')
+
+# 单个阶段的耗时直方图：累计桶计数用于导出，最近样本用于计算p50/p95/p99
+class TimingHistogram:
+    def __init__(self, buckets=TIMING_BUCKETS, samples=TIMING_SAMPLES):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # 最后一个为超出最大桶上限的次数
+        self._count = 0
+        self._sum = 0.0
+        self._samples = deque(maxlen=samples)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        position = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[position] += 1
+            self._count += 1
+            self._sum += seconds
+            self._samples.append(seconds)
+
+    # 获取当前统计：次数、总耗时、累计桶计数和最近样本的分位数（秒）
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self._count, self._sum
+            samples = sorted(self._samples)
+        cumulative = []
+        running = 0
+        for bucket, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative.append((bucket, running))
+        stats = {'count': count, 'sum': total, 'buckets': cumulative}
+        for name, q in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+            stats[name] = samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+        stats['max'] = samples[-1] if samples else 0.0
+        return stats
+
+# 各阶段的耗时统计
+class StageTimings:
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, TimingHistogram())
+        return histogram
+
+    def observe(self, stage, seconds):
+        self.histogram(stage).observe(seconds)
+
+    # 计时上下文：with timings.time('阶段'): ...
+    @contextmanager
+    def time(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    # 获取所有阶段的统计
+    def snapshot(self):
+        with self._lock:
+            stages = sorted(self._histograms.items())
+        return {stage: histogram.snapshot() for stage, histogram in stages}
+
+    # 清空统计
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    # 导出为Prometheus文本格式
+    def export_prometheus(self):
+        lines = [
+            f'# HELP {METRIC_NAME} Duration of query pipeline stages in seconds.',
+            f'# TYPE {METRIC_NAME} histogram',
+        ]
+        for stage, stats in self.snapshot().items():
+            for bucket, count in stats['buckets']:
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bucket:g}"}} {count}')
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {stats["count"]}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {stats["sum"]:.9f}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {stats["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    # 写入本地指标文件（可供node_exporter的textfile收集器读取）；extra为附加的其他指标文本
+    def write_prometheus_file(self, path=METRICS_FILE_PATH, extra=''):
+        atomic_write_text(path, self.export_prometheus() + extra)
+        return path
+
+_stage_timings = StageTimings()
+
+# 获取进程内共享的阶段耗时统计
+def get_stage_timings():
+    return _stage_timings
+
+# 计时上下文的简写
+def timed_stage(stage):
+    return _stage_timings.time(stage)
+
+# 函数计时装饰器
+def timed(stage):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _stage_timings.observe(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
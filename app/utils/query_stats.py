@@ -0,0 +1,86 @@
+import bisect
+import threading
+import pandas as pd
+
+# 未找到结果时记录的查询结果
+NOT_FOUND_RESULT = '未找到结果'
+
+# 按日预聚合的查询统计：每日、每用户、每个CAS号的查询次数和未找到次数
+# 统计任意日期范围时只需累加范围内各天的桶，开销与天数相关而与查询条数无关
+class QueryStatsRollup:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._days = []      # 有记录的日期（有序）
+        self._daily = {}     # 日期 -> [查询次数, 未找到次数]
+        self._users = {}     # 日期 -> {用户名: [查询次数, 未找到次数]}
+        self._cas = {}       # 日期 -> {CAS号: [查询次数, 未找到次数]}
+
+    # 清空统计
+    def reset(self):
+        with self._lock:
+            self._days = []
+            self._daily = {}
+            self._users = {}
+            self._cas = {}
+
+    # 累加一条查询记录
+    def add(self, username, cas_number, queried_at, result):
+        day = str(queried_at)[:10]
+        not_found = 1 if result == NOT_FOUND_RESULT else 0
+        with self._lock:
+            if day not in self._daily:
+                bisect.insort(self._days, day)
+                self._daily[day] = [0, 0]
+                self._users[day] = {}
+                self._cas[day] = {}
+            for bucket in (self._daily[day],
+                           self._users[day].setdefault(username, [0, 0]),
+                           self._cas[day].setdefault(cas_number, [0, 0])):
+                bucket[0] += 1
+                bucket[1] += not_found
+
+    # 日期范围内的日期列表
+    def _days_between(self, start_date, end_date):
+        lo = bisect.bisect_left(self._days, f"{start_date:%Y-%m-%d}") if start_date else 0
+        hi = bisect.bisect_right(self._days, f"{end_date:%Y-%m-%d}") if end_date else len(self._days)
+        return self._days[lo:hi]
+
+    # 最早和最晚的查询日期
+    def date_bounds(self):
+        with self._lock:
+            if not self._days:
+                return None, None
+            return pd.to_datetime(self._days[0]).date(), pd.to_datetime(self._days[-1]).date()
+
+    # 日期范围内的查询次数
+    def count(self, start_date=None, end_date=None):
+        with self._lock:
+            return sum(self._daily[day][0] for day in self._days_between(start_date, end_date))
+
+    # 按日期统计
+    def daily_counts(self, start_date=None, end_date=None):
+        with self._lock:
+            rows = [(day, *self._daily[day]) for day in self._days_between(start_date, end_date)]
+        return pd.DataFrame(rows, columns=['日期', '查询次数', '未找到次数'])
+
+    # 合并范围内各天的分组桶
+    def _sum_groups(self, groups, start_date, end_date):
+        totals = {}
+        with self._lock:
+            for day in self._days_between(start_date, end_date):
+                for key, (count, not_found) in groups[day].items():
+                    bucket = totals.setdefault(key, [0, 0])
+                    bucket[0] += count
+                    bucket[1] += not_found
+        return [(key, count, not_found) for key, (count, not_found) in totals.items()]
+
+    # 按用户统计
+    def user_counts(self, start_date=None, end_date=None):
+        rows = self._sum_groups(self._users, start_date, end_date)
+        return pd.DataFrame(rows, columns=['用户', '查询次数', '未找到次数']).sort_values('查询次数', ascending=False, ignore_index=True)
+
+    # 按CAS号统计，默认只返回查询次数最多的前limit个
+    def cas_counts(self, start_date=None, end_date=None, limit=None):
+        rows = self._sum_groups(self._cas, start_date, end_date)
+        counts = pd.DataFrame(rows, columns=['CAS号', '查询次数', '未找到次数']).sort_values('查询次数', ascending=False, ignore_index=True)
+        return counts if limit is None else counts.head(limit)
@@ -0,0 +1,72 @@
+import time
+import threading
+from collections import OrderedDict
+
+# 缓存的查询结果条数
+RESULT_CACHE_SIZE = 1024
+# 缓存条目的有效时间（秒）
+RESULT_CACHE_TTL = 3600.0
+
+# 有容量上限和有效期的LRU缓存，超出容量时淘汰最久未使用的条目
+class ResultCache:
+    def __init__(self, max_size=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()  # 键 -> (写入时间, 值)
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,           # 命中次数
+            'misses': 0,         # 未命中次数（含过期）
+            'expired': 0,        # 因过期失效的次数
+            'evictions': 0,      # 因容量淘汰的条目数
+            'invalidations': 0,  # 数据重新加载导致的整体清空次数
+        }
+
+    # 获取缓存的值，不存在或已过期时返回None
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and now - item[0] < self.ttl:
+                self._items.move_to_end(key)
+                self._stats['hits'] += 1
+                return item[1]
+            if item is not None:
+                del self._items[key]
+                self._stats['expired'] += 1
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    # 清空缓存（数据重新加载时调用）
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._stats['invalidations'] += 1
+
+    # 获取统计信息，包括命中率
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._items)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+# 获取进程内共享的查询结果缓存
+def get_result_cache():
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
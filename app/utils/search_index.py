@@ -0,0 +1,257 @@
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# 每个前缀节点保留的候选数
+PREFIX_CANDIDATES = 20
+# CAS号模糊匹配允许的最大编辑距离；数字少于FUZZY_MIN_DIGITS位的完整CAS号只允许1处差异
+MAX_EDIT_DISTANCE = 2
+# 输入达到该位数（接近完整CAS号长度）或本身是完整格式的CAS号时才做模糊匹配
+FUZZY_MIN_DIGITS = 7
+# 每个索引缓存的候选查询结果数（索引属于某个数据版本，缓存随版本一起替换）
+SUGGEST_CACHE_SIZE = 1024
+# 中文名称匹配使用的n-gram长度
+NAME_NGRAM_SIZES = (1, 2)
+
+# CAS号样式的输入：只包含数字、连字符和空白
+CAS_LIKE = re.compile(r'^[\d\-\s]+$')
+# 完整格式的CAS号（校验位可能错误）
+CAS_COMPLETE = re.compile(r'^\d{2,7}-\d{2}-\d$')
+
+# 模式串中每个字符出现位置的位掩码
+def pattern_masks(pattern):
+    masks = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+# 位并行编辑距离（Myers算法）：模式串的位掩码只需计算一次，适合同一查询与大量CAS号比较
+def bit_parallel_distance(masks, length, text):
+    if length == 0:
+        return len(text)
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+    pv, mv, score = full, 0, length
+    for char in text:
+        eq = masks.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return score
+
+# 两个字符串的编辑距离
+def edit_distance(a, b):
+    return bit_parallel_distance(pattern_masks(a), len(a), b)
+
+# 字符串的n-gram集合
+def ngrams(text, sizes):
+    grams = set()
+    for size in sizes:
+        grams.update(text[i:i + size] for i in range(len(text) - size + 1))
+    return grams
+
+# CAS号前缀树：每个节点保留前缀相同的前若干个CAS号
+class CasPrefixTrie:
+    def __init__(self, limit=PREFIX_CANDIDATES):
+        self.limit = limit
+        self._root = {}
+
+    def insert(self, cas_number):
+        node = self._root
+        for char in cas_number:
+            node = node.setdefault(char, {})
+            items = node.setdefault('', [])
+            if len(items) < self.limit:
+                items.append(cas_number)
+
+    def search(self, prefix):
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        return list(node.get('', []))
+
+# CAS号近似匹配的二元组长度（两位数字，共100种）
+CAS_GRAM_SIZE = 2
+
+# 数字矩阵（每行一个数字串）中每行各数字出现的次数，形状为(行数, 10)
+def digit_histograms(matrix):
+    digits = matrix.astype(np.int16) - ord('0')
+    return np.stack([(digits == digit).sum(axis=1) for digit in range(10)], axis=1).astype(np.int16)
+
+# 数字矩阵中每行各二元组出现的次数，形状为(行数, 100)
+def digit_gram_counts(matrix):
+    digits = matrix.astype(np.int16) - ord('0')
+    counts = np.zeros((matrix.shape[0], 10 ** CAS_GRAM_SIZE), dtype=np.uint8)
+    rows = np.arange(matrix.shape[0])
+    for start in range(matrix.shape[1] - CAS_GRAM_SIZE + 1):
+        codes = np.zeros(matrix.shape[0], dtype=np.int16)
+        for offset in range(CAS_GRAM_SIZE):
+            codes = codes * 10 + digits[:, start + offset]
+        np.add.at(counts, (rows, codes), 1)
+    return counts
+
+# CAS号数字串的近似匹配：按长度分组存为数字矩阵，先用编辑距离的下界向量化筛出候选，再用Myers算法计算准确的编辑距离
+# 两个下界都不会排除真正的匹配：
+# 1. 数字直方图：替换使两边各差1个数字，插入或删除使一边多1个，编辑距离不小于两个方向上多出的数字数中的较大者
+# 2. 二元组计数（q-gram引理）：编辑距离不超过k时，共有的二元组不少于 较长串的二元组数 - k * 二元组长度
+class CasDigitMatcher:
+    def __init__(self, keys):
+        groups = {}
+        for digits, entry_id in keys:
+            group = groups.setdefault(len(digits), ([], []))
+            group[0].append(digits)
+            group[1].append(entry_id)
+        self._buckets = {}
+        for length, (strings, entry_ids) in groups.items():
+            matrix = np.frombuffer(''.join(strings).encode('ascii'), dtype=np.uint8).reshape(len(strings), length)
+            self._buckets[length] = (matrix, np.array(entry_ids), digit_histograms(matrix), digit_gram_counts(matrix))
+
+    # 返回[(距离, 值)]，距离不超过max_distance
+    def search(self, digits, max_distance):
+        query = np.frombuffer(digits.encode('ascii'), dtype=np.uint8).reshape(1, -1)
+        query_histogram = digit_histograms(query)[0]
+        query_grams = digit_gram_counts(query)[0]
+        gram_codes = np.flatnonzero(query_grams)
+        masks = pattern_masks(digits)
+        results = []
+        for length in range(len(digits) - max_distance, len(digits) + max_distance + 1):
+            bucket = self._buckets.get(length)
+            if bucket is None or length == 0:
+                continue
+            matrix, entry_ids, histograms, gram_counts = bucket
+            surplus = histograms - query_histogram
+            bound = np.maximum(np.clip(surplus, 0, None).sum(axis=1), np.clip(-surplus, 0, None).sum(axis=1))
+            candidates = bound <= max_distance
+            required = max(length, len(digits)) - CAS_GRAM_SIZE + 1 - max_distance * CAS_GRAM_SIZE
+            if required > 0:
+                shared = np.minimum(gram_counts[:, gram_codes], query_grams[gram_codes]).sum(axis=1)
+                candidates &= shared >= required
+            for row in np.flatnonzero(candidates):
+                key = matrix[row].tobytes().decode('ascii')
+                distance = bit_parallel_distance(masks, len(digits), key)
+                if distance <= max_distance:
+                    results.append((distance, int(entry_ids[row])))
+        return results
+
+# 化学物质搜索索引：CAS号前缀、CAS号模糊匹配和中文名称n-gram匹配
+class ChemicalSearchIndex:
+    def __init__(self, records, cas_col='CAS号', name_col='中文名称', grade_col='绿色分级'):
+        self._entries = []          # (CAS号, 中文名称, 绿色分级)
+        self._by_cas = {}           # CAS号 -> 条目序号
+        self._trie = CasPrefixTrie()
+        # CAS号近似匹配的数字矩阵在第一次模糊匹配时才建立
+        self._matcher = None
+        self._matcher_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._name_index = {size: {} for size in NAME_NGRAM_SIZES}   # n-gram长度 -> {n-gram: 条目序号集合}
+        self._name_grams = {size: [] for size in NAME_NGRAM_SIZES}   # n-gram长度 -> 每个条目名称的n-gram数
+
+        for record in records:
+            cas_number = str(record.get(cas_col, '') or '')
+            if not cas_number or cas_number in self._by_cas:
+                continue
+            name = record.get(name_col)
+            name = '' if name is None or name != name else str(name)
+            entry_id = len(self._entries)
+            self._entries.append((cas_number, name, record.get(grade_col)))
+            self._by_cas[cas_number] = entry_id
+            self._trie.insert(cas_number)
+            for size in NAME_NGRAM_SIZES:
+                grams = ngrams(name, (size,))
+                self._name_grams[size].append(len(grams))
+                for gram in grams:
+                    self._name_index[size].setdefault(gram, set()).add(entry_id)
+
+    def __len__(self):
+        return len(self._entries)
+
+    # CAS号近似匹配器（只包含数字的CAS号），首次使用时建立
+    def _get_matcher(self):
+        with self._matcher_lock:
+            if self._matcher is None:
+                keys = ((cas_number.replace('-', ''), entry_id) for entry_id, (cas_number, _, _) in enumerate(self._entries))
+                self._matcher = CasDigitMatcher((digits, entry_id) for digits, entry_id in keys if digits.isdigit())
+            return self._matcher
+
+    def _suggestion(self, entry_id, match_type, score):
+        cas_number, name, grade = self._entries[entry_id]
+        return {'CAS号': cas_number, '中文名称': name, '绿色分级': grade, '匹配方式': match_type, '得分': round(score, 3)}
+
+    # CAS号匹配：完全匹配、前缀匹配、编辑距离匹配
+    def _suggest_cas(self, query):
+        scored = {}
+        if query in self._by_cas:
+            scored[self._by_cas[query]] = ('完全匹配', 1.0)
+        for cas_number in self._trie.search(query):
+            entry_id = self._by_cas[cas_number]
+            # 前缀越接近完整CAS号得分越高
+            scored.setdefault(entry_id, ('前缀匹配', 0.6 + 0.3 * len(query) / len(cas_number)))
+        # 输入接近完整CAS号长度，或本身是完整格式的CAS号时才做模糊匹配；短的完整CAS号只允许1处差异
+        digits = query.replace('-', '')
+        if digits.isdigit() and (len(digits) >= FUZZY_MIN_DIGITS or CAS_COMPLETE.match(query)):
+            max_distance = MAX_EDIT_DISTANCE if len(digits) >= FUZZY_MIN_DIGITS else 1
+            for distance, entry_id in self._get_matcher().search(digits, max_distance):
+                # 数字完全相同只是连字符位置不同时得分接近完全匹配
+                match_type, score = ('数字匹配', 0.95) if distance == 0 else ('相似CAS号', 0.8 - 0.2 * distance)
+                if entry_id not in scored or scored[entry_id][1] < score:
+                    scored[entry_id] = (match_type, score)
+        return scored
+
+    # 中文名称匹配：按共有n-gram的Dice系数排序，包含完整查询词的名称额外加分
+    # 单字查询使用单字索引，其余使用二元组索引，避免常用字带出过多候选
+    def _suggest_name(self, query):
+        size = 1 if len(query) == 1 else 2
+        query_grams = ngrams(query, (size,))
+        if not query_grams:
+            return {}
+        index, gram_counts = self._name_index[size], self._name_grams[size]
+        overlap = {}
+        for gram in query_grams:
+            for entry_id in index.get(gram, ()):
+                overlap[entry_id] = overlap.get(entry_id, 0) + 1
+        scored = {}
+        for entry_id, common in overlap.items():
+            score = 2 * common / (len(query_grams) + gram_counts[entry_id])
+            if query in self._entries[entry_id][1]:
+                score = min(1.0, score + 0.3)
+            scored[entry_id] = ('名称匹配', score)
+        return scored
+
+    # 返回按得分排序的候选；同一查询的结果缓存在索引中，页面每次重新运行时不再重复计算
+    def suggest(self, query, limit=10):
+        query = (query or '').strip()
+        if not query:
+            return []
+        key = (query, limit)
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return list(cached)
+        suggestions = self._suggest(query, limit)
+        with self._cache_lock:
+            self._cache[key] = tuple(suggestions)
+            if len(self._cache) > SUGGEST_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return suggestions
+
+    def _suggest(self, query, limit):
+        if CAS_LIKE.match(query):
+            scored = self._suggest_cas(re.sub(r'\s+', '', query))
+        else:
+            scored = self._suggest_name(query)
+        ranked = sorted(scored.items(), key=lambda item: (-item[1][1], self._entries[item[0]][0]))
+        return [self._suggestion(entry_id, match_type, score) for entry_id, (match_type, score) in ranked[:limit]]
@@ -0,0 +1,60 @@
+from types import MappingProxyType
+from app.utils.data_utils import (
+    search_chemical_by_cas,
+    normalize_cas,
+    get_dataset_version,
+    get_toxicity_level_description,
+    get_toxicity_level_color,
+    get_structure_image,
+    format_query_result
+)
+from app.utils.charts import get_toxicity_gauge, get_toxicity_gauge_svg, GAUGE_RENDERER
+from app.utils.result_cache import get_result_cache
+from app.utils.metrics import timed
+
+# 生成查询页面展示所需的全部内容（分级说明、颜色、仪表盘、结构图和日志文字），结果只读，可在会话间共享
+# structure为加载数据时生成的结构图缩略图(图像字节, 缓存条目)，页面直接显示这些字节
+@timed('result_prepare')
+def prepare_search_result(cas_number, record, structure=None):
+    if record is None:
+        return MappingProxyType({
+            'cas': cas_number,
+            'found': False,
+            'result_text': format_query_result(None),
+        })
+    toxicity_level = record.get('绿色分级', "未知")
+    level_color = get_toxicity_level_color(toxicity_level)
+    return MappingProxyType({
+        'cas': cas_number,
+        'found': True,
+        'record': record,
+        'chemical_name': record.get('中文名称', "未知"),
+        'toxicity_level': toxicity_level,
+        'limit_req': record.get('涂料现行标准限量要求', "暂无信息"),
+        'control_req': record.get('我国新污染物相关管理要求', "暂无信息"),
+        'level_desc': get_toxicity_level_description(toxicity_level),
+        'level_color': level_color,
+        # 仪表盘使用预生成的四种分级图表，不再逐条构建；只取页面使用的一种
+        'gauge_figure': None if GAUGE_RENDERER == 'svg' else get_toxicity_gauge(toxicity_level),
+        'gauge_svg': get_toxicity_gauge_svg(toxicity_level) if GAUGE_RENDERER == 'svg' else None,
+        'structure_image': structure[0] if structure else None,
+        'structure_width': structure[1]['width'] if structure else None,
+        'result_text': format_query_result(record),
+    })
+
+# 获取查询结果（按规范化CAS号和数据版本缓存，数据重新加载后自动失效）
+@timed('result_lookup')
+def get_search_result(cas_number, df):
+    cas_number = normalize_cas(cas_number)
+    version = get_dataset_version(df)
+    if version is None:
+        # 不是共享数据（例如临时传入的数据）时不缓存
+        return prepare_search_result(cas_number, search_chemical_by_cas(cas_number, df), get_structure_image(cas_number, df))
+
+    cache = get_result_cache()
+    key = (cas_number, version)
+    result = cache.get(key)
+    if result is None:
+        result = prepare_search_result(cas_number, search_chemical_by_cas(cas_number, df), get_structure_image(cas_number, df))
+        cache.put(key, result)
+    return result
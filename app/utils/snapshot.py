@@ -0,0 +1,83 @@
+import os
+import sys
+from app.utils.logger import get_logger
+
+# pyarrow随streamlit一起安装；缺失时退回直接解析Excel
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = get_logger(__name__)
+
+# 快照中记录源工作簿哈希的元数据键
+WORKBOOK_HASH_KEY = b'workbook_sha256'
+
+# 快照文件路径：与工作簿同目录、同名，扩展名为.arrow
+def snapshot_path(workbook_path):
+    return os.path.splitext(workbook_path)[0] + '.arrow'
+
+# 读取快照（Arrow IPC文件），快照不存在或与工作簿哈希不一致时返回None
+# 快照的作用是免去解析Excel：反序列化很快，但转为DataFrame时文字列会复制为Python字符串，
+# 数据表在每个进程中各占一份内存，并不与映射的文件共享
+def load_snapshot(workbook_path, workbook_hash):
+    if pa is None:
+        return None
+    path = snapshot_path(workbook_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        # 只读映射文件，读取时不需要先把整个文件复制到内存
+        with pa.memory_map(path, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            metadata = reader.schema.metadata or {}
+            if metadata.get(WORKBOOK_HASH_KEY, b'').decode() != workbook_hash:
+                logger.info("数据快照已过期，将重新生成: %s", path)
+                return None
+            table = reader.read_all()
+        # 去掉写入时附加的元数据，恢复为与read_excel一致的DataFrame（对象类型的文字列，后续处理与解析Excel时相同）
+        return table.replace_schema_metadata(None).to_pandas()
+    except Exception as e:
+        logger.warning("读取数据快照时出错: %s", e)
+        return None
+
+# 写入快照：先写临时文件再原子替换，避免其他进程读到半个文件
+def write_snapshot(df, workbook_path, workbook_hash):
+    if pa is None:
+        return False
+    path = snapshot_path(workbook_path)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({WORKBOOK_HASH_KEY: workbook_hash.encode()})
+        # 不压缩，读取时无需解压
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        logger.info("已生成数据快照: %s", path)
+        return True
+    except Exception as e:
+        logger.warning("写入数据快照时出错: %s", e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+
+# 命令行构建快照：python -m app.utils.snapshot [工作簿路径]
+def main(argv=None):
+    import pandas as pd
+    from app.utils.data_utils import DATA_PATH, compute_file_hash
+
+    argv = sys.argv[1:] if argv is None else argv
+    workbook_path = argv[0] if argv else DATA_PATH
+    if pa is None:
+        print("未安装pyarrow，无法生成数据快照")
+        return 1
+
+    df = pd.read_excel(workbook_path)
+    return 0 if write_snapshot(df, workbook_path, compute_file_hash(workbook_path)) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
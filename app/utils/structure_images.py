@@ -0,0 +1,175 @@
+import os
+import io
+import json
+import base64
+import hashlib
+import zipfile
+import threading
+from types import MappingProxyType
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 结构图缓存目录：缩略图按内容哈希存放，每个工作簿版本一个CAS号清单
+STRUCTURE_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'structures')
+# 缩略图的最大边长（像素）
+THUMBNAIL_SIZE = 320
+# 缩略图格式：PNG（默认）或WEBP，通过环境变量STRUCTURE_IMAGE_FORMAT选择；Pillow不支持WebP时使用PNG
+STRUCTURE_IMAGE_FORMAT = os.environ.get('STRUCTURE_IMAGE_FORMAT', 'PNG').upper()
+if STRUCTURE_IMAGE_FORMAT not in ('PNG', 'WEBP'):
+    STRUCTURE_IMAGE_FORMAT = 'PNG'
+# 格式对应的扩展名和MIME类型
+IMAGE_TYPES = {
+    'PNG': ('.png', 'image/png'),
+    'WEBP': ('.webp', 'image/webp'),
+}
+# 可能保存结构图的列（单元格中为图像字节或data:image的base64字符串）
+STRUCTURE_COLUMNS = ['化学结构', '结构式', '结构图']
+
+# 单元格中的结构图数据转为图像字节：支持字节和data:image开头的base64字符串，其他返回None
+def decode_structure_data(structure_data):
+    if isinstance(structure_data, (bytes, bytearray)):
+        return bytes(structure_data)
+    if isinstance(structure_data, str) and structure_data.startswith('data:image') and ',' in structure_data:
+        try:
+            return base64.b64decode(structure_data.split(',', 1)[1])
+        except ValueError:
+            return None
+    return None
+
+# 把原始图像规范为网页使用的缩略图（等比缩小到THUMBNAIL_SIZE以内），返回(图像字节, 宽, 高, 格式)
+# Pillow只在提取结构图时才导入
+def make_thumbnail(image_data, image_format=STRUCTURE_IMAGE_FORMAT):
+    from PIL import Image, features
+
+    if image_format == 'WEBP' and not features.check('webp'):
+        image_format = 'PNG'
+    with Image.open(io.BytesIO(image_data)) as image:
+        image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA')
+        output = io.BytesIO()
+        if image_format == 'WEBP':
+            image.save(output, format=image_format, lossless=True)
+        else:
+            image.save(output, format=image_format, optimize=True)
+        return output.getvalue(), image.width, image.height, image_format
+
+# 工作簿中嵌入的图片：按锚定单元格所在的行对应到CAS号（第1行为表头，与read_excel读取的行一致）
+def extract_workbook_images(path, cas_numbers):
+    # 没有媒体文件的工作簿不需要完整加载
+    try:
+        with zipfile.ZipFile(path) as archive:
+            if not any(name.startswith('xl/media/') for name in archive.namelist()):
+                return {}
+    except zipfile.BadZipFile:
+        return {}
+
+    # 只有非只读模式才会加载图片；read_excel默认读取第一个工作表
+    from openpyxl import load_workbook
+    workbook = load_workbook(path)
+    try:
+        images = {}
+        for image in getattr(workbook.worksheets[0], '_images', []):
+            anchor = getattr(image.anchor, '_from', None)
+            if anchor is None:
+                continue
+            position = anchor.row - 1
+            if 0 <= position < len(cas_numbers) and cas_numbers[position]:
+                images.setdefault(cas_numbers[position], image._data())
+        return images
+    finally:
+        workbook.close()
+
+# 结构图缓存：缩略图以内容的SHA-256命名，相同图像只存一份；清单记录每个工作簿版本中CAS号对应的缩略图
+class StructureImageCache:
+    def __init__(self, directory=STRUCTURE_CACHE_DIR):
+        self.directory = directory
+
+    def _image_path(self, digest, image_format):
+        return os.path.join(self.directory, digest[:2], digest + IMAGE_TYPES[image_format][0])
+
+    def _manifest_path(self, workbook_hash):
+        return os.path.join(self.directory, 'manifests', f"{workbook_hash}.json")
+
+    # 保存缩略图，返回内容哈希（已存在时不重复写入）
+    def put(self, image_bytes, image_format):
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        path = self._image_path(digest, image_format)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(image_bytes)
+            os.replace(tmp_path, path)
+        return digest
+
+    # 读取缩略图字节，文件不存在时返回None
+    def read(self, entry):
+        try:
+            with open(self._image_path(entry['digest'], entry['format']), 'rb') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def load_manifest(self, workbook_hash):
+        try:
+            with open(self._manifest_path(workbook_hash), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def write_manifest(self, workbook_hash, manifest):
+        path = self._manifest_path(workbook_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    # 加载数据时提取一次结构图：工作簿中嵌入的图片和结构图列中的图像，生成缩略图并写入缓存
+    # 同一工作簿版本已有清单时直接读取清单；返回CAS号 -> {digest, format, width, height}
+    def ingest(self, workbook_path, workbook_hash, df, cas_col='CAS号'):
+        manifest = self.load_manifest(workbook_hash)
+        if manifest is not None:
+            return MappingProxyType(manifest)
+
+        cas_numbers = df[cas_col].tolist()
+        sources = extract_workbook_images(workbook_path, cas_numbers)
+        for col in STRUCTURE_COLUMNS:
+            if col in df.columns:
+                for cas_number, value in zip(cas_numbers, df[col].tolist()):
+                    image_data = decode_structure_data(value)
+                    if cas_number and image_data:
+                        sources.setdefault(cas_number, image_data)
+        if not sources:
+            # 没有结构图时不写清单，下次加载同样只需检查一次
+            return MappingProxyType({})
+
+        manifest = {}
+        for cas_number, image_data in sources.items():
+            try:
+                thumbnail, width, height, image_format = make_thumbnail(image_data)
+            except Exception as e:
+                logger.warning("处理CAS号%s的结构图时出错: %s", cas_number, e)
+                continue
+            digest = self.put(thumbnail, image_format)
+            manifest[cas_number] = {'digest': digest, 'format': image_format, 'width': width, 'height': height}
+        self.write_manifest(workbook_hash, manifest)
+        logger.info("已提取%d个结构图", len(manifest))
+        return MappingProxyType(manifest)
+
+_structure_cache = None
+_structure_cache_lock = threading.Lock()
+
+# 获取进程内共享的结构图缓存
+def get_structure_cache():
+    global _structure_cache
+    with _structure_cache_lock:
+        if _structure_cache is None:
+            _structure_cache = StructureImageCache()
+        return _structure_cache
+
+# 结构图的MIME类型
+def structure_mime_type(entry):
+    return IMAGE_TYPES[entry['format']][1]
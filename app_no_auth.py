@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import os
 
 # 设置页面配置 - 必须是第一个st命令
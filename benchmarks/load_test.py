@@ -0,0 +1,309 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+from datetime import datetime
+from urllib.parse import urlencode
+import pandas as pd
+from tornado.websocket import websocket_connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 服务端运行的页面：跳过登录直接渲染查询页面
+APP_SCRIPT = os.path.join(ROOT_DIR, 'benchmarks', 'loadtest_app.py')
+# 默认从正式查询日志中统计CAS号的查询频率
+DEFAULT_CAS_SOURCE = os.path.join(ROOT_DIR, 'app', 'data', 'query_logs.csv')
+# 压力测试使用的使用用途
+USAGES = ["溶剂", "颜料", "助剂", "成膜物质", "填料", "固化剂", "涂料"]
+
+# 从查询日志统计CAS号的查询频率，作为模拟查询的分布
+def load_cas_distribution(path):
+    counts = pd.read_csv(path, usecols=['CAS号'], dtype=str, keep_default_na=False)['CAS号'].value_counts()
+    counts = counts[counts.index != '']
+    if counts.empty:
+        raise ValueError(f"{path} 中没有可用的CAS号")
+    return counts.index.tolist(), counts.values.tolist()
+
+def percentiles(values):
+    if not values:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0, 'mean': 0.0}
+    ordered = sorted(values)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99), 'max': ordered[-1], 'mean': statistics.mean(ordered)}
+
+# 进程的常驻内存（字节），仅Linux可用
+def process_rss(pid):
+    try:
+        with open(f'/proc/{pid}/status', 'r') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+# 启动本地Streamlit服务（只监听127.0.0.1，不访问外网），等待健康检查通过
+def start_server(port, env, timeout):
+    command = [
+        sys.executable, '-m', 'streamlit', 'run', APP_SCRIPT,
+        '--server.headless', 'true',
+        '--server.address', '127.0.0.1',
+        '--server.port', str(port),
+        '--server.fileWatcherType', 'none',
+        '--server.enableXsrfProtection', 'false',
+        '--browser.gatherUsageStats', 'false',
+        '--global.developmentMode', 'false',
+    ]
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Streamlit服务启动失败，退出码 {process.returncode}")
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Streamlit服务在{timeout}秒内未就绪")
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+# 通过websocket与服务端通信的无界面会话，发送的消息与浏览器相同
+class HeadlessSession:
+    def __init__(self, port, query, timeout):
+        self.url = f'ws://127.0.0.1:{port}/_stcore/stream'
+        self.query_string = urlencode(query)
+        self.timeout = timeout
+        self.connection = None
+        self.page_script_hash = ''
+        # 用户指定的key -> 组件id
+        self.widget_ids = {}
+
+    async def connect(self):
+        self.connection = await websocket_connect(self.url, max_message_size=64 * 1024 * 1024)
+        return await self.rerun({})
+
+    # 以给定的组件状态重新运行页面，等待运行成功结束（包括脚本内st.rerun()触发的重跑），返回页面中的异常
+    async def rerun(self, values, triggers=()):
+        msg = BackMsg()
+        state = msg.rerun_script
+        state.query_string = self.query_string
+        state.page_script_hash = self.page_script_hash
+        for key, value in values.items():
+            widget = state.widget_states.widgets.add()
+            widget.id = self.widget_ids.get(key, key)
+            widget.string_value = value
+        for key in triggers:
+            widget = state.widget_states.widgets.add()
+            widget.id = self.widget_ids[key]
+            widget.trigger_value = True
+        await self.connection.write_message(msg.SerializeToString(), binary=True)
+        return await asyncio.wait_for(self._wait_finished(), self.timeout)
+
+    async def _wait_finished(self):
+        exceptions = []
+        while True:
+            data = await self.connection.read_message()
+            if data is None:
+                raise ConnectionError("服务端关闭了连接")
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            kind = msg.WhichOneof('type')
+            if kind == 'new_session':
+                self.page_script_hash = msg.new_session.page_script_hash
+            elif kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                element = msg.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'exception':
+                    exceptions.append(f"{element.exception.type}: {element.exception.message}")
+                elif element_type in ('text_input', 'button'):
+                    widget_id = getattr(element, element_type).id
+                    self.widget_ids[widget_id.rsplit('-', 1)[-1]] = widget_id
+            elif kind == 'script_finished':
+                if msg.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY:
+                    return exceptions
+                if msg.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    raise RuntimeError("页面脚本编译失败")
+
+    async def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+# 单个模拟用户：在已建立的会话中按分布连续查询
+async def simulate_user(session, rng, cas_numbers, weights, queries, think_time, start_event, latencies, errors):
+    await start_event.wait()
+    for cas_number in rng.choices(cas_numbers, weights=weights, k=queries):
+        started = time.perf_counter()
+        try:
+            values = {'cas_search': cas_number, 'usage_search': rng.choice(USAGES)}
+            exceptions = await session.rerun(values, triggers=('search_button',))
+            latencies.append(time.perf_counter() - started)
+            errors.extend(exceptions)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        if think_time:
+            await asyncio.sleep(rng.expovariate(1.0 / think_time))
+
+# 发送控制请求（清空阶段耗时或写出服务端统计）
+async def control(port, action, timeout):
+    session = HeadlessSession(port, {'action': action}, timeout)
+    try:
+        await session.connect()
+    finally:
+        await session.close()
+
+async def drive(port, pid, users, queries, think_time, cas_numbers, weights, timeout, seed):
+    # 预热：首次运行页面时加载化学物质数据，测量的是数据已缓存后的稳定状态
+    await control(port, 'reset', timeout)
+    warmup = HeadlessSession(port, {'user': 'loadtest-warmup'}, timeout)
+    await warmup.connect()
+    await warmup.close()
+    rss_start = process_rss(pid)
+
+    # 依次建立会话并完成首次页面运行（计入内存但不计入查询延迟）
+    sessions = []
+    for index in range(users):
+        session = HeadlessSession(port, {'user': f'loadtest{index}'}, timeout)
+        await session.connect()
+        sessions.append(session)
+    rss_sessions = process_rss(pid)
+    await control(port, 'reset', timeout)
+
+    latencies, errors = [], []
+    start_event = asyncio.Event()
+    tasks = [asyncio.create_task(simulate_user(session, random.Random(seed + index), cas_numbers, weights, queries,
+                                               think_time, start_event, latencies, errors))
+             for index, session in enumerate(sessions)]
+    started = time.perf_counter()
+    start_event.set()
+    await asyncio.gather(*tasks)
+    duration = time.perf_counter() - started
+    rss_end = process_rss(pid)
+
+    for session in sessions:
+        await session.close()
+    await control(port, 'report', timeout)
+    return latencies, errors, duration, (rss_start, rss_sessions, rss_end)
+
+def run_load_test(users, queries, think_time, cas_source, log_dir, log_backend, timeout, seed):
+    cas_numbers, weights = load_cas_distribution(cas_source)
+    report_path = os.path.join(log_dir, 'server_report.json')
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT_DIR, env.get('PYTHONPATH')]))
+    # 查询记录写入单独的目录，不影响正式日志
+    env['QUERY_LOG_PATH'] = os.path.join(log_dir, 'query_logs.csv')
+    env['LOADTEST_REPORT_PATH'] = report_path
+    env.setdefault('COATING_LOG_LEVEL', 'WARNING')
+    if log_backend:
+        env['QUERY_LOG_BACKEND'] = log_backend
+
+    port = free_port()
+    server = start_server(port, env, timeout)
+    try:
+        latencies, errors, duration, (rss_start, rss_sessions, rss_end) = asyncio.run(
+            drive(port, server.pid, users, queries, think_time, cas_numbers, weights, timeout, seed))
+    finally:
+        stop_server(server)
+
+    with open(report_path, 'r', encoding='utf-8') as file:
+        server_report = json.load(file)
+    stages = server_report['stages']
+    stage_ms = lambda name: {key: stages[name][key] * 1000 for key in ('p50', 'p95', 'p99', 'max')} if name in stages else None
+    per_session = (rss_end - rss_start) / users if rss_start is not None and rss_end is not None else None
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'users': users,
+            'queries_per_user': queries,
+            'think_time_s': think_time,
+            'cas_source': cas_source,
+            'distinct_cas': len(cas_numbers),
+            'log_backend': env.get('QUERY_LOG_BACKEND', 'csv'),
+            'log_path': env['QUERY_LOG_PATH'],
+        },
+        'results': {
+            'queries': len(latencies),
+            'errors': len(errors),
+            'error_samples': errors[:5],
+            'duration_s': duration,
+            'throughput_qps': len(latencies) / duration if duration else 0.0,
+            'latency_ms': {key: value * 1000 for key, value in percentiles(latencies).items()},
+            # 服务进程的常驻内存：预热后、建立全部会话后、查询结束后；每会话内存按查询结束后（会话已保存查询结果）计算
+            'memory': {
+                'rss_start_bytes': rss_start,
+                'rss_after_sessions_bytes': rss_sessions,
+                'rss_end_bytes': rss_end,
+                'per_session_bytes': per_session,
+            },
+            # 查询记录写入的争用：提交耗时、后台写入耗时（含文件锁等待）、队列阻塞和丢弃
+            'log_writes': {
+                'flushed': server_report['flushed'],
+                'submit_ms': stage_ms('query_log_submit'),
+                'write_ms': stage_ms('query_log_write'),
+                **server_report['sink'],
+            },
+            'stages_ms': {name: stage_ms(name) for name in stages},
+        },
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="模拟多个已登录用户同时使用查询页面的压力测试（启动本地Streamlit服务，离线运行）")
+    parser.add_argument('--users', type=int, default=20, help="并发用户数")
+    parser.add_argument('--queries', type=int, default=20, help="每个用户的查询次数")
+    parser.add_argument('--think-time', type=float, default=0.0, help="两次查询之间的平均间隔（秒），0表示连续查询")
+    parser.add_argument('--cas-source', default=DEFAULT_CAS_SOURCE, help="用于统计CAS号分布的查询日志")
+    parser.add_argument('--log-dir', help="压力测试查询记录的写入目录，默认使用临时目录并在结束后删除")
+    parser.add_argument('--log-backend', choices=['csv', 'sqlite'], help="查询记录的存储方式，默认与QUERY_LOG_BACKEND相同")
+    parser.add_argument('--timeout', type=float, default=60.0, help="服务启动和单次页面运行的超时时间（秒）")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="结果JSON文件，默认输出到标准输出")
+    args = parser.parse_args(argv)
+
+    log_dir = args.log_dir or tempfile.mkdtemp(prefix='loadtest_')
+    os.makedirs(log_dir, exist_ok=True)
+    try:
+        report = run_load_test(args.users, args.queries, args.think_time, args.cas_source, os.path.abspath(log_dir),
+                               args.log_backend, args.timeout, args.seed)
+    finally:
+        if not args.log_dir:
+            shutil.rmtree(log_dir, ignore_errors=True)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+    results = report['results']
+    per_session = results['memory']['per_session_bytes']
+    memory_text = f"{per_session / 1024 / 1024:.2f} MiB" if per_session is not None else "未知"
+    print(f"{results['queries']}次查询，{results['errors']}次错误，吞吐 {results['throughput_qps']:.1f} 次/秒，"
+          f"p50 {results['latency_ms']['p50']:.1f} ms，p99 {results['latency_ms']['p99']:.1f} ms，"
+          f"每会话内存 {memory_text}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+import os
+import json
+import streamlit as st
+from app.pages.search_page import render_search_page
+from app.utils.metrics import get_stage_timings
+from app.utils.log_sink import get_query_log_sink
+
+# 压力测试使用的页面，由benchmarks/load_test.py启动的本地Streamlit服务运行
+# 跳过登录，直接以查询参数user中的用户名渲染查询页面（与app.py登录成功后的调用相同）
+# 查询参数action用于压力测试控制：reset清空阶段耗时，report把服务端统计写入LOADTEST_REPORT_PATH
+REPORT_PATH = os.environ.get('LOADTEST_REPORT_PATH')
+
+action = st.query_params.get('action')
+if action == 'reset':
+    get_stage_timings().reset()
+    st.write("reset")
+elif action == 'report':
+    sink = get_query_log_sink()
+    flushed = sink.flush(timeout=60)
+    report = {'flushed': flushed, 'sink': sink.get_stats(), 'stages': get_stage_timings().snapshot()}
+    if REPORT_PATH:
+        with open(REPORT_PATH, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False)
+    st.write("report")
+else:
+    render_search_page(st.query_params.get('user', 'loadtest'))
@@ -0,0 +1,256 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+from app.utils.data_utils import load_chemicals_data, search_chemical_by_cas, search_chemicals_by_cas_list, suggest_chemicals, clear_dataset_cache
+from app.utils.snapshot import snapshot_path
+from app.utils.log_store import CsvLogStore, SqliteLogStore
+from app.utils.log_sink import QueryLogSink
+from app.utils.logger import ROOT_LOGGER
+from benchmarks.synthetic import make_chemicals_workbook, make_query_log_csv
+
+# 默认规模：化学物质表行数和查询日志行数（更大规模通过命令行参数指定，如1000000）
+DEFAULT_CHEMICAL_SIZES = [1000, 10000, 100000]
+DEFAULT_LOG_SIZES = [10000, 100000, 1000000]
+# 单次查询类基准每轮执行的次数
+LOOKUP_OPS = 2000
+# 写日志基准提交的记录数
+LOG_SUBMIT_OPS = 20000
+# 生成的测试数据默认存放目录
+DEFAULT_WORKDIR = os.path.join(os.path.dirname(__file__), '.data')
+
+# 计时并测量峰值内存：先重复计时repeat轮，再在tracemalloc下单独运行一轮测量峰值
+# setup在每轮计时前执行且不计入耗时；ops为每轮包含的操作数，用于计算单次操作耗时
+def measure(name, func, repeat=3, setup=None, ops=1, params=None):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'name': name,
+        'params': params or {},
+        'repeat': repeat,
+        'ops': ops,
+        'min_ms': min(times) * 1000,
+        'median_ms': statistics.median(times) * 1000,
+        'max_ms': max(times) * 1000,
+        'per_op_us': min(times) / ops * 1e6,
+        'peak_memory_bytes': peak,
+    }
+    print(f"{name:<32} {json.dumps(result['params'], ensure_ascii=False):<24} "
+          f"median {result['median_ms']:10.3f} ms  per op {result['per_op_us']:10.2f} us  peak {peak / 1024 / 1024:8.2f} MiB",
+          file=sys.stderr)
+    return result
+
+# 化学物质表相关基准：冷启动加载（解析Excel/读取快照）、缓存命中、单个查询、候选建议和批量查询
+def bench_chemicals(workdir, rows, repeat, seed):
+    params = {'rows': rows}
+    path, df = make_chemicals_workbook(workdir, rows, seed)
+    snapshot = snapshot_path(path)
+    rng = random.Random(seed)
+    hits = rng.choices(df['CAS号'].tolist(), k=LOOKUP_OPS)
+    misses = [f"{rng.randint(50, 99999)}-00-0" for _ in range(LOOKUP_OPS)]
+    prefixes = [cas[:rng.randint(2, 6)] for cas in hits[:200]]
+
+    def cold_without_snapshot():
+        clear_dataset_cache()
+        if os.path.exists(snapshot):
+            os.remove(snapshot)
+
+    results = [
+        measure('load_chemicals_data/excel', lambda: load_chemicals_data(path), max(1, min(repeat, 2)), cold_without_snapshot, params=params),
+        measure('load_chemicals_data/snapshot', lambda: load_chemicals_data(path), repeat, clear_dataset_cache, params=params),
+        measure('load_chemicals_data/cached', lambda: [load_chemicals_data(path) for _ in range(LOOKUP_OPS)], repeat, ops=LOOKUP_OPS, params=params),
+    ]
+    loaded = load_chemicals_data(path)
+    results += [
+        measure('search_chemical_by_cas/hit', lambda: [search_chemical_by_cas(cas, loaded) for cas in hits], repeat, ops=LOOKUP_OPS, params=params),
+        measure('search_chemical_by_cas/miss', lambda: [search_chemical_by_cas(cas, loaded) for cas in misses], repeat, ops=LOOKUP_OPS, params=params),
+        measure('suggest_chemicals/prefix', lambda: [suggest_chemicals(prefix, loaded, 5) for prefix in prefixes], repeat, ops=len(prefixes), params=params),
+        measure('search_chemicals_by_cas_list/1000', lambda: search_chemicals_by_cas_list(hits[:1000], loaded), repeat, params=params),
+    ]
+    return results
+
+# 管理面板“查询记录”页的全部统计：日期范围、总数、最近记录、按日/用户/CAS号汇总
+def admin_aggregations(store):
+    min_date, max_date = store.date_bounds()
+    store.count_logs(min_date, max_date)
+    store.query_logs(min_date, max_date, limit=1000)
+    store.daily_counts(min_date, max_date)
+    store.user_counts(min_date, max_date)
+    store.cas_counts(min_date, max_date, limit=20)
+
+# 查询日志相关基准：读取全部记录、管理面板统计（首次/增量）、SQLite导入
+def bench_logs(workdir, rows, cas_numbers, repeat, seed):
+    params = {'rows': rows}
+    csv_path = make_query_log_csv(workdir, rows, cas_numbers, seed)
+    db_path = os.path.join(workdir, f'query_logs_{rows}_{seed}.db')
+    stores = {}
+
+    def new_csv_store():
+        stores['csv'] = CsvLogStore(csv_path)
+
+    def remove_db():
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+    new_csv_store()
+    results = [
+        # get_all_query_logs读取全部记录
+        measure('get_all_query_logs/csv', lambda: stores['csv'].query_logs(), max(1, min(repeat, 2)), params=params),
+        measure('admin_aggregations/csv_first', lambda: admin_aggregations(stores['csv']), repeat, new_csv_store, params=params),
+        measure('admin_aggregations/csv_warm', lambda: admin_aggregations(stores['csv']), repeat, params=params),
+        measure('sqlite_import', lambda: stores.__setitem__('sqlite', SqliteLogStore(db_path, csv_path)), 1, remove_db, params=params),
+    ]
+    stores['sqlite'] = SqliteLogStore(db_path, csv_path)
+    results += [
+        measure('get_all_query_logs/sqlite', lambda: stores['sqlite'].query_logs(), max(1, min(repeat, 2)), params=params),
+        measure('admin_aggregations/sqlite', lambda: admin_aggregations(stores['sqlite']), repeat, params=params),
+    ]
+    remove_db()
+    return results
+
+# 写查询记录基准：save_query_record经异步队列写入，测量提交耗时和写完全部记录的总耗时
+def bench_log_writes(workdir, repeat):
+    results = []
+    for backend in ('csv', 'sqlite'):
+        paths = {}
+        directories = []
+
+        def new_store():
+            directory = tempfile.mkdtemp(dir=workdir)
+            directories.append(directory)
+            paths['csv'] = os.path.join(directory, 'query_logs.csv')
+            paths['store'] = CsvLogStore(paths['csv']) if backend == 'csv' else SqliteLogStore(os.path.join(directory, 'query_logs.db'), paths['csv'])
+
+        records = [{'用户名': f"user{i % 50}", 'CAS号': '100-01-6', '使用用途': '涂料',
+                    '查询时间': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), '查询结果': '对硝基苯胺 - 毒性分级: 4级'}
+                   for i in range(LOG_SUBMIT_OPS)]
+
+        def submit_only():
+            sink = QueryLogSink(paths['store'], max_queue_size=LOG_SUBMIT_OPS + 1).start()
+            for record in records:
+                sink.submit([record])
+            paths['sink'] = sink
+
+        def submit_and_flush():
+            submit_only()
+            paths['sink'].flush(timeout=600)
+            paths['sink'].stop()
+
+        def stop_sink():
+            sink = paths.pop('sink', None)
+            if sink is not None:
+                sink.stop()
+
+        params = {'backend': backend, 'records': LOG_SUBMIT_OPS}
+        results.append(measure('save_query_record/submit', submit_only, repeat, lambda: (stop_sink(), new_store()), ops=LOG_SUBMIT_OPS, params=params))
+        stop_sink()
+        results.append(measure('save_query_record/written', submit_and_flush, repeat, new_store, ops=LOG_SUBMIT_OPS, params=params))
+        for directory in directories:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# 与之前的结果比较：按名称和参数对应，输出耗时比例（大于1表示变慢）
+def compare(previous_path, results):
+    with open(previous_path, 'r', encoding='utf-8') as file:
+        previous = {(item['name'], json.dumps(item['params'], sort_keys=True)): item for item in json.load(file)['results']}
+    print(f"\n与 {previous_path} 比较（当前/之前）:", file=sys.stderr)
+    for item in results:
+        old = previous.get((item['name'], json.dumps(item['params'], sort_keys=True)))
+        if old is None:
+            continue
+        time_ratio = item['median_ms'] / old['median_ms'] if old['median_ms'] else float('inf')
+        memory_ratio = item['peak_memory_bytes'] / old['peak_memory_bytes'] if old['peak_memory_bytes'] else float('inf')
+        print(f"{item['name']:<32} {json.dumps(item['params'], ensure_ascii=False):<24} 耗时 x{time_ratio:6.2f}  峰值内存 x{memory_ratio:6.2f}", file=sys.stderr)
+
+def parse_sizes(text):
+    return [int(size) for size in text.split(',') if size.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询、日志写入和管理面板统计的基准测试")
+    parser.add_argument('--chemical-sizes', type=parse_sizes, default=DEFAULT_CHEMICAL_SIZES, help="化学物质表行数，逗号分隔")
+    parser.add_argument('--log-sizes', type=parse_sizes, default=DEFAULT_LOG_SIZES, help="查询日志行数，逗号分隔")
+    parser.add_argument('--repeat', type=int, default=3, help="每项基准的重复次数")
+    parser.add_argument('--seed', type=int, default=0, help="生成测试数据的随机种子")
+    parser.add_argument('--workdir', default=DEFAULT_WORKDIR, help="测试数据目录（生成的数据会保留以便复用）")
+    parser.add_argument('--output', help="结果JSON文件，默认输出到标准输出")
+    parser.add_argument('--compare', help="之前的结果JSON文件，输出耗时和内存的变化")
+    parser.add_argument('--skip', default='', help="跳过的基准组：chemicals,logs,writes")
+    args = parser.parse_args(argv)
+
+    # 基准测试期间只输出警告以上的日志
+    logging.getLogger(ROOT_LOGGER).setLevel(logging.WARNING)
+    os.makedirs(args.workdir, exist_ok=True)
+    skip = set(args.skip.split(','))
+
+    results = []
+    for rows in args.chemical_sizes:
+        if 'chemicals' not in skip:
+            results += bench_chemicals(args.workdir, rows, args.repeat, args.seed)
+    if 'logs' not in skip:
+        # 日志中的CAS号取自最小规模的化学物质表
+        _, df = make_chemicals_workbook(args.workdir, min(args.chemical_sizes or [1000]), args.seed)
+        cas_numbers = df['CAS号'].tolist()
+        for rows in args.log_sizes:
+            results += bench_logs(args.workdir, rows, cas_numbers, args.repeat, args.seed)
+    if 'writes' not in skip:
+        results += bench_log_writes(args.workdir, args.repeat)
+    clear_dataset_cache()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'chemical_sizes': args.chemical_sizes,
+            'log_sizes': args.log_sizes,
+            'repeat': args.repeat,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+    if args.compare:
+        compare(args.compare, results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
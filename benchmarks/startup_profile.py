@@ -0,0 +1,166 @@
+import os
+import sys
+import json
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime
+from benchmarks.run_benchmarks import git_commit
+
+# 项目根目录（入口脚本按相对路径读取数据目录，子进程在此目录运行）
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 启动场景：(运行方式, 入口脚本, 之后按需导入的模块)
+# import只执行入口脚本的模块级代码，不运行main；render用Streamlit的AppTest完整运行一次脚本（计入测试框架本身的导入）
+SCENARIOS = {
+    # 未登录访客：入口脚本的模块级代码
+    'welcome': ('import', 'app.py', []),
+    # 未登录访客打开页面：创建验证器并渲染登录框
+    'login_form': ('render', 'app.py', []),
+    # 登录后的查询页面
+    'search': ('import', 'app.py', ['app.pages.search_page']),
+    # 管理员：查询页面和管理面板
+    'admin': ('import', 'app.py', ['app.pages.search_page', 'app.pages.admin_page']),
+    # 免登录入口
+    'no_auth': ('import', 'app_no_auth.py', []),
+}
+# 单独列出是否加载的较重依赖
+HEAVY_PACKAGES = ['pandas', 'pyarrow', 'openpyxl', 'PIL', 'plotly', 'matplotlib', 'streamlit_authenticator']
+
+# 在子进程中运行的代码：执行入口脚本（模块级代码或完整运行一次）并导入指定模块，输出耗时和峰值内存
+CHILD_CODE = """
+import sys, json, time, runpy, importlib
+started = time.perf_counter()
+if sys.argv[1] == 'render':
+    from streamlit.testing.v1 import AppTest
+    app_test = AppTest.from_file(sys.argv[2], default_timeout=60).run()
+    if app_test.exception:
+        raise RuntimeError(app_test.exception[0].value)
+else:
+    runpy.run_path(sys.argv[2], run_name='__startup_profile__')
+for name in sys.argv[3:]:
+    importlib.import_module(name)
+elapsed = time.perf_counter() - started
+try:
+    import resource
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+except ImportError:
+    peak_rss = None
+print(json.dumps({'elapsed': elapsed, 'peak_rss': peak_rss, 'modules': len(sys.modules)}))
+"""
+
+# 解析 -X importtime 的输出：每行为“import time: 自身耗时 | 累计耗时 | 模块名”（微秒）
+def parse_importtime(text):
+    modules = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+# 运行一次场景，返回(子进程输出的测量结果, 导入的模块列表)
+def run_scenario(mode, script, modules):
+    env = dict(os.environ, PYTHONPATH=ROOT_DIR, COATING_LOG_LEVEL='WARNING')
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD_CODE, mode, script] + modules,
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"场景运行失败（{script}）：\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1]), parse_importtime(completed.stderr)
+
+# 按顶层包汇总自身耗时，得到耗时最多的包
+def top_packages(imported, top):
+    totals = {}
+    for name, self_us, _ in imported:
+        package = name.split('.')[0]
+        totals[package] = totals.get(package, 0) + self_us
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{'package': package, 'self_ms': self_us / 1000} for package, self_us in ranked]
+
+# 每个场景运行repeat次（每次都是新进程），耗时和内存取中位数；导入明细取最后一次
+def profile(scenarios, repeat=3, top=15):
+    results = []
+    for name in scenarios:
+        mode, script, modules = SCENARIOS[name]
+        runs = [run_scenario(mode, script, modules) for _ in range(repeat)]
+        measured = [run for run, _ in runs]
+        imported = runs[-1][1]
+        loaded = {module.split('.')[0] for module, _, _ in imported}
+        peak_rss = [run['peak_rss'] for run in measured if run['peak_rss'] is not None]
+        results.append({
+            'name': name,
+            'mode': mode,
+            'script': script,
+            'modules': modules,
+            'elapsed_ms': statistics.median(run['elapsed'] for run in measured) * 1000,
+            'import_ms': sum(self_us for _, self_us, _ in imported) / 1000,
+            'peak_rss_mb': statistics.median(peak_rss) / 1024 / 1024 if peak_rss else None,
+            'module_count': measured[-1]['modules'],
+            'heavy_packages': [package for package in HEAVY_PACKAGES if package in loaded],
+            'top_packages': top_packages(imported, top),
+        })
+    return results
+
+def print_summary(results):
+    for item in results:
+        memory_text = f"{item['peak_rss_mb']:.1f} MiB" if item['peak_rss_mb'] is not None else "未知"
+        print(f"{item['name']:<10} 启动 {item['elapsed_ms']:8.1f} ms  导入 {item['import_ms']:8.1f} ms  "
+              f"峰值内存 {memory_text}  模块数 {item['module_count']}", file=sys.stderr)
+        print(f"           已加载: {', '.join(item['heavy_packages']) or '无'}", file=sys.stderr)
+        for package in item['top_packages'][:5]:
+            print(f"           {package['package']:<28} {package['self_ms']:8.1f} ms", file=sys.stderr)
+
+# 与之前的结果比较：按场景名对应，输出启动耗时和峰值内存的比例（小于1表示改善）
+def compare(previous_path, results):
+    with open(previous_path, 'r', encoding='utf-8') as file:
+        previous = {item['name']: item for item in json.load(file)['results']}
+    print(f"\n与 {previous_path} 比较（当前/之前）:", file=sys.stderr)
+    for item in results:
+        old = previous.get(item['name'])
+        if old is None:
+            continue
+        time_ratio = item['elapsed_ms'] / old['elapsed_ms'] if old['elapsed_ms'] else float('inf')
+        memory_ratio = item['peak_rss_mb'] / old['peak_rss_mb'] if item['peak_rss_mb'] and old['peak_rss_mb'] else float('nan')
+        print(f"{item['name']:<10} 启动耗时 x{time_ratio:6.2f}  峰值内存 x{memory_ratio:6.2f}", file=sys.stderr)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="入口脚本的启动耗时、导入明细和峰值内存（基于 -X importtime）")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help=f"场景，逗号分隔：{','.join(SCENARIOS)}")
+    parser.add_argument('--repeat', type=int, default=3, help="每个场景运行的次数（每次都是新进程）")
+    parser.add_argument('--top', type=int, default=15, help="输出自身耗时最多的包的数量")
+    parser.add_argument('--output', help="结果JSON文件，默认输出到标准输出")
+    parser.add_argument('--compare', help="之前的结果JSON文件，输出启动耗时和内存的变化")
+    args = parser.parse_args(argv)
+
+    scenarios = [name for name in args.scenarios.split(',') if name]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景：{', '.join(unknown)}")
+    results = profile(scenarios, args.repeat, args.top)
+    print_summary(results)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text)
+    else:
+        print(text)
+    if args.compare:
+        compare(args.compare, results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import os
+import csv
+import random
+import itertools
+from datetime import datetime, timedelta
+import pandas as pd
+from app.utils.cas_utils import cas_check_digit
+from app.utils.log_writer import QUERY_LOG_COLUMNS
+
+# 与正式数据库一致的列
+CHEMICAL_COLUMNS = ['序号', 'CAS号', '中文名称', '绿色分级', '涂料现行标准限量要求', '我国新污染物相关管理要求']
+# 分级及其大致比例
+GRADES = ["1级", "2级", "3级", "4级"]
+GRADE_WEIGHTS = [0.2, 0.35, 0.3, 0.15]
+# 组成中文名称的常用字
+NAME_CHARS = "甲乙丙丁戊己庚辛壬癸苯酚醇醛酮酸酯胺氯溴碘氟硝基羟氨磺环烷烯炔二三四五六聚乙烯丙烯酸钛锌铁铜钠钾钙镁铝硅氧化物"
+LIMIT_TEXTS = ["我国暂无标准限量要求", "GB 18582-2020 限量要求", "GB 30981-2020 限量要求"]
+CONTROL_TEXTS = ["我国暂无新污染物相关管控要求", "重点管控新污染物清单", "优先控制化学品名录"]
+USAGES = ["溶剂", "颜料", "助剂", "成膜物质", "填料", "固化剂", "涂料", "防腐"]
+
+# 生成n个不重复且校验位正确的CAS号
+def make_cas_numbers(n, rng):
+    numbers = set()
+    result = []
+    while len(result) < n:
+        head = str(rng.randint(50, 9999999))
+        middle = f"{rng.randint(0, 99):02d}"
+        cas_number = f"{head}-{middle}-{cas_check_digit(head + middle)}"
+        if cas_number not in numbers:
+            numbers.add(cas_number)
+            result.append(cas_number)
+    return result
+
+# 生成化学物质表
+def make_chemicals(rows, seed=0):
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        '序号': [float(i) for i in range(1, rows + 1)],
+        'CAS号': make_cas_numbers(rows, rng),
+        '中文名称': [''.join(rng.choices(NAME_CHARS, k=rng.randint(2, 8))) for _ in range(rows)],
+        '绿色分级': rng.choices(GRADES, weights=GRADE_WEIGHTS, k=rows),
+        '涂料现行标准限量要求': rng.choices(LIMIT_TEXTS, k=rows),
+        '我国新污染物相关管理要求': rng.choices(CONTROL_TEXTS, k=rows),
+    }, columns=CHEMICAL_COLUMNS)
+
+# 生成化学物质工作簿（已存在时直接复用），返回(路径, 数据)
+def make_chemicals_workbook(directory, rows, seed=0):
+    path = os.path.join(directory, f'chemicals_{rows}_{seed}.xlsx')
+    # 相同行数和种子生成的数据完全相同，工作簿已存在时只需重新生成数据
+    df = make_chemicals(rows, seed)
+    if not os.path.exists(path):
+        df.to_excel(path + '.tmp.xlsx', index=False)
+        os.replace(path + '.tmp.xlsx', path)
+    return path, df
+
+# 生成查询日志CSV（已存在时直接复用）：少数热门CAS号占大部分查询，约10%未找到
+def make_query_log_csv(directory, rows, cas_numbers, seed=0, users=200, days=365):
+    path = os.path.join(directory, f'query_logs_{rows}_{seed}.csv')
+    if os.path.exists(path):
+        return path
+    rng = random.Random(seed)
+    cas_numbers = list(cas_numbers)
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(cas_numbers))))
+    start = datetime(2025, 1, 1)
+    step = days * 86400 / max(rows, 1)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, lineterminator='\n')
+        writer.writerow(QUERY_LOG_COLUMNS)
+        chunk = 10000
+        for offset in range(0, rows, chunk):
+            count = min(chunk, rows - offset)
+            picks = rng.choices(cas_numbers, cum_weights=cum_weights, k=count)
+            for i, cas_number in enumerate(picks):
+                queried_at = (start + timedelta(seconds=int((offset + i) * step))).strftime("%Y-%m-%d %H:%M:%S")
+                found = rng.random() >= 0.1
+                writer.writerow([
+                    f"user{rng.randrange(users)}",
+                    cas_number if found else f"{rng.randint(50, 99999)}-00-0",
+                    rng.choice(USAGES),
+                    queried_at,
+                    f"物质{cas_number} - 毒性分级: {rng.choice(GRADES)}" if found else "未找到结果",
+                ])
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,64 @@
+import unittest
+from app.utils.cas_utils import (
+    check_cas_number, normalize_cas, validate_cas, cas_check_digit,
+    CAS_VALID, CAS_NORMALIZED, CAS_CORRECTED, CAS_INVALID_FORMAT, CAS_INVALID_CHECKSUM,
+)
+
+# (输入, 规范化后的CAS号, 校验结果)
+CHECK_CASES = [
+    ('50-00-0', '50-00-0', CAS_VALID),
+    ('7732-18-5', '7732-18-5', CAS_VALID),
+    # 只统一写法：全角、破折号、空白、第一段的前导零
+    ('５０－００－０', '50-00-0', CAS_NORMALIZED),
+    ('50—00—0', '50-00-0', CAS_NORMALIZED),
+    (' 50 - 00 - 0 ', '50-00-0', CAS_NORMALIZED),
+    ('050-00-0', '50-00-0', CAS_NORMALIZED),
+    # 连字符缺失或位置不对
+    ('50000', '50-00-0', CAS_CORRECTED),
+    ('5000-0', '50-00-0', CAS_CORRECTED),
+    ('64175', '64-17-5', CAS_CORRECTED),
+    # 校验位错误
+    ('7732-18-4', '7732-18-4', CAS_INVALID_CHECKSUM),
+    ('7732184', '7732-18-4', CAS_INVALID_CHECKSUM),
+    # 空输入和非数字输入
+    ('', '', CAS_INVALID_FORMAT),
+    (None, '', CAS_INVALID_FORMAT),
+    ('   ', '', CAS_INVALID_FORMAT),
+    ('甲醛', '甲醛', CAS_INVALID_FORMAT),
+    ('abc-12-3', 'abc-12-3', CAS_INVALID_FORMAT),
+    ('50-00-0x', '50-00-0x', CAS_INVALID_FORMAT),
+    # 数字位数不符合CAS号
+    ('1234', '1234', CAS_INVALID_FORMAT),
+    ('12345678901', '12345678901', CAS_INVALID_FORMAT),
+]
+
+class CasUtilsTest(unittest.TestCase):
+    def test_check_cas_number(self):
+        for text, normalized, status in CHECK_CASES:
+            with self.subTest(text=text):
+                self.assertEqual(check_cas_number(text), (normalized, status))
+
+    def test_normalize_cas(self):
+        for text, normalized, _ in CHECK_CASES:
+            with self.subTest(text=text):
+                self.assertEqual(normalize_cas(text), normalized)
+
+    def test_validate_cas(self):
+        cases = [
+            ('50-00-0', CAS_VALID),
+            ('64-17-5', CAS_VALID),
+            ('7732-18-4', CAS_INVALID_CHECKSUM),
+            ('50000', CAS_INVALID_FORMAT),
+            ('', CAS_INVALID_FORMAT),
+            (None, CAS_INVALID_FORMAT),
+        ]
+        for cas_number, status in cases:
+            with self.subTest(cas_number=cas_number):
+                self.assertEqual(validate_cas(cas_number), status)
+
+    def test_check_digit(self):
+        self.assertEqual(cas_check_digit('773218'), 5)
+        self.assertEqual(cas_check_digit('5000'), 0)
+
+if __name__ == '__main__':
+    unittest.main()
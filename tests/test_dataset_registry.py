@@ -0,0 +1,51 @@
+import os
+import time
+import tempfile
+import unittest
+import pandas as pd
+from app.utils.data_utils import DatasetRegistry
+
+def write_workbook(path, rows):
+    pd.DataFrame(rows, columns=['序号', 'CAS号', '中文名称', '绿色分级']).to_excel(path, index=False)
+
+# 等待后台加载结束
+def wait_for_loader(registry, timeout=30):
+    deadline = time.monotonic() + timeout
+    while registry.get_stats()['loading'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+class DatasetRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'chemicals.xlsx')
+        write_workbook(self.path, [[1, '50-00-0', '甲醛', 4]])
+
+    def test_touched_file_keeps_active_version_unchanged(self):
+        registry = DatasetRegistry()
+        dataset = registry.get(self.path)
+        loaded_stat = dataset.stat
+        # 只改变修改时间，内容不变：校验哈希后不重新加载，也不修改已共享的版本
+        os.utime(self.path, ns=(loaded_stat.st_mtime_ns + 10 ** 9, loaded_stat.st_mtime_ns + 10 ** 9))
+        self.assertIs(registry.get(self.path), dataset)
+        wait_for_loader(registry)
+        self.assertIs(registry.active, dataset)
+        self.assertIs(dataset.stat, loaded_stat)
+        stats = registry.get_stats()
+        self.assertEqual((stats['hash_checks'], stats['reloads']), (1, 0))
+        # 记录了新的修改时间，之后的检查不再校验哈希
+        registry.get(self.path)
+        wait_for_loader(registry)
+        self.assertEqual(registry.get_stats()['hash_checks'], 1)
+
+    def test_changed_file_is_reloaded(self):
+        registry = DatasetRegistry()
+        dataset = registry.get(self.path)
+        write_workbook(self.path, [[1, '50-00-0', '甲醛', 4], [2, '64-17-5', '乙醇', 1]])
+        registry.get(self.path)
+        wait_for_loader(registry)
+        self.assertIsNot(registry.active, dataset)
+        self.assertEqual(len(registry.active.df), 2)
+
+if __name__ == '__main__':
+    unittest.main()
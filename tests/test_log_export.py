@@ -0,0 +1,65 @@
+import os
+import io
+import gzip
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+from app.utils.log_export import export_query_logs, available_export_formats
+from app.utils.log_writer import QUERY_LOG_COLUMNS
+
+# 按块返回查询记录的存储；fail_after不为None时在返回该数量的块之后抛出异常
+class FakeLogStore:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    def iter_logs(self, start_date, end_date):
+        for i, chunk in enumerate(self.chunks):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise IOError("读取查询记录失败")
+            yield chunk
+
+def make_chunk(rows):
+    return pd.DataFrame([[f'user{i}', '50-00-0', '', '2024-01-01 00:00:00', '甲醛 - 毒性分级: 4级', ''] for i in range(rows)],
+                        columns=QUERY_LOG_COLUMNS)
+
+class ExportQueryLogsTest(unittest.TestCase):
+    def setUp(self):
+        # 导出使用的临时目录指向单独的目录，便于检查是否遗留文件
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(tempfile, 'tempdir', self.tmp_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_export_returns_content_and_removes_temp_file(self):
+        store = FakeLogStore([make_chunk(3), make_chunk(2)])
+        for fmt in available_export_formats():
+            data = export_query_logs(store, None, None, fmt)
+            if fmt == 'CSV':
+                self.assertEqual(len(pd.read_csv(io.BytesIO(data))), 5)
+            elif fmt == 'CSV (gzip压缩)':
+                self.assertEqual(len(pd.read_csv(io.BytesIO(gzip.decompress(data)))), 5)
+            self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_empty_range_writes_header_only(self):
+        data = export_query_logs(FakeLogStore([]), None, None, 'CSV')
+        self.assertEqual(data.decode('utf-8').strip(), ','.join(QUERY_LOG_COLUMNS))
+
+    def test_failed_export_removes_temp_file(self):
+        store = FakeLogStore([make_chunk(3), make_chunk(2)], fail_after=1)
+        for fmt in available_export_formats():
+            with self.assertRaises(IOError):
+                export_query_logs(store, None, None, fmt)
+            self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_export_over_size_limit_is_rejected(self):
+        store = FakeLogStore([make_chunk(50) for _ in range(5)])
+        for fmt in available_export_formats():
+            with self.assertRaises(ValueError):
+                export_query_logs(store, None, None, fmt, max_bytes=100)
+            self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+if __name__ == '__main__':
+    unittest.main()
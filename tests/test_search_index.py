@@ -0,0 +1,120 @@
+import random
+import unittest
+from app.utils.search_index import CasPrefixTrie, CasDigitMatcher, ChemicalSearchIndex, edit_distance
+
+RECORDS = [
+    {'CAS号': '50-00-0', '中文名称': '甲醛', '绿色分级': 4},
+    {'CAS号': '64-17-5', '中文名称': '乙醇', '绿色分级': 1},
+    {'CAS号': '67-56-1', '中文名称': '甲醇', '绿色分级': 3},
+    {'CAS号': '108-88-3', '中文名称': '甲苯', '绿色分级': 3},
+    {'CAS号': '1330-20-7', '中文名称': '二甲苯', '绿色分级': 3},
+    {'CAS号': '7732-18-5', '中文名称': '水', '绿色分级': 1},
+    {'CAS号': '1234-56-7', '中文名称': '测试物质甲', '绿色分级': 2},
+    {'CAS号': '2345-67-8', '中文名称': '测试物质乙', '绿色分级': 2},
+    {'CAS号': '1234-57-0', '中文名称': '测试物质丙', '绿色分级': 2},
+]
+
+def cas_numbers(suggestions):
+    return [item['CAS号'] for item in suggestions]
+
+class CasPrefixTrieTest(unittest.TestCase):
+    def test_prefix_search(self):
+        trie = CasPrefixTrie()
+        for cas_number in ['50-00-0', '50-32-8', '64-17-5']:
+            trie.insert(cas_number)
+        self.assertEqual(trie.search('50-'), ['50-00-0', '50-32-8'])
+        self.assertEqual(trie.search('64-17-5'), ['64-17-5'])
+        self.assertEqual(trie.search('99'), [])
+
+    def test_candidates_per_node_are_limited(self):
+        trie = CasPrefixTrie(limit=2)
+        for cas_number in ['50-00-0', '50-01-1', '50-02-2']:
+            trie.insert(cas_number)
+        self.assertEqual(trie.search('50'), ['50-00-0', '50-01-1'])
+
+class CasDigitMatcherTest(unittest.TestCase):
+    def test_typos_within_distance(self):
+        matcher = CasDigitMatcher([('1234567', 0), ('2345678', 1), ('1234570', 2)])
+        cases = [
+            ('1234567', 0, [(0, 0)]),
+            ('1234577', 1, [(1, 0), (1, 2)]),    # 替换1位
+            ('123456', 1, [(1, 0)]),             # 漏输1位
+            ('12345677', 1, [(1, 0)]),           # 多输1位
+            ('1243567', 2, [(2, 0)]),            # 相邻两位颠倒
+            ('1234567', 2, [(0, 0), (2, 1), (2, 2)]),  # 删去开头1位并在末尾补1位（整体错位）
+        ]
+        for query, max_distance, expected in cases:
+            with self.subTest(query=query, max_distance=max_distance):
+                self.assertEqual(sorted(matcher.search(query, max_distance)), expected)
+
+    def test_shifted_insert_and_delete(self):
+        self.assertEqual(CasDigitMatcher([('2345678', 0)]).search('1234567', 2), [(2, 0)])
+        self.assertEqual(CasDigitMatcher([('0508502', 0)]).search('0509852', 2), [(2, 0)])
+
+    # 与逐个计算编辑距离的结果一致，不遗漏距离范围内的CAS号
+    def test_recall_against_edit_distance(self):
+        rng = random.Random(7)
+        keys = [''.join(rng.choice('0123456789') for _ in range(rng.randint(5, 10))) for _ in range(2000)]
+        matcher = CasDigitMatcher([(key, entry_id) for entry_id, key in enumerate(keys)])
+        for _ in range(200):
+            query = list(rng.choice(keys))
+            for _ in range(rng.randint(0, 3)):
+                position = rng.randrange(len(query))
+                operation = rng.randint(0, 2)
+                if operation == 0:
+                    query[position] = rng.choice('0123456789')
+                elif operation == 1:
+                    query.insert(position, rng.choice('0123456789'))
+                elif len(query) > 5:
+                    del query[position]
+            query = ''.join(query)
+            for max_distance in (1, 2):
+                expected = sorted((edit_distance(query, key), entry_id) for entry_id, key in enumerate(keys)
+                                  if edit_distance(query, key) <= max_distance)
+                self.assertEqual(sorted(matcher.search(query, max_distance)), expected, query)
+
+class ChemicalSearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = ChemicalSearchIndex(RECORDS)
+
+    def test_exact_and_prefix_matches(self):
+        suggestions = self.index.suggest('50-00-0')
+        self.assertEqual(suggestions[0]['CAS号'], '50-00-0')
+        self.assertEqual(suggestions[0]['匹配方式'], '完全匹配')
+        self.assertEqual(cas_numbers(self.index.suggest('1234-5')), ['1234-56-7', '1234-57-0'])
+        self.assertTrue(all(item['匹配方式'] == '前缀匹配' for item in self.index.suggest('1234-5')))
+
+    def test_cas_typos(self):
+        # 校验位输错（距离1）
+        self.assertIn('7732-18-5', cas_numbers(self.index.suggest('7732-18-4')))
+        # 多输1位（距离1）
+        self.assertIn('2345-67-8', cas_numbers(self.index.suggest('1234-56-78')))
+        # 开头漏输1位并在末尾多输1位，数字整体错位（距离2）
+        self.assertIn('2345-67-8', cas_numbers(self.index.suggest('3456-78-9')))
+        # 数字相同只是连字符位置不同
+        top = self.index.suggest('12-3456-7')[0]
+        self.assertEqual((top['CAS号'], top['匹配方式']), ('1234-56-7', '数字匹配'))
+
+    def test_short_input_is_not_fuzzy_matched(self):
+        self.assertEqual(self.index.suggest('5000'), [])
+
+    def test_name_ngram_matches(self):
+        self.assertEqual(cas_numbers(self.index.suggest('甲苯')), ['108-88-3', '1330-20-7'])
+        self.assertIn('50-00-0', cas_numbers(self.index.suggest('甲')))
+        self.assertEqual(self.index.suggest('丙酮'), [])
+
+    def test_ranking(self):
+        suggestions = self.index.suggest('1234-56-7')
+        self.assertEqual(cas_numbers(suggestions)[0], '1234-56-7')
+        scores = [item['得分'] for item in suggestions]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        # 得分相同时按CAS号排序
+        names = self.index.suggest('测试物质')
+        self.assertEqual(cas_numbers(names), ['1234-56-7', '1234-57-0', '2345-67-8'])
+
+    def test_limit_and_cache(self):
+        self.assertEqual(len(self.index.suggest('甲', limit=2)), 2)
+        self.assertEqual(self.index.suggest('甲苯'), self.index.suggest(' 甲苯 '))
+
+if __name__ == '__main__':
+    unittest.main()